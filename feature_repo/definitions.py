@@ -6,8 +6,9 @@ from feast.types import Float32, Int64
 customer = Entity(name="customer_id", value_type=ValueType.INT64, description="customer identifier")
 
 # Define the file source for the offline store
+# Points at the train partition of the processed dataset, so Feast never reads the test rows
 churn_source = FileSource(
-    path=r"../data/processed/train_churn.parquet",
+    path=r"../data/processed/churn_dataset/split=train",
     timestamp_field="event_timestamp",
 )
 
@@ -0,0 +1,102 @@
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+# Compares how much of the offline store a point-in-time lookup for a set of
+# entities has to read, before (one unsorted file written with df.to_parquet
+# defaults) and after (the sorted, partitioned layout written by process_data).
+# Usage: python scripts/bench_offline_scan.py --data data/processed/churn_dataset
+
+def open_dataset(path):
+    return ds.dataset(path, format="parquet", partitioning="hive")
+
+def plan_row_groups(dataset, entity_ids, partition_filter=None):
+    """Returns the row groups a lookup has to read and (groups, bytes) totals.
+
+    Partitions are pruned by the partition filter, row groups by checking
+    whether any requested id falls inside their customer_id min/max
+    statistics (the IN-list pruning engines like DuckDB or Spark apply).
+    """
+    sorted_ids = np.sort(entity_ids)
+    total_groups = total_bytes = 0
+    for fragment in dataset.get_fragments():
+        for row_group in fragment.row_groups:
+            total_groups += 1
+            total_bytes += row_group.total_byte_size
+    
+    pieces = []
+    kept_groups = kept_bytes = 0
+    fragments = dataset.get_fragments() if partition_filter is None else dataset.get_fragments(filter=partition_filter)
+    for fragment in fragments:
+        keep = []
+        for row_group in fragment.row_groups:
+            stats = row_group.statistics.get("customer_id")
+            if stats is not None:
+                first = np.searchsorted(sorted_ids, stats["min"], side="left")
+                last = np.searchsorted(sorted_ids, stats["max"], side="right")
+                if first == last:
+                    continue
+            keep.append(row_group.id)
+            kept_groups += 1
+            kept_bytes += row_group.total_byte_size
+        if keep:
+            pieces.append(fragment.subset(row_group_ids=keep))
+    return pieces, (total_groups, total_bytes, kept_groups, kept_bytes)
+
+def timed_lookup(pieces, expression, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        n_rows = sum(piece.to_table(filter=expression).num_rows for piece in pieces)
+        timings.append(time.perf_counter() - start)
+    return n_rows, min(timings)
+
+def report(name, dataset, entity_ids, expression, repeats, partition_filter=None):
+    pieces, (total_groups, total_bytes, kept_groups, kept_bytes) = plan_row_groups(dataset, entity_ids, partition_filter)
+    n_rows, seconds = timed_lookup(pieces, expression, repeats)
+    print(f"{name:>7}: {kept_groups}/{total_groups} row groups, "
+          f"{kept_bytes / 1e6:.2f}/{total_bytes / 1e6:.2f} MB "
+          f"({100 * kept_bytes / max(total_bytes, 1):.1f}%), {n_rows} rows in {seconds * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline store scan volume for entity lookups")
+    parser.add_argument("--data", type=str, default="data/processed/churn_dataset")
+    parser.add_argument("--split", type=str, default="train")
+    parser.add_argument("--entities", type=int, default=2000, help="Number of customer ids to look up")
+    parser.add_argument("--contiguous", action="store_true",
+                        help="Look up a contiguous id range (e.g. a new cohort) instead of random ids")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    after = open_dataset(args.data)
+    split_filter = ds.field("split") == args.split
+    ids = after.to_table(columns=["customer_id"], filter=split_filter).column("customer_id").to_numpy()
+    
+    rng = np.random.default_rng(args.seed)
+    n = min(args.entities, len(ids))
+    if args.contiguous:
+        start = rng.integers(0, len(ids) - n + 1)
+        entity_ids = np.sort(ids)[start:start + n]
+    else:
+        entity_ids = rng.choice(ids, size=n, replace=False)
+    as_of = pd.Timestamp.now(tz="UTC")
+    lookup = ds.field("customer_id").isin(entity_ids) & (ds.field("event_timestamp") <= as_of)
+    print(f"Looking up {n} {'contiguous' if args.contiguous else 'random'} entities as of {as_of}")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Baseline: the same rows as a single file with default settings
+        baseline_path = os.path.join(tmp, "baseline.parquet")
+        after.to_table(filter=split_filter).drop_columns(["split", "event_date"]).to_pandas() \
+            .sample(frac=1, random_state=args.seed).to_parquet(baseline_path, index=False)
+        before = open_dataset(baseline_path)
+        
+        report("before", before, entity_ids, lookup, args.repeats)
+        report("after", after, entity_ids, lookup, args.repeats, partition_filter=split_filter)
+
+if __name__ == "__main__":
+    main()
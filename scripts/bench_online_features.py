@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import numpy as np
+import pyarrow.dataset as ds
+from feast import FeatureStore
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from bench_utils import latencies
+from feature_schema import ENTITY_COLUMN, FEATURE_COLUMNS, FEATURE_REPO_PATH, FEATURE_VIEW_NAME
+from predictors import features_to_matrix
+from redis_features import RedisFeatureReader
+
+# Online feature lookup latency: FeatureStore.get_online_features (+ to_dict and
+# features_to_matrix, as the server does) against the direct pipelined Redis
+# reader. Needs the Redis online store running with churn_features materialized.
+# Usage: python scripts/bench_online_features.py --data data/processed/churn_dataset
+
+FEATURE_REFS = [f"{FEATURE_VIEW_NAME}:{col}" for col in FEATURE_COLUMNS]
+
+def report(name, single, batch, batch_size):
+    print(f"{name:>16}: single p50 {np.percentile(single, 50) * 1e3:7.2f} ms  p99 {np.percentile(single, 99) * 1e3:7.2f} ms | "
+          f"batch of {batch_size} p50 {np.percentile(batch, 50) * 1e3:7.2f} ms  p99 {np.percentile(batch, 99) * 1e3:7.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark online feature readers")
+    parser.add_argument("--data", type=str, default="data/processed/churn_dataset",
+                        help="Processed dataset; customer IDs are sampled from its train split")
+    parser.add_argument("--repo", type=str, default=FEATURE_REPO_PATH)
+    parser.add_argument("--requests", type=int, default=1000, help="Single-customer lookups per reader")
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--batch_size", type=int, default=1000)
+    args = parser.parse_args()
+
+    dataset = ds.dataset(args.data, format="parquet", partitioning="hive")
+    customer_ids = dataset.to_table(columns=[ENTITY_COLUMN], filter=ds.field("split") == "train")[ENTITY_COLUMN].to_numpy()
+    rng = np.random.default_rng(42)
+    singles = [[int(i)] for i in rng.choice(customer_ids, args.requests)]
+    batches = [rng.choice(customer_ids, args.batch_size).tolist() for _ in range(args.batches)]
+
+    store = FeatureStore(repo_path=args.repo)
+    reader = RedisFeatureReader()
+
+    def sdk_read(ids):
+        response = store.get_online_features(features=FEATURE_REFS,
+                                             entity_rows=[{ENTITY_COLUMN: i} for i in ids]).to_dict()
+        columns = {k.split(":")[-1]: v for k, v in response.items()}
+        return features_to_matrix([{col: columns[col][i] for col in FEATURE_COLUMNS} for i in range(len(ids))])
+
+    buffer = np.empty((args.batch_size, len(FEATURE_COLUMNS)), dtype=np.float32)
+    direct_read = lambda ids: reader.read(ids, out=buffer)[0]
+
+    # Both readers must agree before their timings mean anything
+    expected, actual = sdk_read(batches[0]), direct_read(batches[0])
+    if not np.array_equal(expected, actual, equal_nan=True):
+        raise SystemExit(f"Readers disagree on {int((expected != actual).any(axis=1).sum())} customers")
+
+    report("feast sdk", latencies(sdk_read, singles), latencies(sdk_read, batches), args.batch_size)
+    report("direct redis", latencies(direct_read, singles), latencies(direct_read, batches), args.batch_size)
+
+if __name__ == "__main__":
+    main()
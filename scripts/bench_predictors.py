@@ -0,0 +1,65 @@
+import argparse
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from batch_iter import iter_xy
+from bench_utils import latencies
+from feature_schema import FEATURE_COLUMNS
+from predictors import BACKENDS, export_predictors, load_predictor
+
+# Single-row and batch scoring latency of each predictor backend, against the
+# previous serving path (XGBClassifier.predict_proba on a one-row DataFrame).
+# Usage: python scripts/bench_predictors.py --data data/processed/churn_dataset
+#        [--model model.ubj]   (default: trains one on the train split)
+
+def report(name, single, batch, batch_size):
+    print(f"{name:>16}: single p50 {np.percentile(single, 50) * 1e6:8.1f} us  p99 {np.percentile(single, 99) * 1e6:8.1f} us | "
+          f"batch of {batch_size} p50 {np.percentile(batch, 50) * 1e3:7.2f} ms  p99 {np.percentile(batch, 99) * 1e3:7.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark predictor backends")
+    parser.add_argument("--data", type=str, default="data/processed/churn_dataset")
+    parser.add_argument("--model", type=str, default=None, help="Saved XGBoost model (default: train one)")
+    parser.add_argument("--n_estimators", type=int, default=100)
+    parser.add_argument("--max_depth", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=2000, help="Single-row calls per backend")
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--batch_size", type=int, default=256)
+    args = parser.parse_args()
+
+    if args.model:
+        booster = xgb.Booster(model_file=args.model)
+    else:
+        X, y = map(np.concatenate, zip(*iter_xy(args.data, "train")))
+        print(f"Training {args.n_estimators} trees of depth {args.max_depth} on {len(y)} rows...")
+        booster = xgb.train({"objective": "binary:logistic", "tree_method": "hist", "max_depth": args.max_depth},
+                            xgb.DMatrix(X, y, feature_names=FEATURE_COLUMNS), args.n_estimators)
+    
+    X_test = np.concatenate([X for X, _ in iter_xy(args.data, "test")])
+    rng = np.random.default_rng(42)
+    single_rows = [X_test[i:i + 1] for i in rng.integers(0, len(X_test), args.requests)]
+    batches = [X_test[rng.integers(0, len(X_test), args.batch_size)] for _ in range(args.batches)]
+    
+    classifier = xgb.XGBClassifier()
+    classifier.load_model(bytearray(booster.save_raw("json")))
+    to_df = lambda X: pd.DataFrame(X, columns=FEATURE_COLUMNS)
+    report("pandas baseline",
+           latencies(lambda X: classifier.predict_proba(to_df(X))[:, 1], single_rows),
+           latencies(lambda X: classifier.predict_proba(to_df(X))[:, 1], batches), args.batch_size)
+    
+    expected = booster.inplace_predict(X_test)
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in export_predictors(booster, tmp, BACKENDS):
+            predictor = load_predictor(tmp, backend)
+            max_error = np.abs(predictor.predict_proba(X_test) - expected).max()
+            report(backend, latencies(predictor.predict_proba, single_rows),
+                   latencies(predictor.predict_proba, batches), args.batch_size)
+            print(f"{'':>16}  max abs difference from xgboost: {max_error:.2e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import os
+import sys
+import tracemalloc
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from batch_iter import iter_xy
+from bench_utils import latencies
+from feature_schema import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, FEATURE_VIEW_NAME
+from predictors import FeatureLayout, XGBoostPredictor, features_to_matrix
+
+# Per-request cost of turning an online feature dict into a model input and
+# scoring it: the previous server path (clean the "view:feature" keys, one-row
+# DataFrame, add missing columns, reindex, XGBClassifier.predict_proba) against
+# features_to_matrix (a new array per request) and FeatureLayout.matrix (the
+# thread's reused float32 buffer), both scored with Booster.inplace_predict.
+# Memory is the tracemalloc peak of one request (Python objects and NumPy
+# buffers; XGBoost's native allocations are not traced).
+# Usage: python scripts/bench_request_matrix.py --data data/processed/churn_dataset
+#        [--model model.ubj]   (default: trains one on the train split)
+
+def peak_allocations(fn, inputs):
+    """Bytes allocated at the peak of each call, above what was live before it."""
+    peaks = np.empty(len(inputs))
+    tracemalloc.start()
+    for i, x in enumerate(inputs):
+        fn(x)  # warm up caches and buffers outside the measurement
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn(x)
+        peaks[i] = tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return peaks
+
+def report(name, timings, peaks):
+    print(f"{name:>24}: p50 {np.percentile(timings, 50) * 1e6:7.1f} us  p99 {np.percentile(timings, 99) * 1e6:7.1f} us | "
+          f"peak allocation per request {np.median(peaks) / 1024:7.1f} KiB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request-to-matrix paths of the inference server")
+    parser.add_argument("--data", type=str, default="data/processed/churn_dataset")
+    parser.add_argument("--model", type=str, default=None, help="Saved XGBoost model (default: train one)")
+    parser.add_argument("--n_estimators", type=int, default=100)
+    parser.add_argument("--max_depth", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.model:
+        booster = xgb.Booster(model_file=args.model)
+    else:
+        X, y = map(np.concatenate, zip(*iter_xy(args.data, "train")))
+        print(f"Training {args.n_estimators} trees of depth {args.max_depth} on {len(y)} rows...")
+        booster = xgb.train({"objective": "binary:logistic", "tree_method": "hist", "max_depth": args.max_depth},
+                            xgb.DMatrix(X, y, feature_names=FEATURE_COLUMNS), args.n_estimators)
+
+    # Online feature dicts as fetch_online_features returns them (category codes are ints)
+    X_test = np.concatenate([X for X, _ in iter_xy(args.data, "test")])
+    rng = np.random.default_rng(42)
+    records = [{col: int(value) if col in CATEGORICAL_COLUMNS else float(value)
+                for col, value in zip(FEATURE_COLUMNS, row)}
+               for row in X_test[rng.integers(0, len(X_test), args.requests)].tolist()]
+    prefixed = [{f"{FEATURE_VIEW_NAME}:{col}": [value] for col, value in record.items()} for record in records]
+
+    classifier = xgb.XGBClassifier()
+    classifier.load_model(bytearray(booster.save_raw("json")))
+    predictor = XGBoostPredictor(booster)
+    layout = FeatureLayout(FEATURE_COLUMNS, FEATURE_VIEW_NAME)
+
+    def pandas_path(feature_vector):
+        features = {k.split(":")[-1]: v[0] for k, v in feature_vector.items()}
+        df = pd.DataFrame([features])
+        for col in FEATURE_COLUMNS:
+            if col not in df.columns:
+                df[col] = 0
+        return classifier.predict_proba(df[FEATURE_COLUMNS])[0][1]
+
+    paths = [
+        ("pandas baseline", pandas_path, prefixed),
+        ("features_to_matrix", lambda record: predictor.predict_proba(features_to_matrix([record]))[0], records),
+        ("FeatureLayout", lambda record: predictor.predict_proba(layout.matrix([record]))[0], records),
+    ]
+    # The matrix alone, without the (shared) cost of the model call
+    build_only = [
+        ("features_to_matrix only", lambda record: features_to_matrix([record]), records),
+        ("FeatureLayout only", lambda record: layout.matrix([record]), records),
+    ]
+
+    # All paths must agree before their timings mean anything
+    expected = [pandas_path(x) for x in prefixed[:100]]
+    for name, fn, inputs in paths[1:]:
+        if not np.allclose([fn(x) for x in inputs[:100]], expected, atol=1e-6):
+            raise SystemExit(f"{name} disagrees with the pandas baseline")
+
+    for name, fn, inputs in paths + build_only:
+        report(name, latencies(fn, inputs), peak_allocations(fn, inputs[:200]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+import time
+import numpy as np
+
+# Helpers shared by the benchmark scripts in this directory
+
+def latencies(fn, inputs):
+    """Wall time in seconds of ``fn(x)`` for each input, one call at a time."""
+    timings = np.empty(len(inputs))
+    for i, x in enumerate(inputs):
+        start = time.perf_counter()
+        fn(x)
+        timings[i] = time.perf_counter() - start
+    return timings
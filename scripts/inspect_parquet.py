@@ -1,6 +1,10 @@
-import pandas as pd
+import os
+import sys
 
-df = pd.read_parquet("data/processed/train_churn.parquet")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from dataset import read_split
+
+df = read_split("data/processed/churn_dataset", "train")
 print("Columns:", df.columns.tolist())
 print("Timestamp Range:", df['event_timestamp'].min(), "to", df['event_timestamp'].max())
 print("Timezone:", df['event_timestamp'].dt.tz)
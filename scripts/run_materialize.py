@@ -1,12 +1,31 @@
 from feast import FeatureStore
 from datetime import datetime
-import pandas as pd
 import warnings
 import logging
+import os
+import sys
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from dataset import read_split
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 logging.basicConfig(level=logging.DEBUG)
 
+# Inference server whose feature cache is dropped after materializing, e.g. http://localhost:8000
+INFERENCE_SERVER_URL = os.environ.get("INFERENCE_SERVER_URL")
+
+def invalidate_feature_cache(server_url=INFERENCE_SERVER_URL):
+    if not server_url:
+        return
+    request = urllib.request.Request(f"{server_url.rstrip('/')}/features/invalidate", data=b"{}",
+                                     headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            print(f"Feature cache invalidated: {response.read().decode()}")
+    except Exception as e:
+        print(f"Could not invalidate the feature cache at {server_url}: {e}")
+
 def run_materialize():
     store = FeatureStore(repo_path="feature_repo")
     
@@ -24,7 +43,7 @@ def run_materialize():
     print("Starting manual materialization...")
     try:
         # Read the parquet file directly
-        df = pd.read_parquet("data/processed/train_churn.parquet")
+        df = read_split("data/processed/churn_dataset", "train")
         print(f"Read {len(df)} rows from parquet.")
         
         # Ensure event_timestamp is timezone-aware UTC
@@ -44,6 +63,7 @@ def run_materialize():
             store.write_to_online_store(feature_view_name="churn_features", df=chunk)
             
         print("Manual materialization completed!")
+        invalidate_feature_cache()
         
     except Exception as e:
         print(f"Manual materialization failed: {e}")
@@ -0,0 +1,62 @@
+import numpy as np
+import pyarrow.dataset as ds
+import xgboost as xgb
+
+from dataset import SPLIT_COLUMN
+from feature_schema import FEATURE_COLUMNS, TARGET_COLUMN
+
+DEFAULT_BATCH_SIZE = 65536
+
+def iter_batches(path, split, columns, batch_size=DEFAULT_BATCH_SIZE, filter=None):
+    """Streams Arrow record batches of one split, reading only ``columns``."""
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    expression = ds.field(SPLIT_COLUMN) == split
+    if filter is not None:
+        expression = expression & filter
+    return dataset.to_batches(columns=columns, filter=expression, batch_size=batch_size)
+
+def count_rows(path, split):
+    """Row count of one split, from the Parquet footers."""
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    return dataset.count_rows(filter=ds.field(SPLIT_COLUMN) == split)
+
+def batch_to_numpy(batch, columns=FEATURE_COLUMNS):
+    """Stacks the feature columns of a record batch into a float32 matrix."""
+    X = np.empty((batch.num_rows, len(columns)), dtype=np.float32)
+    for i, col in enumerate(columns):
+        X[:, i] = batch.column(col).to_numpy(zero_copy_only=False)
+    return X
+
+def iter_xy(path, split, batch_size=DEFAULT_BATCH_SIZE, filter=None):
+    """Yields (X, y) NumPy pairs batch by batch."""
+    for batch in iter_batches(path, split, FEATURE_COLUMNS + [TARGET_COLUMN], batch_size, filter):
+        yield batch_to_numpy(batch), batch.column(TARGET_COLUMN).to_numpy(zero_copy_only=False)
+
+class ParquetBatchIter(xgb.DataIter):
+    """Feeds one split of the processed dataset to XGBoost batch by batch.
+
+    Used with QuantileDMatrix (only the quantised matrix is kept in memory)
+    or, with a ``cache_prefix``, as an external-memory DMatrix whose pages
+    live on disk. XGBoost calls reset() and re-reads the batches for each pass.
+    """
+
+    def __init__(self, path, split, batch_size=DEFAULT_BATCH_SIZE, filter=None, cache_prefix=None):
+        self.path = path
+        self.split = split
+        self.batch_size = batch_size
+        self.filter = filter
+        self._batches = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._batches is None:
+            self.reset()
+        try:
+            X, y = next(self._batches)
+        except StopIteration:
+            return False
+        input_data(data=X, label=y, feature_names=FEATURE_COLUMNS)
+        return True
+
+    def reset(self):
+        self._batches = iter_xy(self.path, self.split, self.batch_size, self.filter)
@@ -0,0 +1,90 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Dynamic micro-batching for the inference server. Callers submit one item at
+# a time; a background thread takes the first waiting item, keeps collecting
+# until ``max_batch_size`` items or ``max_wait_ms`` have passed, and hands the
+# whole batch to one call of ``fn``. Under load this turns N concurrent
+# requests into one feature lookup and one model call, while a lone request
+# waits at most ``max_wait_ms`` longer than it would have.
+
+_STOP = object()
+
+class MicroBatcher:
+    """Coalesces concurrent single-item calls into batched calls of ``fn``.
+
+    ``fn(items)`` returns one result per item, in order. A result that is an
+    Exception instance is raised to that item's caller only; an exception
+    raised by ``fn`` itself fails every item of the batch.
+    """
+
+    def __init__(self, fn, max_batch_size=64, max_wait_ms=2.0):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = self.items = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queues ``item`` and returns a Future for its result."""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+    def close(self):
+        """Finishes the queued items and stops the background thread."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    # Items already queued are taken even once the wait is over
+                    entry = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch):
+        items = [item for item, _ in batch]
+        self.batches += 1
+        self.items += len(items)
+        try:
+            results = self.fn(items)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
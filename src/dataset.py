@@ -0,0 +1,108 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from feature_schema import TIMESTAMP_COLUMN
+
+# Processed data is written once as a hive-partitioned Parquet dataset:
+#   <output>/churn_dataset/split=train/event_date=2026-01-11/part-0.parquet
+#   <output>/churn_dataset/split=test/event_date=2026-01-11/part-0.parquet
+# Readers select their slice with a filter on the partition columns, which
+# pyarrow resolves from the directory names without opening the other files.
+DATASET_DIRNAME = "churn_dataset"
+SPLIT_COLUMN = "split"
+DATE_COLUMN = "event_date"
+
+# Rows are sorted by entity and time inside each chunk so that the min/max
+# statistics of a row group cover a narrow customer_id range, which lets
+# point-in-time lookups for a few entities skip most row groups
+SORT_COLUMNS = ["customer_id", "event_timestamp"]
+DEFAULT_ROW_GROUP_SIZE = 65536
+
+class PartitionedParquetWriter:
+    """Streams DataFrame chunks into a hive-partitioned Parquet dataset.
+
+    One ParquetWriter is opened lazily per partition. All partitions share the
+    schema of the first chunk, so later chunks are cast to the same types (e.g.
+    a column that is all-integer in one chunk but has NaNs in another).
+
+    Each chunk is sorted by SORT_COLUMNS and written in row groups of at most
+    ``row_group_size`` rows (a chunk smaller than that becomes its own row
+    group), with column statistics and a page index. ``bloom_filter_columns``
+    adds Parquet bloom filters for engines that use them for exact-match
+    lookups (needs a pyarrow version that supports ``bloom_filter_options``).
+    """
+
+    def __init__(self, root, basename="part-0", row_group_size=DEFAULT_ROW_GROUP_SIZE,
+                 bloom_filter_columns=None):
+        self.root = root
+        self.basename = basename
+        self.row_group_size = row_group_size
+        self.writer_options = {"write_statistics": True, "write_page_index": True}
+        if bloom_filter_columns:
+            # Size the filters for one row group of distinct ids rather than the 1M default
+            self.writer_options["bloom_filter_options"] = {
+                col: {"ndv": row_group_size, "fpp": 0.05} for col in bloom_filter_columns
+            }
+        self.schema = None
+        self.writers = {}
+
+    def partition_dir(self, partition):
+        return os.path.join(self.root, *[f"{k}={v}" for k, v in partition.items()])
+
+    def write(self, df, **partition):
+        if df.empty:
+            return
+        sort_columns = [col for col in SORT_COLUMNS if col in df.columns]
+        if sort_columns:
+            df = df.sort_values(sort_columns)
+        if self.schema is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self.schema = table.schema
+        else:
+            table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        
+        key = tuple(partition.items())
+        writer = self.writers.get(key)
+        if writer is None:
+            directory = self.partition_dir(partition)
+            os.makedirs(directory, exist_ok=True)
+            file_path = os.path.join(directory, f"{self.basename}.parquet")
+            print(f"Streaming data to {file_path}")
+            writer = pq.ParquetWriter(file_path, self.schema, **self.writer_options)
+            self.writers[key] = writer
+        writer.write_table(table, row_group_size=self.row_group_size)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+def read_split(path, split, columns=None, filters=None):
+    """Reads one split of the processed dataset, pruning the other partitions.
+
+    Extra ``filters`` (e.g. on customer_id or event_timestamp) are pushed down
+    to the row-group statistics.
+    """
+    filters = [(SPLIT_COLUMN, "==", split)] + list(filters or [])
+    df = pd.read_parquet(path, columns=columns, filters=filters)
+    return df.drop(columns=[SPLIT_COLUMN, DATE_COLUMN], errors="ignore")
+
+def newer_than(watermark):
+    """Filters selecting rows with an event_timestamp after ``watermark``.
+
+    The event_date term lets the reader skip older partitions by directory
+    name; the timestamp term then trims the boundary day.
+    """
+    return [(DATE_COLUMN, ">=", watermark.strftime("%Y-%m-%d")), (TIMESTAMP_COLUMN, ">", watermark)]
+
+def max_timestamp(path, split, filters=None):
+    """Latest event_timestamp in a split (None when it is empty), reading only that column."""
+    filters = [(SPLIT_COLUMN, "==", split)] + list(filters or [])
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    table = dataset.to_table(columns=[TIMESTAMP_COLUMN], filter=pq.filters_to_expression(filters))
+    latest = pc.max(table.column(TIMESTAMP_COLUMN)).as_py()
+    return None if latest is None else pd.Timestamp(latest)
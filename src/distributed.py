@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import xgboost as xgb
+from xgboost import collective
+from xgboost.tracker import RabitTracker
+
+from batch_iter import batch_to_numpy
+from dataset import DATE_COLUMN, SPLIT_COLUMN
+from feature_schema import FEATURE_COLUMNS, TARGET_COLUMN, TIMESTAMP_COLUMN
+
+# Data-parallel training on one machine for train.py --data_mode distributed.
+# The row groups of the split are dealt out to N worker processes; each worker
+# streams only its own shard into a QuantileDMatrix, and XGBoost's collective
+# (a RabitTracker on localhost) allreduces the quantile sketches and gradient
+# histograms so every worker builds the same trees.
+
+def split_filters(filters):
+    """Separates filters on the partition columns, which only exist in directory names."""
+    filters = list(filters or [])
+    partition_filters = [f for f in filters if f[0] in (SPLIT_COLUMN, DATE_COLUMN)]
+    return partition_filters, [f for f in filters if f not in partition_filters]
+
+def plan_shards(path, split, n_workers, filters=None):
+    """Splits the row groups of a split into ``n_workers`` shards of similar row counts.
+
+    Each shard is a list of (file path, [row group ids]). Partition filters
+    (split, event_date) prune whole files and row filters prune row groups by
+    their statistics; the workers still apply the row filters after reading.
+    """
+    partition_filters, row_filters = split_filters(filters)
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    expression = pq.filters_to_expression([(SPLIT_COLUMN, "==", split)] + partition_filters)
+    row_expression = pq.filters_to_expression(row_filters) if row_filters else None
+    row_groups = []
+    for fragment in dataset.get_fragments(filter=expression):
+        for piece in fragment.split_by_row_group(row_expression, schema=dataset.schema):
+            row_group = piece.row_groups[0]
+            row_groups.append((row_group.num_rows, fragment.path, row_group.id))
+    
+    # Largest first onto the least-loaded shard keeps the shards balanced
+    shards = [{} for _ in range(n_workers)]
+    rows = [0] * n_workers
+    for num_rows, file_path, row_group_id in sorted(row_groups, reverse=True):
+        i = rows.index(min(rows))
+        shards[i].setdefault(file_path, []).append(row_group_id)
+        rows[i] += num_rows
+    return [sorted(shard.items()) for shard in shards]
+
+class ShardBatchIter(xgb.DataIter):
+    """Feeds one worker's row groups to XGBoost, one row group at a time."""
+
+    def __init__(self, shard, filter=None):
+        self.shard = shard
+        self.filter = filter
+        self._batches = None
+        super().__init__()
+
+    def _iter_xy(self):
+        columns = FEATURE_COLUMNS + [TARGET_COLUMN]
+        empty = True
+        for file_path, row_group_ids in self.shard:
+            parquet_file = pq.ParquetFile(file_path)
+            for row_group_id in row_group_ids:
+                table = parquet_file.read_row_group(row_group_id, columns=columns + [TIMESTAMP_COLUMN])
+                if self.filter is not None:
+                    table = table.filter(self.filter)
+                if table.num_rows:
+                    empty = False
+                    yield batch_to_numpy(table), table.column(TARGET_COLUMN).to_numpy()
+        if empty:
+            # Every worker has to take part in the collective, even with no rows left after filtering
+            yield np.empty((0, len(FEATURE_COLUMNS)), dtype=np.float32), np.empty(0, dtype=np.float32)
+
+    def next(self, input_data):
+        if self._batches is None:
+            self.reset()
+        try:
+            X, y = next(self._batches)
+        except StopIteration:
+            return False
+        input_data(data=X, label=y, feature_names=FEATURE_COLUMNS)
+        return True
+
+    def reset(self):
+        self._batches = self._iter_xy()
+
+def _train_worker(tracker_args, shards, params, num_boost_round, filters, xgb_model):
+    with collective.CommunicatorContext(**tracker_args):
+        rank = collective.get_rank()
+        start_time = time.perf_counter()
+        row_filter = pq.filters_to_expression(filters) if filters else None
+        dtrain = xgb.QuantileDMatrix(ShardBatchIter(shards[rank], row_filter))
+        base_model = xgb.Booster(model_file=bytearray(xgb_model)) if xgb_model else None
+        booster = xgb.train(params, dtrain, num_boost_round=num_boost_round, xgb_model=base_model)
+        result = {"rank": rank, "rows": dtrain.num_row(), "wall_time_s": time.perf_counter() - start_time}
+        # Every worker ends up with the same model; only rank 0 sends it back
+        if rank == 0:
+            result["model"] = bytes(booster.save_raw("json"))
+        return result
+
+def training_time(results):
+    """Wall time of the slowest worker from loading its shard to the last boosting round.
+
+    Unlike train_distributed's overall time, it leaves out starting the tracker
+    and spawning the worker interpreters, so it is the number to compare
+    across worker counts.
+    """
+    return max(result["wall_time_s"] for result in results)
+
+def train_distributed(path, params, num_boost_round, n_workers, threads_per_worker=None,
+                      filters=None, xgb_model=None):
+    """Trains on the train split with ``n_workers`` local processes.
+
+    Returns (booster, wall time in seconds, per-worker results). The wall time
+    includes the tracker and process start-up; see training_time for the
+    training alone. ``xgb_model`` is an optional Booster to continue boosting from.
+    """
+    threads_per_worker = threads_per_worker or max((os.cpu_count() or 1) // n_workers, 1)
+    params = dict(params, nthread=threads_per_worker)
+    shards = plan_shards(path, "train", n_workers, filters)
+    base_model = bytes(xgb_model.save_raw("json")) if xgb_model is not None else None
+    _, row_filters = split_filters(filters)
+    
+    start_time = time.perf_counter()
+    tracker = RabitTracker(n_workers=n_workers, host_ip="127.0.0.1")
+    tracker.start()
+    # spawn rather than fork: forking after OpenMP has been used can hang the children
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [
+            pool.submit(_train_worker, tracker.worker_args(), shards, params, num_boost_round, row_filters, base_model)
+            for _ in range(n_workers)
+        ]
+        results = sorted((future.result() for future in futures), key=lambda r: r["rank"])
+    tracker.wait_for()
+    elapsed = time.perf_counter() - start_time
+    
+    for result in results:
+        print(f"Worker {result['rank']}: {result['rows']} rows in {result['wall_time_s']:.2f}s")
+    return xgb.Booster(model_file=bytearray(results[0]["model"])), elapsed, results
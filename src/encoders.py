@@ -0,0 +1,72 @@
+import json
+import pandas as pd
+
+from feature_schema import CATEGORICAL_COLUMNS
+
+ENCODER_FILENAME = "category_encoder.json"
+
+class CategoryEncoder:
+    """Persisted vocabularies for the categorical churn features.
+
+    A value's code is its position in the vocabulary. New values are appended
+    (sorted) on ``partial_fit``, so codes never change once assigned and a
+    freshly fitted encoder reproduces the old ``astype('category').cat.codes``
+    mapping. Unknown values encode to -1, like missing values in pandas.
+    """
+
+    def __init__(self, vocabularies=None):
+        self.vocabularies = {}
+        self._index = {}
+        for col, vocab in (vocabularies or {}).items():
+            self._set_vocabulary(col, list(vocab))
+
+    def _set_vocabulary(self, col, vocab):
+        self.vocabularies[col] = vocab
+        self._index[col] = {value: code for code, value in enumerate(vocab)}
+
+    def add_values(self, col, values):
+        known = self._index.get(col, {})
+        new_values = {v for v in values if v not in known}
+        if new_values:
+            self._set_vocabulary(col, self.vocabularies.get(col, []) + sorted(new_values))
+        return self
+
+    def partial_fit(self, df, columns=CATEGORICAL_COLUMNS):
+        for col in columns:
+            if col in df.columns:
+                self.add_values(col, df[col].dropna().unique())
+        return self
+
+    def transform(self, df):
+        # pd.Categorical does a hash lookup over the whole column at once
+        for col, vocab in self.vocabularies.items():
+            if col in df.columns:
+                df[col] = pd.Categorical(df[col], categories=vocab).codes
+        return df
+
+    def encode_record(self, record):
+        """Encodes a single raw record (dict) for the serving path."""
+        encoded = dict(record)
+        for col, index in self._index.items():
+            if col in encoded:
+                encoded[col] = index.get(encoded[col], -1)
+        return encoded
+
+    def invalid_codes(self, record):
+        """Returns the categorical columns of an encoded record whose code is not in the vocabulary."""
+        invalid = []
+        for col, vocab in self.vocabularies.items():
+            code = record.get(col)
+            if code is None or not 0 <= int(code) < len(vocab):
+                invalid.append(col)
+        return invalid
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"vocabularies": self.vocabularies}, f, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f)["vocabularies"])
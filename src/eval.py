@@ -1,10 +1,18 @@
 import mlflow
 import argparse
-import pandas as pd
-from sklearn.metrics import accuracy_score, classification_report
-import mlflow.xgboost
+import numpy as np
 import os
+import re
+import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import model_cache
+from batch_iter import DEFAULT_BATCH_SIZE, count_rows, iter_xy
+from diagnostics import SegmentMetrics, permutation_importance
+from encoders import CategoryEncoder, ENCODER_FILENAME
+from metrics import LOWER_IS_BETTER, PoissonBootstrap, StreamingBinaryMetrics, log_report
+from mlflow_logging import AsyncRunLogger
 
 # Suppress warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="google.protobuf")
@@ -16,73 +24,216 @@ os.environ["AWS_ACCESS_KEY_ID"] = "minioadmin"
 os.environ["AWS_SECRET_ACCESS_KEY"] = "minioadmin"
 os.environ["AWS_REGION"] = "us-east-1"
 
-def evaluate_model(run_id, test_data_path):
+REGISTERED_MODEL_NAME = "churn-prediction-model"
+STAGING_ALIAS = "staging"
+
+def resolve_run_id(ref):
+    """Maps a run ID or a registered-model alias such as "@staging" to a run ID (None if unset)."""
+    if not ref.startswith("@"):
+        return ref
+    return model_cache.alias_run_id(REGISTERED_MODEL_NAME, ref[1:])
+
+def metric_key(*parts):
+    # MLflow metric names only allow alphanumerics, _ - . / and spaces
+    return re.sub(r"[^0-9A-Za-z_\-./]", "_", "_".join(str(p) for p in parts))
+
+def load_encoder(run_id):
+    try:
+        return CategoryEncoder.load(model_cache.cached_artifact(run_id, ENCODER_FILENAME))
+    except Exception as e:
+        print(f"Category encoder not available for run {run_id}: {e}")
+        return None
+
+def log_diagnostics(run_logger, segments=None, importance=None, metric="roc_auc"):
+    if segments:
+        for name, values in segments.items():
+            for label, stats in values.items():
+                run_logger.log_metrics({metric_key("segment", name, label, k): stats[k]
+                                        for k in ("rows", "accuracy", "f1", "roc_auc")})
+        run_logger.log_dict(segments, "segment_metrics.json")
+    if importance:
+        run_logger.log_metrics({metric_key("importance", feature, metric): mean
+                                for feature, (mean, _) in importance.items()})
+        run_logger.log_dict({"metric": metric, "importance": {f: {"mean": m, "std": sd} for f, (m, sd) in importance.items()}},
+                            "permutation_importance.json")
+
+def evaluate_models(run_ids, test_data_path, batch_size=DEFAULT_BATCH_SIZE, n_bootstrap=200,
+                    importance_rows=100000, importance_metric="roc_auc", importance_repeats=3):
+    """Scores several models on one streaming pass over the test split.
+
+    Each record batch is read once and scored by every model in parallel
+    threads (XGBoost releases the GIL while predicting); metrics overall and
+    per customer segment accumulate per model, so memory stays at one batch
+    plus fixed-size accumulators however large the holdout is. A uniform
+    sample of about ``importance_rows`` rows is kept for the permutation
+    importance of the first model (0 skips it). Returns {run_id: report}.
+    """
+    boosters = {}
+    for run_id in run_ids:
+        print(f"Loading model from run {run_id}...")
+        boosters[run_id] = model_cache.load_model(run_id).get_booster()
+    accumulators = {run_id: StreamingBinaryMetrics(n_bootstrap=n_bootstrap) for run_id in run_ids}
+    segments = {run_id: SegmentMetrics() for run_id in run_ids}
+    # Bootstrap weights are drawn once per batch and shared, so every model is
+    # scored on the same resamples (paired intervals)
+    bootstrap = PoissonBootstrap(n_bootstrap) if n_bootstrap else None
+
+    def score(run_id, X, y, weights):
+        proba = boosters[run_id].inplace_predict(X)
+        accumulators[run_id].update(y, proba, weights)
+        segments[run_id].update(X, y, proba)
+
+    sample_rate = min(importance_rows / max(count_rows(test_data_path, "test"), 1), 1.0)
+    rng = np.random.default_rng(42)
+    sample_X, sample_y = [], []
+
+    print(f"Evaluating {len(run_ids)} model(s) on {test_data_path} in batches of {batch_size}...")
+    start_time = time.perf_counter()
+    n_rows = 0
+    with ThreadPoolExecutor(max_workers=len(run_ids)) as pool:
+        for X, y in iter_xy(test_data_path, "test", batch_size):
+            weights = bootstrap.draw(len(y)) if bootstrap is not None else None
+            list(pool.map(score, run_ids, [X] * len(run_ids), [y] * len(run_ids), [weights] * len(run_ids)))
+            n_rows += len(y)
+            if importance_rows:
+                keep = rng.random(len(y)) < sample_rate
+                sample_X.append(X[keep])
+                sample_y.append(y[keep])
+    elapsed = time.perf_counter() - start_time
+    print(f"Scored {n_rows} rows x {len(run_ids)} model(s) in {elapsed:.2f}s")
+
+    importance = None
+    if importance_rows:
+        start_time = time.perf_counter()
+        X_sample, y_sample = np.concatenate(sample_X), np.concatenate(sample_y)
+        importance = permutation_importance(boosters[run_ids[0]].inplace_predict, X_sample, y_sample,
+                                            importance_metric, importance_repeats)
+        print(f"Permutation importance ({importance_metric} drop, {len(y_sample)} rows, "
+              f"{time.perf_counter() - start_time:.2f}s) for run {run_ids[0]}:")
+        for feature, (mean, std) in sorted(importance.items(), key=lambda item: -item[1][0]):
+            print(f"  {feature:>16}: {mean:.4f} +/- {std:.4f}")
+
+    reports = {}
+    for run_id in run_ids:
+        report = accumulators[run_id].report()
+        print(f"Run {run_id}:")
+        for name, value in report["metrics"].items():
+            low, high = report["ci"].get(name, (None, None))
+            ci = f" (95% CI {low:.4f}-{high:.4f})" if low is not None else ""
+            print(f"  test {name}: {value:.4f}{ci}")
+        print(f"  confusion matrix [[tn, fp], [fn, tp]]: {report['confusion'].tolist()}")
+        segment_report = segments[run_id].report(load_encoder(run_id))
+        for name, values in segment_report.items():
+            print(f"  {name}: " + ", ".join(f"{label} acc {stats['accuracy']:.3f} ({stats['rows']})"
+                                           for label, stats in values.items()))
+
+        # Log metrics to the existing run
+        with AsyncRunLogger(run_id, flush_interval=None) as run_logger:
+            log_report(run_logger, report, "test")
+            run_logger.log_metric("test_eval_wall_time_s", elapsed)
+            log_diagnostics(run_logger, segment_report, importance if run_id == run_ids[0] else None,
+                            importance_metric)
+        reports[run_id] = dict(report, segments=segment_report)
+    return reports
+
+def evaluate_model(run_id, test_data_path, n_bootstrap=200):
     mlflow.set_tracking_uri("http://127.0.0.1:5000")
-    print(f"Loading model from run {run_id}...")
-    model_uri = f"runs:/{run_id}/model"
-    model = mlflow.xgboost.load_model(model_uri)
-    
-    print(f"Loading test data from {test_data_path}...")
-    df = pd.read_parquet(test_data_path)
-    
-    X_test = df.drop(columns=['Churn', 'customer_id', 'event_timestamp'])
-    y_test = df['Churn']
-    
-    print("Evaluating model...")
-    preds = model.predict(X_test)
-    acc = accuracy_score(y_test, preds)
-    
-    print(f"Test Accuracy: {acc}")
-    print(classification_report(y_test, preds))
-    
-    # Log metric to the existing run
-    print(f"Logging test_accuracy to run {run_id}...")
+    return evaluate_models([run_id], test_data_path, n_bootstrap=n_bootstrap)[run_id]["metrics"]["accuracy"]
+
+def is_better(challenger, champion, metric):
+    if metric in LOWER_IS_BETTER:
+        return challenger < champion
+    return challenger > champion
+
+def register_staging(run_id):
     client = mlflow.tracking.MlflowClient()
-    client.log_metric(run_id, "test_accuracy", acc)
-    
-    return acc
+    model_uri = f"runs:/{run_id}/model"
+    name = REGISTERED_MODEL_NAME
+
+    # Register model if not exists
+    try:
+        client.create_registered_model(name)
+    except Exception:
+        pass
+
+    result = client.create_model_version(
+        name=name,
+        source=model_uri,
+        run_id=run_id
+    )
+
+    # Use Model Aliases (modern approach) instead of Stages (deprecated)
+    client.set_registered_model_alias(
+        name=name,
+        alias=STAGING_ALIAS,
+        version=result.version
+    )
+    print(f"Model version {result.version} assigned alias '@{STAGING_ALIAS}'.")
 
-def promote_model(run_id, accuracy, threshold=0.7):
+def promote_model(run_id, reports, champion_run_id=None, metric="accuracy", threshold=0.7):
+    """Promotes ``run_id`` to @staging if it meets the accuracy threshold and beats the champion."""
     mlflow.set_tracking_uri("http://127.0.0.1:5000")
-    if accuracy >= threshold:
-        print(f"Model accuracy {accuracy} meets threshold {threshold}. Promoting to Staging.")
-        client = mlflow.tracking.MlflowClient()
-        model_uri = f"runs:/{run_id}/model"
-        name = "churn-prediction-model"
-        
-        # Register model if not exists
-        try:
-            client.create_registered_model(name)
-        except Exception:
-            pass
-            
-        result = client.create_model_version(
-            name=name,
-            source=model_uri,
-            run_id=run_id
-        )
-        
-        # Use Model Aliases (modern approach) instead of Stages (deprecated)
-        client.set_registered_model_alias(
-            name=name,
-            alias="staging",
-            version=result.version
-        )
-        print(f"Model version {result.version} assigned alias '@staging'.")
-    else:
+    if champion_run_id == run_id:
+        # Registering it again would only add a duplicate version behind the same alias
+        print(f"Run {run_id} is already @{STAGING_ALIAS}. Nothing to promote.")
+        return False
+    accuracy = reports[run_id]["metrics"]["accuracy"]
+    if accuracy < threshold:
         print(f"Model accuracy {accuracy} is below threshold {threshold}. Not promoting.")
+        return False
+
+    if champion_run_id is not None:
+        challenger_score = reports[run_id]["metrics"][metric]
+        champion_score = reports[champion_run_id]["metrics"][metric]
+        with AsyncRunLogger(run_id, flush_interval=None) as run_logger:
+            run_logger.set_tag("champion_run_id", champion_run_id)
+            run_logger.log_metric(f"champion_test_{metric}", champion_score)
+        if not is_better(challenger_score, champion_score, metric):
+            print(f"Challenger {metric} {challenger_score:.4f} does not beat @{STAGING_ALIAS} "
+                  f"({champion_run_id}) {champion_score:.4f}. Not promoting.")
+            return False
+        print(f"Challenger {metric} {challenger_score:.4f} beats @{STAGING_ALIAS} {champion_score:.4f}.")
+
+    print(f"Model accuracy {accuracy} meets threshold {threshold}. Promoting to Staging.")
+    register_staging(run_id)
+    return True
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--run_id", type=str, required=True)
-    parser.add_argument("--data", type=str, required=True)
+    parser.add_argument("--run_id", type=str, required=True, help="Challenger run ID (or alias such as @staging)")
+    parser.add_argument("--data", type=str, required=True, help="Path to the processed parquet dataset (test split is used)")
+    parser.add_argument("--compare", type=str, nargs="*", default=[],
+                        help="Further run IDs or aliases to evaluate in the same pass (the current @staging is always included)")
+    parser.add_argument("--metric", type=str, default="accuracy",
+                        choices=["accuracy", "precision", "recall", "f1", "roc_auc", "logloss"],
+                        help="Metric the challenger must improve on the @staging model to be promoted")
+    parser.add_argument("--threshold", type=float, default=0.7, help="Minimum test accuracy for promotion")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per record batch")
+    parser.add_argument("--n_bootstrap", type=int, default=200, help="Bootstrap resamples for metric confidence intervals (0 to skip)")
+    parser.add_argument("--importance_rows", type=int, default=100000,
+                        help="Holdout rows sampled for the challenger's permutation importance (0 to skip)")
+    parser.add_argument("--importance_metric", type=str, default="roc_auc", choices=["accuracy", "f1", "roc_auc", "logloss"])
+    parser.add_argument("--importance_repeats", type=int, default=3)
+    parser.add_argument("--no_promote", action="store_true", help="Only evaluate")
     args = parser.parse_args()
 
-    accuracy = evaluate_model(args.run_id, args.data)
-    promote_model(args.run_id, accuracy)
+    mlflow.set_tracking_uri("http://127.0.0.1:5000")
+    challenger = resolve_run_id(args.run_id)
+    if challenger is None:
+        parser.error(f"No model version has alias {args.run_id}")
+    champion = resolve_run_id(f"@{STAGING_ALIAS}")
+    run_ids = [challenger]
+    for ref in [f"@{STAGING_ALIAS}"] + args.compare:
+        run_id = champion if ref == f"@{STAGING_ALIAS}" else resolve_run_id(ref)
+        if run_id is None:
+            print(f"No model version has alias {ref}; skipping it.")
+        elif run_id not in run_ids:
+            run_ids.append(run_id)
+
+    reports = evaluate_models(run_ids, args.data, args.batch_size, args.n_bootstrap, args.importance_rows,
+                              args.importance_metric, args.importance_repeats)
+    if not args.no_promote:
+        promote_model(challenger, reports, champion, args.metric, args.threshold)
 
 if __name__ == "__main__":
     main()
-
-
-
@@ -0,0 +1,162 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from feature_schema import load_feature_view
+
+# In-process cache of online feature records for the inference server. The
+# churn_features view only changes when it is materialized, so repeated
+# lookups of the same customers (dashboard, CRM) can skip Redis:
+#   - entries expire after the FeatureView ttl, and invalidate() drops them
+#     early when materialization writes new values
+#   - least recently used entries are evicted beyond ``max_bytes``
+#   - concurrent misses for the same customer share one fetch (single flight)
+# Customers that are not in the online store are cached as None too.
+
+def record_size(record):
+    """Approximate memory held by one cached record."""
+    if record is None:
+        return sys.getsizeof(None)
+    return sys.getsizeof(record) + sum(sys.getsizeof(value) for value in record.values())
+
+def feature_view_ttl(feature_view=None):
+    """The churn_features ttl in seconds (None if the view has no ttl)."""
+    if feature_view is None:
+        feature_view = load_feature_view()
+    ttl = feature_view.ttl.total_seconds() if feature_view.ttl else 0
+    return ttl or None
+
+class FeatureCache:
+    """TTL + LRU cache of feature records keyed by customer ID.
+
+    ``get_many(ids, fetch)`` returns one record per ID, calling
+    ``fetch(missing_ids)`` once for the IDs that are neither cached nor
+    already being fetched by another caller; ``get_many_async`` does the same
+    with an async ``fetch``. Both may be used from threads and the event loop
+    at the same time.
+    """
+
+    def __init__(self, ttl_seconds=None, max_bytes=64 * 1024 * 1024, clock=time.monotonic):
+        self.ttl = ttl_seconds
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._entries = OrderedDict()  # customer_id -> (record, expires_at, size)
+        self._inflight = {}  # customer_id -> Future
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.bytes = 0
+        self.hits = self.misses = self.coalesced = self.evictions = self.expirations = 0
+
+    def _claim(self, customer_ids):
+        """Splits IDs into cached records, IDs this caller must fetch and futures of fetches in flight."""
+        records, owned, waiting = {}, [], {}
+        now = self.clock()
+        with self._lock:
+            for customer_id in dict.fromkeys(customer_ids):
+                entry = self._entries.get(customer_id)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    self._entries.move_to_end(customer_id)
+                    records[customer_id] = entry[0]
+                    self.hits += 1
+                    continue
+                if entry is not None:
+                    self._remove(customer_id)
+                    self.expirations += 1
+                if customer_id in self._inflight:
+                    waiting[customer_id] = self._inflight[customer_id]
+                    self.coalesced += 1
+                else:
+                    self._inflight[customer_id] = Future()
+                    owned.append(customer_id)
+                    self.misses += 1
+            return records, owned, waiting, self._generation
+
+    def _complete(self, owned, fetched, generation):
+        expires_at = self.clock() + self.ttl if self.ttl else None
+        with self._lock:
+            # Values fetched before an invalidation may be stale, so they are returned but not kept
+            keep = generation == self._generation
+            futures = [self._inflight.pop(customer_id) for customer_id in owned]
+            if keep:
+                for customer_id, record in zip(owned, fetched):
+                    self._entries[customer_id] = (record, expires_at, record_size(record))
+                    self.bytes += self._entries[customer_id][2]
+                self._evict()
+        for future, record in zip(futures, fetched):
+            future.set_result(record)
+
+    def _fail(self, owned, error):
+        with self._lock:
+            futures = [self._inflight.pop(customer_id) for customer_id in owned]
+        for future in futures:
+            future.set_exception(error)
+
+    def _remove(self, customer_id):
+        self.bytes -= self._entries.pop(customer_id)[2]
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            customer_id = next(iter(self._entries))
+            self._remove(customer_id)
+            self.evictions += 1
+
+    def get_many(self, customer_ids, fetch):
+        records, owned, waiting, generation = self._claim(customer_ids)
+        if owned:
+            try:
+                fetched = fetch(owned)
+            except Exception as e:
+                self._fail(owned, e)
+                raise
+            self._complete(owned, fetched, generation)
+            records.update(zip(owned, fetched))
+        for customer_id, future in waiting.items():
+            records[customer_id] = future.result()
+        return [records[customer_id] for customer_id in customer_ids]
+
+    async def get_many_async(self, customer_ids, fetch):
+        records, owned, waiting, generation = self._claim(customer_ids)
+        if owned:
+            try:
+                fetched = await fetch(owned)
+            except BaseException as e:
+                self._fail(owned, e if isinstance(e, Exception) else RuntimeError("Feature fetch cancelled"))
+                raise
+            self._complete(owned, fetched, generation)
+            records.update(zip(owned, fetched))
+        for customer_id, future in waiting.items():
+            records[customer_id] = await asyncio.wrap_future(future)
+        return [records[customer_id] for customer_id in customer_ids]
+
+    def invalidate(self, customer_ids=None):
+        """Drops the given customers, or everything; returns the number of entries dropped."""
+        with self._lock:
+            self._generation += 1
+            if customer_ids is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self.bytes = 0
+                return dropped
+            dropped = 0
+            for customer_id in customer_ids:
+                if customer_id in self._entries:
+                    self._remove(customer_id)
+                    dropped += 1
+            return dropped
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "ttl_seconds": self.ttl,
+        }
@@ -0,0 +1,69 @@
+import importlib.util
+import os
+import numpy as np
+
+# Column layout shared by processing, training and serving.
+# FEATURE_COLUMNS mirrors the churn_features FeatureView in feature_repo/definitions.py
+# and is also the column order the model is trained on.
+
+ENTITY_COLUMN = "customer_id"
+TIMESTAMP_COLUMN = "event_timestamp"
+TARGET_COLUMN = "Churn"
+
+FEATURE_COLUMNS = [
+    "Age", "Gender", "Tenure", "Usage Frequency", "Support Calls",
+    "Payment Delay", "Subscription Type", "Contract Length",
+    "Total Spend", "Last Interaction"
+]
+
+CATEGORICAL_COLUMNS = ["Gender", "Subscription Type", "Contract Length"]
+
+FEATURE_REPO_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "feature_repo")
+FEATURE_VIEW_NAME = "churn_features"
+
+# Storage dtype for each Feast value type
+VALUE_TYPE_DTYPES = {
+    "FLOAT": "float32",
+    "DOUBLE": "float64",
+    "INT32": "int32",
+    "INT64": "int64",
+    "BOOL": "bool",
+}
+
+def load_feature_view(repo_path=FEATURE_REPO_PATH, name=FEATURE_VIEW_NAME):
+    """Imports feature_repo/definitions.py and returns the named FeatureView."""
+    spec = importlib.util.spec_from_file_location("feature_definitions", os.path.join(repo_path, "definitions.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, name)
+
+# Category code dtypes, narrowest first
+CODE_DTYPES = ["int8", "int16", "int32"]
+
+def code_dtype(n_values):
+    """Narrowest integer dtype holding the codes -1 .. n_values - 1."""
+    for dtype in CODE_DTYPES:
+        if n_values - 1 <= np.iinfo(dtype).max:
+            return dtype
+    raise ValueError(f"Too many categories to encode: {n_values}")
+
+def dtype_plan(feature_view=None, encoder=None):
+    """Maps each processed column to its compact storage dtype.
+
+    Feature dtypes follow the FeatureView schema. Category codes are declared
+    as Int64 in Feast but only hold a handful of values (or -1), so they are
+    stored as int8, or the narrowest type that fits ``encoder``'s vocabulary
+    once it outgrows int8; Feast widens them again when serving. The event
+    timestamp only needs microseconds (Parquet's default unit), not pandas'
+    nanoseconds.
+    """
+    if feature_view is None:
+        feature_view = load_feature_view()
+    plan = {field.name: VALUE_TYPE_DTYPES[field.dtype.to_value_type().name] for field in feature_view.schema}
+    for col in CATEGORICAL_COLUMNS:
+        vocabulary = encoder.vocabularies.get(col, []) if encoder is not None else []
+        plan[col] = code_dtype(len(vocabulary))
+    plan[ENTITY_COLUMN] = "int64"
+    plan[TARGET_COLUMN] = "int8"
+    plan[TIMESTAMP_COLUMN] = "datetime64[us, UTC]"
+    return plan
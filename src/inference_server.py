@@ -1,20 +1,60 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-import mlflow.xgboost
-import xgboost as xgb
-import pandas as pd
+from typing import Any, Dict, List, Optional
+import mlflow
 from feast import FeatureStore
 import os
 import uvicorn
 import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 import shap
 
+import model_cache
+from batching import MicroBatcher
+from encoders import CategoryEncoder, ENCODER_FILENAME
+from feature_cache import FeatureCache, feature_view_ttl
+from feature_schema import ENTITY_COLUMN, FEATURE_COLUMNS, FEATURE_VIEW_NAME, load_feature_view
+from predictors import BACKENDS, DEFAULT_BACKEND, FeatureLayout, load_run_predictor
+from redis_features import AsyncRedisFeatureReader
+from result_cache import MemoryResultStore, RedisResultStore, ResultCache
+
 app = FastAPI(title="Churn Prediction Inference Server")
 
 # Configuration
 FEATURE_REPO_PATH = "feature_repo"
 MLFLOW_TRACKING_URI = "http://localhost:5000"
+# Scoring backend from predictors.py: xgboost, tree or onnx
+PREDICTOR_BACKEND = os.environ.get("PREDICTOR_BACKEND", DEFAULT_BACKEND)
+if PREDICTOR_BACKEND not in BACKENDS:
+    raise ValueError(f"PREDICTOR_BACKEND must be one of {BACKENDS}, got {PREDICTOR_BACKEND!r}")
+# Largest number of customer IDs accepted by /predict/batch
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 10000))
+# Micro-batching of concurrent /predict/{customer_id} calls (0 disables it):
+# requests arriving within MICROBATCH_MAX_WAIT_MS share one Feast lookup and model call
+MICROBATCH_MAX_SIZE = int(os.environ.get("MICROBATCH_MAX_SIZE", 0))
+MICROBATCH_MAX_WAIT_MS = float(os.environ.get("MICROBATCH_MAX_WAIT_MS", 2.0))
+# Online feature source: "feast" (FeatureStore SDK, on the scoring threads) or
+# "redis" (Feast's Redis layout read directly with asyncio, on the event loop)
+FEATURE_READER = os.environ.get("FEATURE_READER", "feast")
+if FEATURE_READER not in ("feast", "redis"):
+    raise ValueError(f"FEATURE_READER must be 'feast' or 'redis', got {FEATURE_READER!r}")
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 64))
+# In-process cache of online feature vectors (0 disables it); entries live for the
+# FeatureView ttl unless FEATURE_CACHE_TTL_S is set, and POST /features/invalidate drops them
+FEATURE_CACHE_MAX_MB = float(os.environ.get("FEATURE_CACHE_MAX_MB", 0))
+FEATURE_CACHE_TTL_S = os.environ.get("FEATURE_CACHE_TTL_S")
+# Cache of probabilities and SHAP values per (model run, feature vector):
+# "off", "memory" (per process, RESULT_CACHE_MAX_ENTRIES) or "redis" (shared by
+# all replicas through the online store's Redis, kept RESULT_CACHE_TTL_S)
+RESULT_CACHE = os.environ.get("RESULT_CACHE", "off")
+if RESULT_CACHE not in ("off", "memory", "redis"):
+    raise ValueError(f"RESULT_CACHE must be 'off', 'memory' or 'redis', got {RESULT_CACHE!r}")
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 100000))
+RESULT_CACHE_TTL_S = int(os.environ.get("RESULT_CACHE_TTL_S", 86400))
+# Threads for CPU-bound scoring and SHAP; requests themselves wait on the event loop
+SCORING_THREADS = int(os.environ.get("SCORING_THREADS", os.cpu_count() or 1))
 
 # Set environment variables for MinIO access
 os.environ["MLFLOW_S3_ENDPOINT_URL"] = "http://127.0.0.1:9000"
@@ -22,117 +62,273 @@ os.environ["AWS_ACCESS_KEY_ID"] = "minioadmin"
 os.environ["AWS_SECRET_ACCESS_KEY"] = "minioadmin"
 os.environ["AWS_REGION"] = "us-east-1"
 
-# Global variables to hold model, store, and explainer
+# Global variables to hold model, predictor, store, explainer and category encoder
 model = None
+predictor = None
 store = None
 explainer = None
+encoder = None
+batcher = None
+redis_reader = None
+event_loop = None
+feature_cache = None
+result_cache = None
+# Model column order and Feast references; rebuilt from the FeatureView at startup
+layout = FeatureLayout(FEATURE_COLUMNS, FEATURE_VIEW_NAME)
+scoring_executor = ThreadPoolExecutor(max_workers=SCORING_THREADS, thread_name_prefix="scoring")
+
+class RawFeatures(BaseModel):
+    features: Dict[str, Any]
+
+class BatchRequest(BaseModel):
+    customer_ids: List[int]
+    explain: bool = False
+
+class InvalidateRequest(BaseModel):
+    customer_ids: Optional[List[int]] = None
+
+def fetch_online_features(customer_ids):
+    """Looks up all customers in one Feast call.
+
+    Returns one feature dict per ID (keys without the view prefix), or None for
+    customers that have no features in the online store.
+    """
+    feature_vector = store.get_online_features(
+        features=layout.refs,
+        entity_rows=[{ENTITY_COLUMN: customer_id} for customer_id in customer_ids]
+    ).to_dict()
+    columns = {k.split(":")[-1]: v for k, v in feature_vector.items()}
+    rows = []
+    for i in range(len(customer_ids)):
+        features = {col: values[i] for col, values in columns.items()}
+        rows.append(None if all(features.get(col) is None for col in FEATURE_COLUMNS) else features)
+    return rows
+
+def shap_dicts(X):
+    """SHAP values of every row of ``X`` (one explainer call), as {feature: value} dicts."""
+    return [dict(zip(FEATURE_COLUMNS, row.tolist())) for row in explainer.shap_values(X)]
+
+def lookup_features(customer_ids):
+    """Blocking feature lookup for worker threads (the micro-batcher)."""
+    if feature_cache is not None:
+        return feature_cache.get_many(customer_ids, read_features)
+    return read_features(customer_ids)
+
+def read_features(customer_ids):
+    if redis_reader is not None:
+        # The asyncio client belongs to the event loop, so the read runs there
+        return asyncio.run_coroutine_threadsafe(redis_reader.read_records(customer_ids), event_loop).result()
+    return fetch_online_features(customer_ids)
+
+def score_customers(customer_ids, explain=False):
+    """Scores customers with one feature lookup, one model call and (if ``explain``) one SHAP call.
+
+    Returns one result dict per ID, in order. Customers that cannot be scored
+    get "error" and "status_code" entries instead of a probability.
+    """
+    return score_records(customer_ids, lookup_features(customer_ids), explain)
+
+async def score_customers_async(customer_ids, explain=False):
+    """score_customers without tying up a thread on feature I/O.
+
+    With the Redis reader the lookup is awaited on the event loop; only the
+    scoring runs on the bounded scoring pool.
+    """
+    if feature_cache is not None:
+        rows = await feature_cache.get_many_async(customer_ids, read_features_async)
+    else:
+        rows = await read_features_async(customer_ids)
+    return await asyncio.get_running_loop().run_in_executor(scoring_executor, score_records, customer_ids, rows, explain)
+
+async def read_features_async(customer_ids):
+    if redis_reader is not None:
+        return await redis_reader.read_records(customer_ids)
+    # The SDK blocks on Redis, so it gets the default I/O threads rather than the scoring pool
+    return await asyncio.get_running_loop().run_in_executor(None, fetch_online_features, customer_ids)
+
+def score_records(customer_ids, rows, explain=False):
+    """score_customers for feature dicts already looked up (None where a customer was not found)."""
+    results, scored = [], []
+    for customer_id, features in zip(customer_ids, rows):
+        result = {"customer_id": customer_id}
+        if features is None:
+            result.update(error="Customer not found", status_code=404)
+        elif encoder is not None and encoder.invalid_codes(features):
+            result.update(error=f"Unknown category codes for {encoder.invalid_codes(features)}", status_code=422)
+        else:
+            result["features"] = features
+            scored.append(result)
+        results.append(result)
+    
+    if scored:
+        # Float32 rows in FEATURE_COLUMNS order (absent features are 0), in this
+        # thread's reused buffer: X must not outlive the call
+        X = layout.matrix([result["features"] for result in scored])
+        explain = explain and explainer is not None
+        keys, outputs = result_cache.lookup(X, explain) if result_cache is not None else (None, [None] * len(scored))
+        # Only rows without a cached result go through the model and the explainer
+        todo = [i for i, output in enumerate(outputs) if output is None]
+        if todo:
+            X_todo = X if len(todo) == len(X) else X[todo]
+            probs = predictor.predict_proba(X_todo)
+            explanations = shap_dicts(X_todo) if explain else None
+            for k, i in enumerate(todo):
+                outputs[i] = {"probability": float(probs[k])}
+                if explanations is not None:
+                    outputs[i]["shap_values"] = explanations[k]
+            if result_cache is not None:
+                result_cache.save([keys[i] for i in todo], [outputs[i] for i in todo])
+        computed = set(todo)
+        for i, result in enumerate(scored):
+            result["probability"] = outputs[i]["probability"]
+            result["is_churn"] = outputs[i]["probability"] > 0.5
+            if explain:
+                result["shap_values"] = outputs[i]["shap_values"]
+            result["cached"] = i not in computed
+    return results
 
 @app.on_event("startup")
 def load_resources():
-    global model, store, explainer
+    global model, predictor, store, explainer, encoder, batcher, feature_cache, result_cache, layout
     print("Loading resources...")
     
     # 1. Load Feast Store
     store = FeatureStore(repo_path=FEATURE_REPO_PATH)
+    layout = FeatureLayout.from_feature_view(load_feature_view(FEATURE_REPO_PATH))
+    if FEATURE_CACHE_MAX_MB > 0:
+        ttl = float(FEATURE_CACHE_TTL_S) if FEATURE_CACHE_TTL_S else feature_view_ttl()
+        feature_cache = FeatureCache(ttl, int(FEATURE_CACHE_MAX_MB * 1024 * 1024))
+        print(f"Caching online features for {ttl} s, up to {FEATURE_CACHE_MAX_MB} MB.")
+    if RESULT_CACHE == "memory":
+        result_cache = ResultCache(MemoryResultStore(RESULT_CACHE_MAX_ENTRIES))
+    elif RESULT_CACHE == "redis":
+        result_cache = ResultCache(RedisResultStore(ttl_seconds=RESULT_CACHE_TTL_S))
     
     # 2. Load Model from MLflow
     mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
     try:
-        experiment = mlflow.get_experiment_by_name("churn-prediction-new")
-        if experiment:
-            runs = mlflow.search_runs(
-                experiment_ids=[experiment.experiment_id],
-                order_by=["start_time DESC"],
-                max_results=1
-            )
-            if not runs.empty:
-                run_id = runs.iloc[0].run_id
-                model_uri = f"runs:/{run_id}/model"
-                model = mlflow.xgboost.load_model(model_uri)
-                print(f"Model loaded from run: {run_id}")
-                
-                # 3. Initialize SHAP Explainer
-                # For XGBoost, we can use TreeExplainer
-                explainer = shap.TreeExplainer(model)
-                print("SHAP Explainer initialized.")
+        # Only the latest run ID comes from the tracking server; artifacts are
+        # served from the local model cache after the first download
+        run_id = model_cache.latest_run_id("churn-prediction-new")
+        if run_id is not None:
+            model = model_cache.load_model(run_id)
+            print(f"Model loaded from run: {run_id}")
+            # Results of any previous model no longer apply
+            if result_cache is not None:
+                result_cache.set_model(run_id)
+            predictor = load_run_predictor(run_id, PREDICTOR_BACKEND, model.get_booster)
+            print(f"Predictor backend: {PREDICTOR_BACKEND}")
+            
+            # Vocabularies used to encode raw requests and validate Feast codes
+            try:
+                encoder_path = model_cache.cached_artifact(run_id, ENCODER_FILENAME)
+                encoder = CategoryEncoder.load(encoder_path)
+                print("Category encoder loaded.")
+            except Exception as e:
+                print(f"Category encoder not available for run {run_id}: {e}")
+            
+            # 3. Initialize SHAP Explainer
+            # For XGBoost, we can use TreeExplainer
+            explainer = shap.TreeExplainer(model)
+            print("SHAP Explainer initialized.")
     except Exception as e:
         print(f"Error loading model or explainer: {e}")
+    
+    # 4. Start the micro-batcher
+    if MICROBATCH_MAX_SIZE > 0:
+        batcher = MicroBatcher(lambda customer_ids: score_customers(customer_ids, explain=True),
+                               MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS)
+        print(f"Micro-batching up to {MICROBATCH_MAX_SIZE} requests or {MICROBATCH_MAX_WAIT_MS} ms.")
+
+@app.on_event("startup")
+async def start_feature_reader():
+    global redis_reader, event_loop
+    event_loop = asyncio.get_running_loop()
+    if FEATURE_READER == "redis":
+        redis_reader = AsyncRedisFeatureReader(max_connections=REDIS_MAX_CONNECTIONS)
+        print(f"Reading online features directly from Redis ({REDIS_MAX_CONNECTIONS} connections).")
+
+@app.on_event("shutdown")
+async def stop_feature_reader():
+    if redis_reader is not None:
+        await redis_reader.close()
 
 @app.get("/health")
 def health_check():
     return {
         "status": "healthy", 
         "model_loaded": model is not None, 
+        "predictor_backend": PREDICTOR_BACKEND if predictor is not None else None,
         "feast_connected": store is not None,
-        "explainer_ready": explainer is not None
+        "feature_reader": FEATURE_READER,
+        "explainer_ready": explainer is not None,
+        "encoder_loaded": encoder is not None,
+        "micro_batching": batcher.stats() if batcher is not None else None,
+        "feature_cache": feature_cache.stats() if feature_cache is not None else None,
+        "result_cache": result_cache.stats() if result_cache is not None else None
     }
 
 @app.get("/predict/{customer_id}")
-def predict(customer_id: int):
-    if model is None or store is None:
+async def predict(customer_id: int):
+    if predictor is None or store is None:
         raise HTTPException(status_code=503, detail="Model or Feature Store not initialized")
     
     try:
-        # 1. Fetch Features from Feast
-        feature_vector = store.get_online_features(
-            features=[
-                "churn_features:Age", "churn_features:Gender", "churn_features:Tenure",
-                "churn_features:Usage Frequency", "churn_features:Support Calls",
-                "churn_features:Payment Delay", "churn_features:Subscription Type",
-                "churn_features:Contract Length", "churn_features:Total Spend",
-                "churn_features:Last Interaction"
-            ],
-            entity_rows=[{"customer_id": customer_id}]
-        ).to_dict()
-        
-        # Check if data exists
-        if feature_vector.get('Age') is None and feature_vector.get('churn_features:Age') is None:
-            raise HTTPException(status_code=404, detail="Customer not found")
-            
-        # 2. Prepare Data
-        inference_features = {}
-        for k, v in feature_vector.items():
-            clean_key = k.split(":")[-1]
-            inference_features[clean_key] = v[0]
-            
-        expected_cols = [
-            "Age", "Gender", "Tenure", "Usage Frequency", "Support Calls", 
-            "Payment Delay", "Subscription Type", "Contract Length", 
-            "Total Spend", "Last Interaction"
-        ]
-        
-        df = pd.DataFrame([inference_features])
-        for col in expected_cols:
-            if col not in df.columns:
-                df[col] = 0
-        df = df[expected_cols]
-        
-        # 3. Predict
-        if hasattr(model, "predict_proba"):
-            prob = model.predict_proba(df)[0][1]
+        if batcher is not None:
+            # Coalesced with concurrent requests into one lookup and model call
+            result = await asyncio.wrap_future(batcher.submit(customer_id))
         else:
-            dtest = xgb.DMatrix(df)
-            prob = model.predict(dtest)[0]
-            
-        # 4. Calculate SHAP values
-        shap_explanation = {}
-        if explainer is not None:
-            shap_values = explainer.shap_values(df)
-            # shap_values is an array of shape (1, n_features)
-            # We convert it to a dictionary mapping feature name to SHAP value
-            for i, col in enumerate(expected_cols):
-                shap_explanation[col] = float(shap_values[0][i])
-            
+            result = (await score_customers_async([customer_id], explain=True))[0]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if "error" in result:
+        raise HTTPException(status_code=result["status_code"], detail=result["error"])
+    result.setdefault("shap_values", {})
+    return result
+
+@app.post("/predict/batch")
+async def predict_batch(request: BatchRequest):
+    """Scores many customers at once; customers that cannot be scored get an error entry."""
+    if predictor is None or store is None:
+        raise HTTPException(status_code=503, detail="Model or Feature Store not initialized")
+    if len(request.customer_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH_SIZE} customer IDs per batch")
+    if not request.customer_ids:
+        return {"results": [], "n_scored": 0, "n_failed": 0}
+    
+    try:
+        results = await score_customers_async(request.customer_ids, request.explain)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    n_scored = sum("error" not in result for result in results)
+    return {"results": results, "n_scored": n_scored, "n_failed": len(results) - n_scored}
+
+@app.post("/features/invalidate")
+def invalidate_features(request: Optional[InvalidateRequest] = None):
+    """Drops cached feature vectors (all, or the given customers); called after materialization."""
+    customer_ids = request.customer_ids if request is not None else None
+    dropped = feature_cache.invalidate(customer_ids) if feature_cache is not None else 0
+    return {"invalidated": dropped}
+
+@app.post("/predict/raw")
+def predict_raw(request: RawFeatures):
+    """Scores raw (unencoded) feature values, e.g. {"Gender": "Female", ...}."""
+    if predictor is None or encoder is None:
+        raise HTTPException(status_code=503, detail="Model or category encoder not initialized")
+    
+    encoded = encoder.encode_record(request.features)
+    invalid = encoder.invalid_codes(encoded)
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"Unknown categories for {invalid}")
+    
+    try:
+        prob = predictor.predict_proba(layout.matrix([encoded]))[0]
         return {
-            "customer_id": customer_id,
-            "features": inference_features,
+            "features": encoded,
             "probability": float(prob),
-            "is_churn": bool(prob > 0.5),
-            "shap_values": shap_explanation
+            "is_churn": bool(prob > 0.5)
         }
-        
-    except HTTPException:
-        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
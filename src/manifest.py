@@ -0,0 +1,118 @@
+import glob
+import hashlib
+import json
+import os
+
+MANIFEST_FILENAME = "processing_manifest.json"
+HASH_BLOCK_SIZE = 1 << 20
+
+def file_digests(path, prefix_size=None):
+    """Returns (sha256 of the first prefix_size bytes, sha256 of the whole file, prefix ends with a newline)."""
+    full = hashlib.sha256()
+    prefix_digest = None
+    prefix_newline = False
+    read = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            if prefix_size is not None and read < prefix_size <= read + len(block):
+                cut = prefix_size - read
+                prefix = full.copy()
+                prefix.update(block[:cut])
+                prefix_digest = prefix.hexdigest()
+                prefix_newline = block[cut - 1:cut] == b"\n"
+            full.update(block)
+            read += len(block)
+    return prefix_digest, full.hexdigest(), prefix_newline
+
+def plan_input(input_path, entry=None):
+    """Decides how much of a raw file still has to be processed.
+
+    Returns a task dict whose ``action`` is one of:
+      - "skip":    content unchanged since the last run
+      - "append":  the old content is an unchanged prefix; only bytes from
+                   ``offset`` onwards (the new rows) are processed
+      - "new":     file not seen before
+      - "changed": content was rewritten; its old outputs must be replaced
+    Runs in worker processes, so it only touches the file itself.
+    """
+    stat = os.stat(input_path)
+    task = {
+        "path": input_path,
+        "key": os.path.abspath(input_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "offset": 0,
+    }
+    # Same size and mtime: trust it without re-hashing the whole history
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        task.update(action="skip", sha256=entry["sha256"])
+        return task
+    
+    prefix_size = entry["size"] if entry and 0 < entry["size"] < stat.st_size else None
+    prefix_digest, digest, prefix_newline = file_digests(input_path, prefix_size)
+    task["sha256"] = digest
+    if entry is None:
+        task["action"] = "new"
+    elif digest == entry["sha256"]:
+        task["action"] = "skip"
+    elif prefix_digest == entry["sha256"] and prefix_newline:
+        task.update(action="append", offset=entry["size"])
+    else:
+        task["action"] = "changed"
+    return task
+
+class ProcessingManifest:
+    """Record of the raw inputs already in the processed dataset.
+
+    For every input file it stores size, mtime, content hash, the number of
+    rows written and one segment per processing run (byte range, row range
+    and the basename of the part files it produced). Incremental runs use it
+    to process only new files and appended bytes.
+    """
+
+    def __init__(self, output_path, files=None):
+        self.path = os.path.join(output_path, MANIFEST_FILENAME)
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, output_path):
+        path = os.path.join(output_path, MANIFEST_FILENAME)
+        if not os.path.exists(path):
+            return cls(output_path)
+        with open(path) as f:
+            return cls(output_path, json.load(f)["files"])
+
+    def segment_basename(self, task):
+        # Unique per input file and segment, so appended data never overwrites earlier parts
+        entry = self.files.get(task["key"]) if task["action"] == "append" else None
+        file_id = hashlib.sha1(task["key"].encode("utf-8")).hexdigest()[:8]
+        return f"part-{file_id}-{len(entry['segments']) if entry else 0:05d}"
+
+    def remove_outputs(self, task, dataset_path):
+        """Deletes the part files previously produced from a changed input."""
+        entry = self.files.get(task["key"])
+        for segment in (entry or {}).get("segments", []):
+            for file_path in glob.glob(os.path.join(dataset_path, "**", f"{segment['basename']}.parquet"), recursive=True):
+                os.remove(file_path)
+
+    def record(self, task, basename=None, n_rows=0):
+        entry = self.files.get(task["key"])
+        if entry is None or task["action"] in ("new", "changed"):
+            entry = {"rows": 0, "segments": []}
+        if basename is not None:
+            entry["segments"].append({
+                "basename": basename,
+                "byte_range": [task["offset"], task["size"]],
+                "row_range": [entry["rows"], entry["rows"] + n_rows],
+            })
+            entry["rows"] += n_rows
+        entry.update(size=task["size"], mtime_ns=task["mtime_ns"], sha256=task["sha256"])
+        self.files[task["key"]] = entry
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump({"files": self.files}, f, indent=2)
+        return self.path
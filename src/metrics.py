@@ -0,0 +1,289 @@
+import math
+import numpy as np
+
+# Binary classification metrics computed from one probability vector. The
+# scores are sorted once; confusion counts at any threshold are then a lookup
+# into cumulative label sums, so the threshold sweep, ROC-AUC and every
+# bootstrap resample reuse the same sort instead of re-predicting or re-sorting.
+
+DEFAULT_THRESHOLD = 0.5
+# Metrics where a smaller value is better
+LOWER_IS_BETTER = {"logloss"}
+SWEEP_THRESHOLDS = np.round(np.linspace(0.05, 0.95, 19), 2)
+LOGLOSS_EPS = 1e-15
+# Replicates per bincount when accumulating bootstrap histograms (bounds its temporaries)
+BOOTSTRAP_BLOCK_ELEMENTS = 1 << 22
+
+def _poisson_table(size=1 << 16):
+    # Poisson(1) quantile of each of ``size`` equally likely slots: the counts get
+    # their Poisson(1) probabilities to within 1 / size
+    cdf = np.cumsum([math.exp(-1) / math.factorial(k) for k in range(20)])
+    return np.searchsorted(cdf, (np.arange(size) + 0.5) / size, side="right").astype(np.float32)
+
+POISSON_TABLE = _poisson_table()
+
+class _SortedScores:
+    def __init__(self, y_true, proba):
+        y_true = np.asarray(y_true, dtype=np.float64)
+        proba = np.asarray(proba, dtype=np.float64)
+        order = np.argsort(-proba, kind="stable")
+        self.y = y_true[order]
+        self.neg_p = -proba[order]
+        p = np.clip(proba[order], LOGLOSS_EPS, 1 - LOGLOSS_EPS)
+        self.loss = -(self.y * np.log(p) + (1 - self.y) * np.log1p(-p))
+        # Last position of each run of tied scores; ROC points only exist between ties
+        self.group_ends = np.r_[np.flatnonzero(np.diff(self.neg_p)), len(self.y) - 1]
+    
+    def metrics(self, weights=None, thresholds=(DEFAULT_THRESHOLD,)):
+        w = np.ones_like(self.y) if weights is None else weights
+        cum_pos = np.r_[0.0, np.cumsum(w * self.y)]
+        cum_neg = np.r_[0.0, np.cumsum(w * (1 - self.y))]
+        n_pos, n_neg = cum_pos[-1], cum_neg[-1]
+        
+        # A row is predicted positive when proba > threshold
+        k = np.searchsorted(self.neg_p, -np.asarray(thresholds, dtype=np.float64), side="left")
+        tp, fp = cum_pos[k], cum_neg[k]
+        fn, tn = n_pos - tp, n_neg - fp
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+            recall = np.where(n_pos > 0, tp / n_pos, 0.0)
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        
+        tps = np.r_[0.0, cum_pos[self.group_ends + 1]]
+        fps = np.r_[0.0, cum_neg[self.group_ends + 1]]
+        auc = np.sum(np.diff(fps) * (tps[1:] + tps[:-1]) / 2) / (n_pos * n_neg) if n_pos and n_neg else np.nan
+        return {
+            "accuracy": (tp + tn) / (n_pos + n_neg),
+            "precision": precision,
+            "recall": recall,
+            "f1": f1,
+            "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+            "roc_auc": auc,
+            "logloss": np.dot(w, self.loss) / w.sum(),
+        }
+
+def binary_score(y_true, proba, metric):
+    """A single metric at the default threshold (cheaper than a full evaluate_binary report)."""
+    return float(np.ravel(_SortedScores(y_true, proba).metrics()[metric])[0])
+
+def calibration_bins(y_true, proba, n_bins=10):
+    """Mean predicted probability vs observed positive rate per equal-width bin."""
+    y_true = np.asarray(y_true, dtype=np.float64)
+    proba = np.asarray(proba, dtype=np.float64)
+    bins = np.minimum((proba * n_bins).astype(np.int64), n_bins - 1)
+    count = np.bincount(bins, minlength=n_bins)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "bin_upper": np.arange(1, n_bins + 1) / n_bins,
+            "count": count,
+            "mean_proba": np.bincount(bins, weights=proba, minlength=n_bins) / count,
+            "positive_rate": np.bincount(bins, weights=y_true, minlength=n_bins) / count,
+        }
+
+def evaluate_binary(y_true, proba, threshold=DEFAULT_THRESHOLD, thresholds=SWEEP_THRESHOLDS,
+                    n_bins=10, n_bootstrap=0, alpha=0.05, seed=42):
+    """Computes every metric for one vector of positive-class probabilities.
+
+    Returns a dict with the scalar ``metrics`` at ``threshold``, the 2x2
+    ``confusion`` matrix (rows actual, columns predicted), a ``threshold_sweep``,
+    ``calibration`` bins and, when ``n_bootstrap`` > 0, percentile confidence
+    intervals in ``ci``. Bootstrap resamples are drawn as per-row weights over
+    the already sorted scores.
+    """
+    scores = _SortedScores(y_true, proba)
+    point = scores.metrics(thresholds=[threshold])
+    metrics = {k: float(np.ravel(v)[0]) for k, v in point.items()}
+    confusion = np.array([[metrics["tn"], metrics["fp"]], [metrics["fn"], metrics["tp"]]], dtype=np.int64)
+    
+    sweep = scores.metrics(thresholds=thresholds)
+    report = {
+        "metrics": {k: metrics[k] for k in ("accuracy", "precision", "recall", "f1", "roc_auc", "logloss")},
+        "confusion": confusion,
+        "threshold_sweep": {"threshold": np.asarray(thresholds),
+                            **{k: sweep[k] for k in ("accuracy", "precision", "recall", "f1")}},
+        "calibration": calibration_bins(y_true, proba, n_bins),
+        "ci": {},
+    }
+    
+    if n_bootstrap:
+        rng = np.random.default_rng(seed)
+        n = len(scores.y)
+        samples = {k: [] for k in report["metrics"]}
+        for _ in range(n_bootstrap):
+            weights = np.bincount(rng.integers(0, n, n), minlength=n).astype(np.float64)
+            resampled = scores.metrics(weights, thresholds=[threshold])
+            for k in samples:
+                samples[k].append(float(np.ravel(resampled[k])[0]))
+        report["ci"] = {k: (float(np.nanquantile(v, alpha / 2)), float(np.nanquantile(v, 1 - alpha / 2)))
+                        for k, v in samples.items()}
+    return report
+
+def report_to_dict(report):
+    """JSON-serialisable copy of an evaluate_binary report."""
+    def convert(value):
+        if isinstance(value, dict):
+            return {k: convert(v) for k, v in value.items()}
+        if isinstance(value, tuple):
+            return [convert(v) for v in value]
+        if isinstance(value, np.ndarray):
+            return [None if isinstance(v, float) and np.isnan(v) else v for v in value.tolist()]
+        return value
+    return convert(report)
+
+def log_report(run_logger, report, prefix):
+    """Logs the scalar metrics, their confidence intervals and the full report as JSON."""
+    run_logger.log_metrics({f"{prefix}_{k}": v for k, v in report["metrics"].items()})
+    for k, (low, high) in report["ci"].items():
+        run_logger.log_metrics({f"{prefix}_{k}_ci_low": low, f"{prefix}_{k}_ci_high": high})
+    run_logger.log_dict(report_to_dict(report), f"{prefix}_metrics.json")
+
+class PoissonBootstrap:
+    """Poisson(1) bootstrap weights for streamed batches, one row per replicate.
+
+    Weights are looked up from uniform uint16 draws in POISSON_TABLE, which is
+    an order of magnitude cheaper than Generator.poisson. Drawing once per
+    batch and passing the same weights to several StreamingBinaryMetrics gives
+    their intervals paired resamples.
+    """
+
+    def __init__(self, n_bootstrap, seed=42):
+        self.n_bootstrap = n_bootstrap
+        self.rng = np.random.default_rng(seed)
+
+    def draw(self, n):
+        """A (n_bootstrap, n) float32 weight matrix."""
+        return POISSON_TABLE[self.rng.integers(0, len(POISSON_TABLE), (self.n_bootstrap, n), dtype=np.uint16)]
+
+class StreamingBinaryMetrics:
+    """Accumulates the evaluate_binary report batch by batch in bounded memory.
+
+    Confusion counts, logloss and calibration are exact. ROC-AUC comes from
+    per-class histograms of ``score_bins`` equal-width score bins (scores in
+    the same bin count as ties), so memory does not grow with the number of
+    rows. Bootstrap intervals use the Poisson bootstrap: every row gets a
+    Poisson(1) weight per replicate as it streams past. ``update`` draws the
+    weights itself unless it is given ``bootstrap_weights`` from a shared
+    PoissonBootstrap, which is how several models are compared on the same
+    resamples without drawing them once per model.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, thresholds=SWEEP_THRESHOLDS, n_bins=10,
+                 score_bins=65536, n_bootstrap=0, bootstrap_score_bins=1024, alpha=0.05, seed=42):
+        self.threshold = threshold
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.n_bins = n_bins
+        self.score_bins = score_bins
+        self.alpha = alpha
+        self.n_rows = 0
+        self.loss_sum = 0.0
+        self.pos_hist = np.zeros(score_bins)
+        self.neg_hist = np.zeros(score_bins)
+        # Predicted-positive counts per threshold; index 0 is ``threshold``
+        self.tp = np.zeros(len(self.thresholds) + 1)
+        self.fp = np.zeros(len(self.thresholds) + 1)
+        self.calibration_count = np.zeros(n_bins)
+        self.calibration_proba = np.zeros(n_bins)
+        self.calibration_pos = np.zeros(n_bins)
+        
+        self.n_bootstrap = n_bootstrap
+        self.bootstrap_score_bins = bootstrap_score_bins
+        self.bootstrap = PoissonBootstrap(n_bootstrap, seed)
+        self.boot_pos_hist = np.zeros((n_bootstrap, bootstrap_score_bins))
+        self.boot_neg_hist = np.zeros((n_bootstrap, bootstrap_score_bins))
+        self.boot_tp = np.zeros(n_bootstrap)
+        self.boot_fp = np.zeros(n_bootstrap)
+        self.boot_loss = np.zeros(n_bootstrap)
+
+    def update(self, y_true, proba, bootstrap_weights=None):
+        y = np.asarray(y_true, dtype=np.float64)
+        proba = np.asarray(proba, dtype=np.float64)
+        p = np.clip(proba, LOGLOSS_EPS, 1 - LOGLOSS_EPS)
+        loss = -(y * np.log(p) + (1 - y) * np.log1p(-p))
+        self.n_rows += len(y)
+        self.loss_sum += loss.sum()
+        
+        bins = np.minimum((proba * self.score_bins).astype(np.int64), self.score_bins - 1)
+        self.pos_hist += np.bincount(bins, weights=y, minlength=self.score_bins)
+        self.neg_hist += np.bincount(bins, weights=1 - y, minlength=self.score_bins)
+        
+        predicted = proba[:, None] > np.r_[self.threshold, self.thresholds][None, :]
+        self.tp += y @ predicted
+        self.fp += (1 - y) @ predicted
+        
+        calibration = np.minimum((proba * self.n_bins).astype(np.int64), self.n_bins - 1)
+        self.calibration_count += np.bincount(calibration, minlength=self.n_bins)
+        self.calibration_proba += np.bincount(calibration, weights=proba, minlength=self.n_bins)
+        self.calibration_pos += np.bincount(calibration, weights=y, minlength=self.n_bins)
+        
+        if self.n_bootstrap:
+            weights = self.bootstrap.draw(len(y)) if bootstrap_weights is None else bootstrap_weights
+            self._update_bootstrap(weights, y, proba, predicted[:, 0], loss)
+
+    def _update_bootstrap(self, weights, y, proba, positive, loss):
+        """Adds one batch to every replicate; ``weights`` is (n_bootstrap, rows)."""
+        # Weighted tp, fp and loss of all replicates in one matrix product
+        columns = np.stack([y * positive, (1 - y) * positive, loss], axis=1).astype(np.float32)
+        tp, fp, loss_sum = (weights @ columns).T
+        self.boot_tp += tp
+        self.boot_fp += fp
+        self.boot_loss += loss_sum
+        
+        # Score histograms of all replicates with one bincount per block of replicates:
+        # positives land in bins [0, bins) and negatives in [bins, 2 * bins) of their replicate's row
+        bins = self.bootstrap_score_bins
+        coarse = np.minimum((proba * bins).astype(np.int64), bins - 1)
+        slot = coarse + bins * (y == 0)
+        block = max(1, BOOTSTRAP_BLOCK_ELEMENTS // max(len(y), 1))
+        for start in range(0, self.n_bootstrap, block):
+            w = weights[start:start + block]
+            index = (np.arange(len(w))[:, None] * 2 * bins + slot).ravel()
+            counts = np.bincount(index, weights=w.ravel(), minlength=len(w) * 2 * bins).reshape(len(w), 2, bins)
+            self.boot_pos_hist[start:start + block] += counts[:, 0]
+            self.boot_neg_hist[start:start + block] += counts[:, 1]
+
+    @staticmethod
+    def _scores(tp, fp, pos_hist, neg_hist, loss_sum):
+        """Metrics from (possibly per-replicate) counts and score histograms."""
+        n_pos, n_neg = pos_hist.sum(axis=-1), neg_hist.sum(axis=-1)
+        fn, tn = n_pos - tp, n_neg - fp
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+            recall = np.where(n_pos > 0, tp / n_pos, 0.0)
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+            # Positives scored above each bin, plus half of the ties inside it
+            pos_above = np.cumsum(pos_hist[..., ::-1], axis=-1)[..., ::-1] - pos_hist
+            auc = np.sum(neg_hist * (pos_above + pos_hist / 2), axis=-1) / (n_pos * n_neg)
+            return {
+                "accuracy": (tp + tn) / (n_pos + n_neg),
+                "precision": precision,
+                "recall": recall,
+                "f1": f1,
+                "roc_auc": auc,
+                "logloss": loss_sum / (n_pos + n_neg),
+            }
+
+    def report(self):
+        """Same layout as evaluate_binary."""
+        scores = self._scores(self.tp, self.fp, self.pos_hist, self.neg_hist, self.loss_sum)
+        metrics = {k: float(np.ravel(v)[0]) for k, v in scores.items()}
+        n_pos, n_neg = self.pos_hist.sum(), self.neg_hist.sum()
+        tp, fp = self.tp[0], self.fp[0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            report = {
+                "metrics": metrics,
+                "confusion": np.array([[n_neg - fp, fp], [n_pos - tp, tp]], dtype=np.int64),
+                "threshold_sweep": {"threshold": self.thresholds,
+                                    **{k: scores[k][1:] for k in ("accuracy", "precision", "recall", "f1")}},
+                "calibration": {
+                    "bin_upper": np.arange(1, self.n_bins + 1) / self.n_bins,
+                    "count": self.calibration_count.astype(np.int64),
+                    "mean_proba": self.calibration_proba / self.calibration_count,
+                    "positive_rate": self.calibration_pos / self.calibration_count,
+                },
+                "ci": {},
+            }
+        if self.n_bootstrap:
+            samples = self._scores(self.boot_tp, self.boot_fp, self.boot_pos_hist, self.boot_neg_hist, self.boot_loss)
+            report["ci"] = {k: (float(np.nanquantile(samples[k], self.alpha / 2)),
+                                float(np.nanquantile(samples[k], 1 - self.alpha / 2))) for k in metrics}
+        return report
@@ -0,0 +1,156 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import mlflow
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.store.artifact.artifact_repository_registry import get_artifact_repository
+from mlflow.tracking import MlflowClient
+
+# Limits of a single MlflowClient.log_batch request
+MAX_METRICS_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+
+class AsyncRunLogger:
+    """Non-blocking logging for one MLflow run.
+
+    Metrics, params and tags are queued and sent with ``log_batch`` (one HTTP
+    call per ~1000 values instead of one each), either every
+    ``flush_interval`` seconds from a background thread or on ``flush()``.
+    Artifacts are copied to a staging directory and uploaded on a thread pool,
+    so the caller can overwrite or delete the local file right away.
+    ``close()`` (or leaving the ``with`` block) waits for everything and
+    re-raises the first error.
+    """
+
+    def __init__(self, run_id, client=None, flush_interval=5.0, artifact_workers=4, artifact_uri=None):
+        self.run_id = run_id
+        self.client = client or MlflowClient()
+        # Resolved once up front so uploads never need a get_run of their own
+        artifact_uri = artifact_uri or self.client.get_run(run_id).info.artifact_uri
+        self._artifact_repo = get_artifact_repository(artifact_uri, tracking_uri=self.client.tracking_uri)
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._metrics, self._params, self._tags = [], [], []
+        self._errors = []
+        self._uploads = ThreadPoolExecutor(max_workers=artifact_workers, thread_name_prefix="mlflow-upload")
+        self._pending_uploads = []
+        self._staging_dir = tempfile.mkdtemp(prefix="mlflow-staging-")
+        self._stop = threading.Event()
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_periodically, args=(flush_interval,), daemon=True)
+            self._flusher.start()
+
+    @classmethod
+    def for_active_run(cls, **kwargs):
+        return cls(mlflow.active_run().info.run_id, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Don't mask an exception raised inside the block with a logging error
+        try:
+            self.close()
+        except Exception:
+            if exc_type is None:
+                raise
+
+    def log_metric(self, key, value, step=0):
+        with self._lock:
+            self._metrics.append(Metric(key, float(value), int(time.time() * 1000), step))
+
+    def log_metrics(self, metrics, step=0):
+        timestamp = int(time.time() * 1000)
+        with self._lock:
+            self._metrics.extend(Metric(k, float(v), timestamp, step) for k, v in metrics.items())
+
+    def log_param(self, key, value):
+        with self._lock:
+            self._params.append(Param(key, str(value)))
+
+    def log_params(self, params):
+        with self._lock:
+            self._params.extend(Param(k, str(v)) for k, v in params.items())
+
+    def set_tag(self, key, value):
+        with self._lock:
+            self._tags.append(RunTag(key, str(value)))
+
+    def log_artifact(self, local_path, artifact_path=None):
+        staged = os.path.join(tempfile.mkdtemp(dir=self._staging_dir), os.path.basename(os.path.normpath(local_path)))
+        if os.path.isdir(local_path):
+            shutil.copytree(local_path, staged)
+            upload = self._artifact_repo.log_artifacts
+            # log_artifacts uploads the directory contents, so keep its name in the artifact path
+            artifact_path = "/".join(p for p in (artifact_path, os.path.basename(staged)) if p)
+        else:
+            shutil.copy2(local_path, staged)
+            upload = self._artifact_repo.log_artifact
+        self._pending_uploads.append(self._uploads.submit(upload, staged, artifact_path))
+
+    def log_dict(self, dictionary, artifact_file):
+        """Uploads ``dictionary`` as a JSON artifact named ``artifact_file``."""
+        staged = os.path.join(tempfile.mkdtemp(dir=self._staging_dir), os.path.basename(artifact_file))
+        with open(staged, "w") as f:
+            json.dump(dictionary, f, indent=2)
+        artifact_path = os.path.dirname(artifact_file) or None
+        self._pending_uploads.append(self._uploads.submit(self._artifact_repo.log_artifact, staged, artifact_path))
+
+    def start_child_run(self, run_name, flush_interval=None):
+        """Creates a nested run under this one and returns its logger."""
+        experiment_id = self.client.get_run(self.run_id).info.experiment_id
+        run = self.client.create_run(experiment_id, run_name=run_name, tags={"mlflow.parentRunId": self.run_id})
+        return AsyncRunLogger(run.info.run_id, client=self.client, flush_interval=flush_interval,
+                              artifact_uri=run.info.artifact_uri)
+
+    def flush(self):
+        with self._lock:
+            metrics, params, tags = self._metrics, self._params, self._tags
+            self._metrics, self._params, self._tags = [], [], []
+        # Batches are sent in order, never concurrently with the background flusher
+        with self._send_lock:
+            while metrics or params or tags:
+                self.client.log_batch(
+                    self.run_id,
+                    metrics=metrics[:MAX_METRICS_PER_BATCH],
+                    params=params[:MAX_PARAMS_PER_BATCH],
+                    tags=tags[:MAX_TAGS_PER_BATCH],
+                )
+                metrics = metrics[MAX_METRICS_PER_BATCH:]
+                params = params[MAX_PARAMS_PER_BATCH:]
+                tags = tags[MAX_TAGS_PER_BATCH:]
+
+    def _flush_periodically(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                self._errors.append(e)
+
+    def close(self, status=None):
+        """Flushes queued values, waits for uploads and optionally terminates the run."""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        try:
+            self.flush()
+        except Exception as e:
+            self._errors.append(e)
+        for future in self._pending_uploads:
+            try:
+                future.result()
+            except Exception as e:
+                self._errors.append(e)
+        self._pending_uploads = []
+        self._uploads.shutdown()
+        shutil.rmtree(self._staging_dir, ignore_errors=True)
+        if status is not None:
+            self.client.set_terminated(self.run_id, status)
+        if self._errors:
+            raise self._errors[0]
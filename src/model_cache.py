@@ -0,0 +1,188 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import mlflow
+import mlflow.xgboost
+
+# Local on-disk cache for MLflow run artifacts (models, encoders, predictors).
+# A run's artifacts never change once logged, so after the first download a
+# (run_id, artifact path) pair is served from disk without contacting MLflow
+# or MinIO. Downloads are stored by the SHA-256 of their content, so identical
+# artifacts logged by different runs share one copy. The total size is capped
+# and the least recently used entries are evicted. Only resolving which run to
+# load (the latest run, an alias) talks to the tracking server, and the last
+# answer is remembered for when it cannot be reached.
+#
+#   <root>/objects/<sha256>/<name>   artifact file or directory
+#   <root>/index.json                refs, object sizes/last use, resolved refs
+
+DEFAULT_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "churn-models"))
+DEFAULT_MAX_BYTES = int(float(os.environ.get("MODEL_CACHE_MAX_MB", 2048)) * 1024 * 1024)
+
+def download_run_artifact(run_id, artifact_path, dst_path):
+    return mlflow.artifacts.download_artifacts(artifact_uri=f"runs:/{run_id}/{artifact_path}", dst_path=dst_path)
+
+def content_hash(path):
+    """SHA-256 over the relative names and bytes of every file under ``path``."""
+    digest = hashlib.sha256()
+    if os.path.isfile(path):
+        files = [(os.path.basename(path), path)]
+    else:
+        files = sorted((os.path.relpath(os.path.join(d, f), path), os.path.join(d, f))
+                       for d, _, names in os.walk(path) for f in names)
+    for name, file_path in files:
+        digest.update(name.encode() + b"\0")
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def tree_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, names in os.walk(path) for f in names)
+
+class ModelCache:
+    """Content-addressed, size-bounded LRU cache of run artifacts.
+
+    ``fetch(run_id, artifact_path, dst_dir)`` downloads an artifact and returns
+    its local path; it defaults to MLflow and can be swapped (e.g. in tests).
+    An flock on the index serialises processes sharing the cache directory.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, fetch=download_run_artifact):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fetch = fetch
+        self.objects_dir = os.path.join(root, "objects")
+        self.index_path = os.path.join(root, "index.json")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.hits = self.misses = 0
+
+    def _locked(self):
+        lock = open(os.path.join(self.root, ".lock"), "w")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {"refs": {}, "objects": {}, "resolved": {}}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def _save_index(self, index):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def _object_path(self, index, digest):
+        return os.path.join(self.objects_dir, digest, index["objects"][digest]["name"])
+
+    def get(self, run_id, artifact_path):
+        """Local path of a run artifact, downloading it on the first request."""
+        key = f"{run_id}/{artifact_path}"
+        with self._locked():
+            index = self._load_index()
+            digest = index["refs"].get(key)
+            if digest in index["objects"] and os.path.exists(self._object_path(index, digest)):
+                self.hits += 1
+                index["objects"][digest]["last_used"] = time.time()
+                self._save_index(index)
+                return self._object_path(index, digest)
+
+            self.misses += 1
+            staging = tempfile.mkdtemp(dir=self.root, prefix="download-")
+            try:
+                local_path = self.fetch(run_id, artifact_path, staging)
+                digest = content_hash(local_path)
+                name = os.path.basename(os.path.normpath(local_path))
+                object_dir = os.path.join(self.objects_dir, digest)
+                if not os.path.exists(object_dir):
+                    os.makedirs(object_dir)
+                    os.replace(local_path, os.path.join(object_dir, name))
+                    index["objects"][digest] = {"name": name, "size": tree_size(os.path.join(object_dir, name))}
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+            index["refs"][key] = digest
+            index["objects"][digest]["last_used"] = time.time()
+            self._evict(index, keep=digest)
+            self._save_index(index)
+            return self._object_path(index, digest)
+
+    def _evict(self, index, keep):
+        total = sum(entry["size"] for entry in index["objects"].values())
+        for digest, entry in sorted(index["objects"].items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            print(f"Evicting cached artifact {entry['name']} ({entry['size'] / 1e6:.1f} MB)")
+            shutil.rmtree(os.path.join(self.objects_dir, digest), ignore_errors=True)
+            del index["objects"][digest]
+            index["refs"] = {k: v for k, v in index["refs"].items() if v != digest}
+            total -= entry["size"]
+
+    def resolve(self, ref, lookup):
+        """Runs ``lookup()`` to map ``ref`` (e.g. "@staging") to a run ID, remembering the answer.
+
+        If the tracking server cannot be reached, the last answer is used.
+        """
+        try:
+            run_id = lookup()
+        except Exception as e:
+            with self._locked():
+                run_id = self._load_index()["resolved"].get(ref)
+            if run_id is None:
+                raise
+            print(f"Could not resolve {ref} ({e}); using cached run {run_id}")
+            return run_id
+        if run_id is not None:
+            with self._locked():
+                index = self._load_index()
+                index["resolved"][ref] = run_id
+                self._save_index(index)
+        return run_id
+
+_default_cache = None
+
+def get_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ModelCache()
+    return _default_cache
+
+def latest_run_id(experiment_name, cache=None):
+    """ID of the newest run in an experiment (None if there is none)."""
+    def lookup():
+        experiment = mlflow.get_experiment_by_name(experiment_name)
+        if experiment is None:
+            return None
+        runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id], order_by=["start_time DESC"],
+                                  max_results=1)
+        return None if runs.empty else runs.iloc[0].run_id
+    return (cache or get_cache()).resolve(f"latest:{experiment_name}", lookup)
+
+def alias_run_id(model_name, alias, cache=None):
+    """Run ID behind a registered model alias (None if the alias is not set)."""
+    def lookup():
+        try:
+            return mlflow.tracking.MlflowClient().get_model_version_by_alias(model_name, alias).run_id
+        except mlflow.exceptions.MlflowException as e:
+            # Unknown model or alias; anything else (e.g. server unreachable) falls back to the cache
+            if e.error_code in ("RESOURCE_DOES_NOT_EXIST", "INVALID_PARAMETER_VALUE"):
+                return None
+            raise
+    return (cache or get_cache()).resolve(f"{model_name}@{alias}", lookup)
+
+def load_model(run_id, artifact_path="model", cache=None):
+    """The run's XGBoost model, loaded from the local cache."""
+    return mlflow.xgboost.load_model((cache or get_cache()).get(run_id, artifact_path))
+
+def cached_artifact(run_id, path, cache=None):
+    """Local path of any other run artifact (encoder, predictors, ...)."""
+    return (cache or get_cache()).get(run_id, path)
@@ -1,13 +1,16 @@
 import argparse
 import json
-import pandas as pd
 import mlflow
-import mlflow.xgboost
-import xgboost as xgb
 import sys
 import os
 from feast import FeatureStore
 
+import model_cache
+from encoders import CategoryEncoder, ENCODER_FILENAME
+from feature_schema import FEATURE_COLUMNS, FEATURE_VIEW_NAME
+from predictors import BACKENDS, DEFAULT_BACKEND, FeatureLayout, load_run_predictor
+from redis_features import RedisFeatureReader
+
 # Set environment variables for MinIO access
 os.environ["MLFLOW_S3_ENDPOINT_URL"] = "http://127.0.0.1:9000"
 os.environ["AWS_ACCESS_KEY_ID"] = "minioadmin"
@@ -17,18 +20,13 @@ os.environ["AWS_REGION"] = "us-east-1"
 # Set MLflow Tracking URI
 mlflow.set_tracking_uri("http://localhost:5000")
 FEATURE_REPO_PATH = "feature_repo"
+LAYOUT = FeatureLayout(FEATURE_COLUMNS, FEATURE_VIEW_NAME)
 
 def get_online_features(customer_id):
     try:
         store = FeatureStore(repo_path=FEATURE_REPO_PATH)
         feature_vector = store.get_online_features(
-            features=[
-                "churn_features:Age", "churn_features:Gender", "churn_features:Tenure",
-                "churn_features:Usage Frequency", "churn_features:Support Calls",
-                "churn_features:Payment Delay", "churn_features:Subscription Type",
-                "churn_features:Contract Length", "churn_features:Total Spend",
-                "churn_features:Last Interaction"
-            ],
+            features=LAYOUT.refs,
             entity_rows=[{"customer_id": customer_id}]
         ).to_dict()
         
@@ -46,46 +44,53 @@ def get_online_features(customer_id):
         print(f"Feast Error: {e}", file=sys.stderr)
         return None
 
-def load_model():
+def get_redis_features(customer_id):
+    # Feast's Redis layout read directly, without the SDK's registry and protobuf overhead
     try:
-        # Fallback: Find latest run in experiment
-        experiment = mlflow.get_experiment_by_name("churn-prediction-new")
-        if experiment is None:
-            return None
-            
-        runs = mlflow.search_runs(
-            experiment_ids=[experiment.experiment_id],
-            order_by=["start_time DESC"],
-            max_results=1
-        )
-        
-        if runs.empty:
-            return None
-            
-        run_id = runs.iloc[0].run_id
-        model_uri = f"runs:/{run_id}/model"
-        
-        # Use xgboost loader
-        return mlflow.xgboost.load_model(model_uri)
+        reader = RedisFeatureReader()
+        try:
+            return reader.read_records([customer_id])[0]
+        finally:
+            reader.close()
+    except Exception as e:
+        print(f"Redis Error: {e}", file=sys.stderr)
+        return None
+
+def latest_run():
+    try:
+        # Latest run in the experiment; its artifacts are downloaded only the first time
+        return model_cache.latest_run_id("churn-prediction-new")
+    except Exception as e:
+        print(f"Error resolving the latest run: {e}", file=sys.stderr)
+        return None
+
+def load_encoder(run_id):
+    try:
+        encoder_path = model_cache.cached_artifact(run_id, ENCODER_FILENAME)
+        return CategoryEncoder.load(encoder_path)
     except Exception as e:
-        print(f"Error loading model: {e}", file=sys.stderr)
+        print(f"Category encoder not available for run {run_id}: {e}", file=sys.stderr)
         return None
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--customer_id", type=int, required=True, help="Customer ID")
+    parser.add_argument("--backend", type=str, choices=BACKENDS,
+                        default=os.environ.get("PREDICTOR_BACKEND", DEFAULT_BACKEND), help="Scoring backend")
+    parser.add_argument("--reader", type=str, choices=["feast", "redis"],
+                        default=os.environ.get("FEATURE_READER", "feast"), help="Online feature source")
     args = parser.parse_args()
 
     try:
         # 1. Fetch Features
-        features = get_online_features(args.customer_id)
+        features = get_redis_features(args.customer_id) if args.reader == "redis" else get_online_features(args.customer_id)
         if features is None:
             print(json.dumps({"error": "Customer not found"}))
             return
 
-        # 2. Load Model
-        model = load_model()
-        if model is None:
+        # 2. Find the model's run
+        run_id = latest_run()
+        if run_id is None:
             print(json.dumps({"error": "Model could not be loaded"}))
             return
 
@@ -96,26 +101,20 @@ def main():
             clean_key = k.split(":")[-1]
             inference_features[clean_key] = v
         
-        # Ensure column order
-        expected_cols = [
-            "Age", "Gender", "Tenure", "Usage Frequency", "Support Calls", 
-            "Payment Delay", "Subscription Type", "Contract Length", 
-            "Total Spend", "Last Interaction"
-        ]
+        # Feast returns the codes written by process_data; make sure they belong
+        # to the vocabularies the model was trained with
+        encoder = load_encoder(run_id)
+        if encoder is not None:
+            invalid = encoder.invalid_codes(inference_features)
+            if invalid:
+                print(json.dumps({"error": f"Unknown category codes for {invalid}"}))
+                return
         
-        df = pd.DataFrame([inference_features])
-        # Add missing cols with 0
-        for col in expected_cols:
-            if col not in df.columns:
-                df[col] = 0
-        df = df[expected_cols]
-
-        # 4. Predict
-        if hasattr(model, "predict_proba"):
-            prob = model.predict_proba(df)[0][1]
-        else:
-            dtest = xgb.DMatrix(df)
-            prob = model.predict(dtest)[0]
+        # 4. Predict on a float32 row in training column order (missing cols are 0);
+        # the MLflow model is only loaded if the run has no exported predictor
+        predictor = load_run_predictor(run_id, args.backend,
+                                       lambda: model_cache.load_model(run_id).get_booster())
+        prob = predictor.predict_proba(LAYOUT.matrix([inference_features]))[0]
             
         # 5. Output Result (Features + Prediction)
         result = {
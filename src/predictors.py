@@ -0,0 +1,253 @@
+import json
+import math
+import os
+import threading
+import numpy as np
+import xgboost as xgb
+
+import model_cache
+from feature_schema import FEATURE_COLUMNS
+
+# Interchangeable scoring backends for the trained model. All of them take a
+# float32 matrix in FEATURE_COLUMNS order (NaN = missing) and return the
+# churn probability per row, so serving skips pandas and DMatrix construction:
+#   xgboost  Booster.inplace_predict on the native model
+#   tree     the trees flattened into NumPy arrays, evaluated for all rows and
+#            trees at once one depth level at a time
+#   onnx     an ONNX export run by onnxruntime (needs onnxmltools/onnxruntime)
+# train.py exports every available backend under the "predictors" artifact.
+
+PREDICTORS_ARTIFACT = "predictors"
+BACKENDS = ["xgboost", "tree", "onnx"]
+DEFAULT_BACKEND = "xgboost"
+
+def features_to_matrix(records, columns=FEATURE_COLUMNS):
+    """Stacks feature dicts into a new float32 matrix; absent features are 0, None is missing."""
+    return FeatureLayout(columns).fill(records, np.empty((len(records), len(columns)), dtype=np.float32))
+
+class FeatureLayout:
+    """The model's input columns, compiled once so requests go straight to a float32 matrix.
+
+    ``index`` maps both the bare feature names and the "<view>:<feature>"
+    references returned by Feast to column positions. ``matrix(records)``
+    fills a float32 buffer owned by the calling thread and reused by its next
+    call, so the result must be consumed (predict, explain, copy) before then.
+    """
+
+    def __init__(self, columns=FEATURE_COLUMNS, feature_view_name=None):
+        self.columns = list(columns)
+        self.refs = [f"{feature_view_name}:{col}" for col in self.columns] if feature_view_name else list(self.columns)
+        self.index = {name: j for names in (self.columns, self.refs) for j, name in enumerate(names)}
+        self._local = threading.local()
+
+    @classmethod
+    def from_feature_view(cls, feature_view, columns=FEATURE_COLUMNS):
+        names = [field.name for field in feature_view.schema]
+        if sorted(names) != sorted(columns):
+            raise ValueError(f"FeatureView {feature_view.name} features {names} do not match the model columns {columns}")
+        return cls(columns, feature_view.name)
+
+    def fill(self, records, out):
+        """Writes one row per feature dict into ``out`` (absent features are 0, None is NaN).
+
+        Values are written in place through ``index``, so keys may be bare names
+        or Feast references, other keys (e.g. the entity) are skipped, and no
+        per-request rows or lists are built.
+        """
+        index = self.index
+        out[:] = 0
+        for i, record in enumerate(records):
+            for name, value in record.items():
+                j = index.get(name)
+                if j is not None:
+                    out[i, j] = math.nan if value is None else value
+        return out
+
+    def buffer(self, n):
+        """The calling thread's n x columns float32 buffer; it grows to the largest batch seen."""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or buffer.shape[0] < n:
+            buffer = self._local.buffer = np.empty((max(n, 1), len(self.columns)), dtype=np.float32)
+        return buffer[:n]
+
+    def matrix(self, records):
+        return self.fill(records, self.buffer(len(records)))
+
+class XGBoostPredictor:
+    name = "xgboost"
+    filename = "model.ubj"
+
+    def __init__(self, booster):
+        self.booster = booster
+
+    @classmethod
+    def from_booster(cls, booster):
+        return cls(booster)
+
+    def predict_proba(self, X):
+        return self.booster.inplace_predict(X, validate_features=False)
+
+    def save(self, directory):
+        self.booster.save_model(os.path.join(directory, self.filename))
+
+    @classmethod
+    def load(cls, directory):
+        return cls(xgb.Booster(model_file=os.path.join(directory, cls.filename)))
+
+class TreeArrayPredictor:
+    """The boosted trees as flat node arrays, evaluated with vectorised NumPy.
+
+    Nodes of all trees are concatenated; leaves point to themselves, so after
+    ``max_depth`` steps every (row, tree) cursor sits on a leaf whatever path
+    it took. Rows with a missing value follow each node's default direction,
+    as XGBoost does.
+    """
+    name = "tree"
+    filename = "trees.npz"
+
+    def __init__(self, roots, left, right, feature, threshold, default_left, value, max_depth, base_margin):
+        self.roots = roots
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.value = value
+        self.max_depth = int(max_depth)
+        self.base_margin = float(base_margin)
+
+    @classmethod
+    def from_booster(cls, booster):
+        model = json.loads(booster.save_raw("json"))["learner"]
+        if model["objective"]["name"] != "binary:logistic":
+            raise ValueError(f"Unsupported objective {model['objective']['name']}")
+        # base_score is stored in probability space, e.g. "[4.66E-1]"
+        base_score = float(model["learner_model_param"]["base_score"].strip("[]"))
+
+        roots, left, right, feature, threshold, default_left = [], [], [], [], [], []
+        max_depth = offset = 0
+        for tree in model["gradient_booster"]["model"]["trees"]:
+            tree_left = np.asarray(tree["left_children"], dtype=np.int32)
+            tree_right = np.asarray(tree["right_children"], dtype=np.int32)
+            nodes = np.arange(len(tree_left), dtype=np.int32)
+            is_leaf = tree_left == -1
+            roots.append(offset)
+            left.append(np.where(is_leaf, nodes, tree_left) + offset)
+            right.append(np.where(is_leaf, nodes, tree_right) + offset)
+            feature.append(np.where(is_leaf, 0, tree["split_indices"]))
+            # A leaf's split_condition holds its value
+            threshold.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            max_depth = max(max_depth, cls._depth(tree_left, tree_right))
+            offset += len(tree_left)
+
+        threshold = np.concatenate(threshold)
+        is_leaf = np.concatenate(left) == np.arange(offset)
+        return cls(
+            np.asarray(roots, dtype=np.int32), np.concatenate(left), np.concatenate(right),
+            np.concatenate(feature).astype(np.int32), threshold, np.concatenate(default_left),
+            np.where(is_leaf, threshold, 0).astype(np.float32), max_depth,
+            np.log(base_score / (1 - base_score)),
+        )
+
+    @staticmethod
+    def _depth(left, right):
+        depth, level = 0, [0]
+        while True:
+            level = [child for node in level for child in (left[node], right[node]) if child != -1]
+            if not level:
+                return depth
+            depth += 1
+
+    def predict_proba(self, X):
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.default_left[node], x < self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        margin = self.value[node].sum(axis=1, dtype=np.float64) + self.base_margin
+        return (1 / (1 + np.exp(-margin))).astype(np.float32)
+
+    def save(self, directory):
+        np.savez(os.path.join(directory, self.filename), roots=self.roots, left=self.left, right=self.right,
+                 feature=self.feature, threshold=self.threshold, default_left=self.default_left,
+                 value=self.value, max_depth=self.max_depth, base_margin=self.base_margin)
+
+    @classmethod
+    def load(cls, directory):
+        with np.load(os.path.join(directory, cls.filename)) as arrays:
+            return cls(**{k: arrays[k] for k in arrays.files})
+
+class OnnxPredictor:
+    name = "onnx"
+    filename = "model.onnx"
+
+    def __init__(self, model_bytes):
+        import onnxruntime
+        self.model_bytes = model_bytes
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model_bytes, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        # Outputs are [label, probabilities]
+        self.output_name = self.session.get_outputs()[1].name
+
+    @classmethod
+    def from_booster(cls, booster):
+        from onnxmltools import convert_xgboost
+        from onnxmltools.convert.common.data_types import FloatTensorType
+        model = xgb.XGBClassifier()
+        model.load_model(bytearray(booster.save_raw("json")))
+        onnx_model = convert_xgboost(model, initial_types=[("input", FloatTensorType([None, len(FEATURE_COLUMNS)]))])
+        return cls(onnx_model.SerializeToString())
+
+    def predict_proba(self, X):
+        return self.session.run([self.output_name], {self.input_name: X})[0][:, 1]
+
+    def save(self, directory):
+        with open(os.path.join(directory, self.filename), "wb") as f:
+            f.write(self.model_bytes)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, cls.filename), "rb") as f:
+            return cls(f.read())
+
+PREDICTOR_CLASSES = {cls.name: cls for cls in (XGBoostPredictor, TreeArrayPredictor, OnnxPredictor)}
+
+def export_predictors(booster, directory, backends=BACKENDS):
+    """Writes each backend to ``directory/<backend>``; returns the names exported.
+
+    Backends whose optional dependencies are missing are skipped.
+    """
+    exported = []
+    for backend in backends:
+        try:
+            predictor = PREDICTOR_CLASSES[backend].from_booster(booster)
+        except ImportError as e:
+            print(f"Skipping {backend} predictor: {e}")
+            continue
+        backend_dir = os.path.join(directory, backend)
+        os.makedirs(backend_dir, exist_ok=True)
+        predictor.save(backend_dir)
+        exported.append(backend)
+    return exported
+
+def load_predictor(directory, backend=DEFAULT_BACKEND):
+    """Loads a backend exported by export_predictors (``directory`` is the predictors root)."""
+    return PREDICTOR_CLASSES[backend].load(os.path.join(directory, backend))
+
+def load_run_predictor(run_id, backend, load_booster):
+    """Loads a run's exported backend via the model cache.
+
+    Runs logged before predictors existed rebuild it from the Booster returned
+    by ``load_booster()``, which is only called then, so callers that do not
+    need the full model otherwise never deserialize it.
+    """
+    try:
+        path = model_cache.cached_artifact(run_id, f"{PREDICTORS_ARTIFACT}/{backend}")
+        return PREDICTOR_CLASSES[backend].load(path)
+    except Exception as e:
+        print(f"No exported {backend} predictor for run {run_id} ({e}); building it from the model.")
+        return PREDICTOR_CLASSES[backend].from_booster(load_booster())
@@ -1,13 +1,43 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import argparse
-from sklearn.model_selection import train_test_split
+import glob
 import os
+import shutil
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
-def load_data(file_path):
+from dataset import DATASET_DIRNAME, DEFAULT_ROW_GROUP_SIZE, PartitionedParquetWriter
+from encoders import CategoryEncoder, ENCODER_FILENAME
+from feature_schema import CATEGORICAL_COLUMNS, TIMESTAMP_COLUMN, dtype_plan
+from manifest import ProcessingManifest, plan_input
+from profiling import peak_rss_mb
+
+def load_data(file_path, names=None, source=None):
+    # source: an open file to read instead of file_path (e.g. from open_raw)
     print(f"Loading data from {file_path}")
-    return pd.read_csv(file_path)
+    return pd.read_csv(file_path if source is None else source, names=names)
+
+def read_header(input_path):
+    return pd.read_csv(input_path, nrows=0).columns.tolist()
+
+def open_raw(input_path, offset=0):
+    """Opens a raw CSV at a byte offset, returning (file, column names).
 
-def clean_data(df):
+    Past the header, rows are read without one, so the column names from the
+    first line are passed back for pd.read_csv(names=...); at offset 0 the
+    names are None and the header is read as usual.
+    """
+    names = read_header(input_path) if offset else None
+    source = open(input_path, "rb")
+    source.seek(offset)
+    return source, names
+
+def clean_data(df, encoder, dtypes=None):
     print("Cleaning data...")
     
     # Drop rows where Churn is NaN
@@ -16,8 +46,7 @@ def clean_data(df):
     # Basic preprocessing
     # The dataset uses 'Total Spend' instead of 'TotalCharges'
     if 'Total Spend' in df.columns:
-        df['Total Spend'] = pd.to_numeric(df['Total Spend'], errors='coerce')
-        df['Total Spend'].fillna(0, inplace=True)
+        df['Total Spend'] = pd.to_numeric(df['Total Spend'], errors='coerce').fillna(0)
     
     # Binary encoding for target
     # The dataset 'Churn' column might already be numeric (0/1) or 'Yes'/'No'
@@ -34,38 +63,284 @@ def clean_data(df):
     if 'customer_id' in df.columns:
         df['customer_id'] = df['customer_id'].astype(int)
 
-    # Simple encoding for categorical variables
-    categorical_cols = df.select_dtypes(include=['object']).columns
-    for col in categorical_cols:
-        if col != 'customer_id': # Keep entity key as is
-            df[col] = df[col].astype('category').cat.codes
+    # Encode categorical variables with the vocabulary fitted on every input
+    # (fit_encoder), never on this frame alone, so codes agree across chunks,
+    # input files, training and serving
+    encoder.transform(df)
+    
+    # Narrow columns to the storage dtypes of the Feast schema (see dtype_plan)
+    if dtypes:
+        df = df.astype({col: dtype for col, dtype in dtypes.items() if col in df.columns})
             
     return df
 
-def save_data(df, output_path, prefix):
+def add_event_timestamp(df, event_timestamp, dtypes=None):
+    # Added after clean_data, so it is narrowed here rather than with the other columns
+    df[TIMESTAMP_COLUMN] = event_timestamp
+    if dtypes and TIMESTAMP_COLUMN in dtypes:
+        df[TIMESTAMP_COLUMN] = df[TIMESTAMP_COLUMN].astype(dtypes[TIMESTAMP_COLUMN])
+    return df
+
+def parquet_column_sizes(df):
+    buffer = pa.BufferOutputStream()
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buffer)
+    metadata = pq.ParquetFile(pa.BufferReader(buffer.getvalue())).metadata
+    sizes = dict.fromkeys(df.columns, 0)
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        for j in range(row_group.num_columns):
+            column = row_group.column(j)
+            sizes[column.path_in_schema] += column.total_compressed_size
+    return sizes
+
+def report_dtype_savings(input_path, event_timestamp, encoder, dtypes, offset=0, n_rows=10000):
+    # Measured on a sample so the report costs the same for any input size.
+    # The baseline is the frame as read (categories still strings, int64 and
+    # float64 columns), before encoding and the dtype plan. The sample starts
+    # at ``offset``, so an incremental run measures the rows it appends
+    source, names = open_raw(input_path, offset)
+    with source:
+        raw = pd.read_csv(source, names=names, nrows=n_rows)
+    sample = clean_data(raw.copy(), CategoryEncoder())
+    sample[TIMESTAMP_COLUMN] = event_timestamp.as_unit("ns")
+    compact = add_event_timestamp(clean_data(raw, encoder, dtypes), event_timestamp, dtypes)
+    mem_before = sample.memory_usage(index=False, deep=True)
+    mem_after = compact.memory_usage(index=False, deep=True)
+    file_before = parquet_column_sizes(sample)
+    file_after = parquet_column_sizes(compact)
+    
+    print(f"Dtype plan savings on a {len(sample)}-row sample (bytes/row):")
+    print(f"{'column':<20}{'dtype':>44}{'memory':>16}{'parquet':>16}")
+    for col in sample.columns:
+        dtype = f"{sample[col].dtype}->{compact[col].dtype}"
+        memory = f"{mem_before[col] / len(sample):.1f}->{mem_after[col] / len(sample):.1f}"
+        parquet = f"{file_before[col] / len(sample):.2f}->{file_after[col] / len(sample):.2f}"
+        print(f"{col:<20}{dtype:>44}{memory:>16}{parquet:>16}")
+    print(f"{'total':<20}{'':>44}"
+          f"{mem_before.sum() / len(sample):>7.1f}->{mem_after.sum() / len(sample):<7.1f}"
+          f"{sum(file_before.values()) / len(sample):>8.2f}->{sum(file_after.values()) / len(sample):<6.2f}")
+
+def resolve_inputs(input_spec):
+    """Expands a CSV file, a directory of CSV files or a glob pattern into a sorted list of paths."""
+    if os.path.isdir(input_spec):
+        paths = glob.glob(os.path.join(input_spec, "*.csv"))
+    else:
+        paths = glob.glob(input_spec)
+    if not paths:
+        raise FileNotFoundError(f"No input files match {input_spec}")
+    return sorted(paths)
+
+def read_categories(input_path, offset=0, chunksize=None):
+    # Only the categorical columns are read, so this pass is cheap even for large inputs
+    source, names = open_raw(input_path, offset)
+    values = {col: set() for col in CATEGORICAL_COLUMNS}
+    with source:
+        reader = pd.read_csv(source, names=names, usecols=CATEGORICAL_COLUMNS, chunksize=chunksize)
+        for chunk in ([reader] if chunksize is None else reader):
+            for col in CATEGORICAL_COLUMNS:
+                values[col].update(chunk[col].dropna().unique())
+    return values
+
+def fit_encoder(input_paths, output_path, encoder_path=None, chunksize=None, pool=None, offsets=None):
+    # Start from an existing encoder (e.g. the training vocabulary) so known
+    # values keep their codes; unseen values are appended to the vocabulary
+    encoder = CategoryEncoder.load(encoder_path) if encoder_path else CategoryEncoder()
+    print(f"Fitting category vocabularies on {len(input_paths)} file(s)")
+    # Values from all files are merged before they are added, so the codes do
+    # not depend on file order or on which worker saw a value first
+    mapper = pool.map if pool is not None else map
+    merged = {col: set() for col in CATEGORICAL_COLUMNS}
+    offsets = offsets or [0] * len(input_paths)
+    for values in mapper(partial(read_categories, chunksize=chunksize), input_paths, offsets):
+        for col, col_values in values.items():
+            merged[col].update(col_values)
+    for col, col_values in merged.items():
+        encoder.add_values(col, col_values)
+    
     os.makedirs(output_path, exist_ok=True)
-    file_path = os.path.join(output_path, f"{prefix}_churn.parquet")
-    print(f"Saving {prefix} data to {file_path}")
-    df.to_parquet(file_path, index=False)
-    return file_path
+    file_path = os.path.join(output_path, ENCODER_FILENAME)
+    print(f"Saving category encoder to {file_path}")
+    encoder.save(file_path)
+    return encoder
+
+# Resolution of the hash split, i.e. test_ratio is honoured to 1/SPLIT_BUCKETS
+SPLIT_BUCKETS = 10000
+
+def match_code_dtypes(dtypes, dataset_path):
+    """Keeps the category code dtypes of the partitions already in ``dataset_path``.
+
+    Readers take the dataset schema from its files, so new partitions must use
+    the same code types. Codes that no longer fit them would wrap around, so
+    that is an error: the dataset has to be reprocessed without --incremental.
+    """
+    if not os.path.exists(dataset_path):
+        return dtypes
+    schema = ds.dataset(dataset_path, format="parquet", partitioning="hive").schema
+    dtypes = dict(dtypes)
+    for col in CATEGORICAL_COLUMNS:
+        if col not in schema.names:
+            continue
+        existing = np.dtype(schema.field(col).type.to_pandas_dtype()).name
+        if np.iinfo(dtypes[col]).max > np.iinfo(existing).max:
+            raise ValueError(f"{col} now has more categories than its {existing} codes in {dataset_path} can hold; "
+                             "reprocess without --incremental")
+        dtypes[col] = existing
+    return dtypes
+
+def hash_split(customer_ids, test_ratio=0.2):
+    """Returns a boolean mask that is True for rows assigned to the test split.
+
+    The assignment depends only on the customer id, so it can be computed one
+    chunk at a time and a customer stays in the same split when rows are added,
+    removed or reordered.
+    """
+    # hash_pandas_object uses a fixed key, so hashes are stable across runs and machines
+    hashes = pd.util.hash_pandas_object(customer_ids, index=False).to_numpy()
+    return hashes % np.uint64(SPLIT_BUCKETS) < np.uint64(round(test_ratio * SPLIT_BUCKETS))
+
+def write_splits(writer, df, test_ratio):
+    # Partition by split and event date; the date partition lets Feast and
+    # incremental jobs skip whole days without reading them
+    split = np.where(hash_split(df['customer_id'], test_ratio), "test", "train")
+    event_date = df['event_timestamp'].dt.strftime("%Y-%m-%d").to_numpy()
+    for (split_value, date_value), part in df.groupby([split, event_date], sort=False):
+        writer.write(part, split=split_value, event_date=date_value)
+
+def report_throughput(n_rows, start_time):
+    elapsed = time.perf_counter() - start_time
+    rows_per_sec = n_rows / elapsed if elapsed > 0 else float("inf")
+    print(f"Processed {n_rows} rows in {elapsed:.2f}s ({rows_per_sec:,.0f} rows/s), "
+          f"peak RSS {peak_rss_mb():.1f} MB")
+
+def process_full(input_path, source, writer, event_timestamp, encoder, dtypes, test_ratio, names=None):
+    df = load_data(input_path, names, source)
+    df = clean_data(df, encoder, dtypes)
+    
+    # Add timestamp for Feast if needed, using current time for simplicity (UTC)
+    df = add_event_timestamp(df, event_timestamp, dtypes)
+    
+    write_splits(writer, df, test_ratio)
+    return len(df)
+
+def process_chunked(input_path, source, writer, event_timestamp, encoder, dtypes, chunksize, test_ratio, names=None):
+    # Only one chunk (plus its train/test slices) is alive at a time, so peak
+    # memory depends on chunksize rather than on the size of the input file
+    print(f"Streaming data from {input_path} in chunks of {chunksize} rows")
+    n_rows = 0
+    for chunk in pd.read_csv(source, names=names, chunksize=chunksize):
+        chunk = clean_data(chunk, encoder, dtypes)
+        chunk = add_event_timestamp(chunk, event_timestamp, dtypes)
+        
+        write_splits(writer, chunk, test_ratio)
+        n_rows += len(chunk)
+    return n_rows
+
+def process_file(input_path, offset, basename, dataset_path, event_timestamp, encoder, dtypes,
+                 chunksize, test_ratio, writer_options):
+    # Runs in a worker process; each input file (segment) gets its own part
+    # files in the shared dataset, so workers never write to the same file
+    source, names = open_raw(input_path, offset)
+    writer = PartitionedParquetWriter(dataset_path, basename=basename, **writer_options)
+    try:
+        if chunksize:
+            return process_chunked(input_path, source, writer, event_timestamp, encoder, dtypes, chunksize,
+                                   test_ratio, names)
+        return process_full(input_path, source, writer, event_timestamp, encoder, dtypes, test_ratio, names)
+    finally:
+        writer.close()
+        source.close()
 
 def main():
     parser = argparse.ArgumentParser(description="Process data for Churn Prediction")
-    parser.add_argument("--input", type=str, required=True, help="Path to raw data")
+    parser.add_argument("--input", type=str, required=True,
+                        help="Raw data: a CSV file, a directory of CSV files or a glob pattern")
     parser.add_argument("--output", type=str, required=True, help="Path to save processed data")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream the input in chunks of this many rows to bound memory usage")
+    parser.add_argument("--encoder", type=str, default=None,
+                        help="Existing category encoder to extend (e.g. the one fitted on the training data)")
+    parser.add_argument("--test_ratio", type=float, default=0.2,
+                        help="Fraction of customers assigned to the test split (by hash of customer_id)")
+    parser.add_argument("--row_group_size", type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                        help="Maximum rows per Parquet row group (smaller groups prune better)")
+    parser.add_argument("--bloom_filter", action="store_true",
+                        help="Write a Parquet bloom filter on customer_id")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes used to clean input files in parallel (default: one per CPU)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only process new files and rows appended since the last run, appending to the dataset")
     args = parser.parse_args()
 
-    df = load_data(args.input)
-    df = clean_data(df)
+    input_paths = resolve_inputs(args.input)
+    workers = min(args.workers or os.cpu_count() or 1, len(input_paths))
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    mapper = pool.map if pool is not None else map
+    print(f"Found {len(input_paths)} input file(s), using {workers} worker(s)")
+
+    start_time = time.perf_counter()
+    event_timestamp = pd.Timestamp.now(tz='UTC')
     
-    # Add timestamp for Feast if needed, using current time for simplicity (UTC)
-    df['event_timestamp'] = pd.Timestamp.now(tz='UTC')
+    # Train and test rows are written once, as partitions of a single dataset
+    dataset_path = os.path.join(args.output, DATASET_DIRNAME)
+    encoder_path = args.encoder
+    if args.incremental:
+        manifest = ProcessingManifest.load(args.output)
+        # Keep extending the vocabulary the existing partitions were encoded with
+        existing_encoder = os.path.join(args.output, ENCODER_FILENAME)
+        if encoder_path is None and os.path.exists(existing_encoder):
+            encoder_path = existing_encoder
+    else:
+        manifest = ProcessingManifest(args.output)
+        if os.path.exists(dataset_path):
+            print(f"Replacing existing dataset {dataset_path}")
+            shutil.rmtree(dataset_path)
+    
+    tasks = list(mapper(plan_input, input_paths, [manifest.files.get(os.path.abspath(p)) for p in input_paths]))
+    pending = []
+    for task in tasks:
+        print(f"{task['action']:>8}: {task['path']}" + (f" from byte {task['offset']}" if task["offset"] else ""))
+        if task["action"] == "skip":
+            manifest.record(task)
+            continue
+        if task["action"] == "changed":
+            manifest.remove_outputs(task, dataset_path)
+        pending.append(task)
     
-    train_df, test_df = train_test_split(df, test_size=0.2, random_state=42)
+    if not pending:
+        print("No new input data to process.")
+        manifest.save()
+        if pool is not None:
+            pool.shutdown()
+        return
     
-    save_data(train_df, args.output, "train")
-    save_data(test_df, args.output, "test")
-    save_data(df, args.output, "data") # Full dataset for Feature Store
+    pending_paths = [task["path"] for task in pending]
+    offsets = [task["offset"] for task in pending]
+    encoder = fit_encoder(pending_paths, args.output, encoder_path, args.chunksize, pool, offsets)
+    dtypes = dtype_plan(encoder=encoder)
+    if args.incremental:
+        dtypes = match_code_dtypes(dtypes, dataset_path)
+    report_dtype_savings(pending_paths[0], event_timestamp, encoder, dtypes, offsets[0])
+
+    writer_options = {
+        "row_group_size": args.row_group_size,
+        "bloom_filter_columns": ["customer_id"] if args.bloom_filter else None,
+    }
+    
+    worker = partial(process_file, dataset_path=dataset_path, event_timestamp=event_timestamp,
+                     encoder=encoder, dtypes=dtypes, chunksize=args.chunksize,
+                     test_ratio=args.test_ratio, writer_options=writer_options)
+    basenames = [manifest.segment_basename(task) for task in pending]
+    try:
+        rows_per_task = list(mapper(worker, pending_paths, offsets, basenames))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    
+    for task, basename, n_rows in zip(pending, basenames, rows_per_task):
+        manifest.record(task, basename, n_rows)
+    print(f"Saving manifest to {manifest.save()}")
+
+    report_throughput(sum(rows_per_task), start_time)
 
 if __name__ == "__main__":
     main()
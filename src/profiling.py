@@ -0,0 +1,11 @@
+import resource
+import sys
+
+def peak_rss_mb():
+    # Largest of this process and its (finished) child processes.
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
@@ -0,0 +1,241 @@
+import math
+import operator
+import os
+import struct
+from itertools import compress, repeat
+import mmh3
+import numpy as np
+import redis
+import redis.asyncio as aioredis
+import yaml
+
+from feature_schema import ENTITY_COLUMN, FEATURE_COLUMNS, FEATURE_REPO_PATH, load_feature_view
+
+# Direct reader for the churn_features view in Feast's Redis online store.
+# Feast keeps one Redis hash per entity:
+#   key    serialize_entity_key(customer_id) + project name
+#   field  murmur3_32("<view>:<feature>") as 4 little-endian bytes, holding a
+#          serialized feast.types.Value; "_ts:<view>" holds the event time
+# The keys and field names are precomputed from feature_repo/, so a lookup is
+# one pipelined HMGET per entity and the values decode straight into a float32
+# matrix in FEATURE_COLUMNS order, without the SDK's registry lookups and
+# protobuf conversions. Like the SDK, values are returned whatever their age.
+# RedisFeatureReader is the blocking reader, AsyncRedisFeatureReader the asyncio one.
+
+# feast.value_type.ValueType
+STRING_TYPE = 2
+INT64_TYPE = 4
+
+# Wire tags of the feast.types.Value fields we store (field number << 3 | wire type)
+INT32_TAG = 0x18
+INT64_TAG = 0x20
+DOUBLE_TAG = 0x29
+FLOAT_TAG = 0x35
+BOOL_TAG = 0x38
+INTEGER_TAGS = [INT32_TAG, INT64_TAG, BOOL_TAG]
+
+# A serialized float_val: tag byte followed by a little-endian float32
+FLOAT_RECORD = np.dtype([("tag", "u1"), ("value", "<f4")])
+
+def load_repo_config(repo_path=FEATURE_REPO_PATH):
+    with open(os.path.join(repo_path, "feature_store.yaml")) as f:
+        return yaml.safe_load(f)
+
+def redis_connection_kwargs(connection_string):
+    """Parses Feast's "host:port,password=...,ssl=true,db=0" connection string."""
+    address, *options = connection_string.split(",")
+    host, _, port = address.partition(":")
+    kwargs = {"host": host or "localhost", "port": int(port or 6379)}
+    for option in options:
+        name, _, value = option.partition("=")
+        name = name.strip()
+        if name == "ssl":
+            kwargs["ssl"] = value.strip().lower() == "true"
+        elif name == "db":
+            kwargs["db"] = int(value)
+        elif name in ("password", "username"):
+            kwargs[name] = value
+    return kwargs
+
+def connection_pool(connection_string=None, max_connections=64, asyncio=False):
+    """Bounded Redis connection pool for the online store; callers wait when all connections are busy."""
+    module = aioredis if asyncio else redis
+    if connection_string is None:
+        connection_string = load_repo_config()["online_store"].get("connection_string", "localhost:6379")
+    kwargs = redis_connection_kwargs(connection_string)
+    if kwargs.pop("ssl", False):
+        kwargs["connection_class"] = module.SSLConnection
+    return module.BlockingConnectionPool(max_connections=max_connections, **kwargs)
+
+def field_hash(feature_view_name, feature):
+    return struct.pack("<I", mmh3.hash(f"{feature_view_name}:{feature}", signed=False))
+
+def _varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        value |= (byte & 0x7F) << shift
+        pos += 1
+        if byte < 0x80:
+            return value
+        shift += 7
+
+def decode_value(data):
+    """Decodes a serialized numeric feast.types.Value; a missing or null value is NaN."""
+    if not data:
+        return math.nan
+    tag = data[0]
+    if tag == FLOAT_TAG:
+        return struct.unpack_from("<f", data, 1)[0]
+    if tag == DOUBLE_TAG:
+        return struct.unpack_from("<d", data, 1)[0]
+    if tag in (INT64_TAG, INT32_TAG, BOOL_TAG):
+        value = _varint(data, 1)
+        # Negative integers are sign-extended to 64 bits
+        return value - (1 << 64) if value >= 1 << 63 else value
+    raise ValueError(f"Unsupported feature value encoding (tag {tag:#x})")
+
+def decode_column(values, out):
+    """Decodes one feature of many entities (none missing) into ``out``.
+
+    Columns where every value has the same simple encoding (all float32, or
+    all one-byte integers such as category codes) are decoded with one
+    frombuffer; anything else falls back to decode_value per value.
+    """
+    lengths = set(map(len, values))
+    if lengths == {5}:
+        record = np.frombuffer(b"".join(values), dtype=FLOAT_RECORD)
+        if (record["tag"] == FLOAT_TAG).all():
+            out[:] = record["value"]
+            return out
+    elif lengths == {2}:
+        record = np.frombuffer(b"".join(values), dtype=np.uint8).reshape(-1, 2)
+        if np.isin(record[:, 0], INTEGER_TAGS).all() and (record[:, 1] < 0x80).all():
+            out[:] = record[:, 1]
+            return out
+    out[:] = [decode_value(data) for data in values]
+    return out
+
+class RedisFeatureLayout:
+    """Precomputed Redis keys, hash fields and column order for one FeatureView."""
+
+    def __init__(self, feature_view, project, columns=FEATURE_COLUMNS):
+        names = [field.name for field in feature_view.schema]
+        if sorted(names) != sorted(columns):
+            raise ValueError(f"FeatureView {feature_view.name} features {names} do not match the model columns {columns}")
+        self.feature_view_name = feature_view.name
+        self.project = project.encode("utf8")
+        self.columns = list(columns)
+        # The customer entity's join key defaults to its name
+        self.join_key = feature_view.entities[0] if feature_view.entities else ENTITY_COLUMN
+        self.fields = [field_hash(feature_view.name, col) for col in self.columns]
+        dtypes = {field.name: field.dtype.to_value_type().name for field in feature_view.schema}
+        self.integer_columns = [col for col in self.columns if dtypes[col] in ("INT32", "INT64", "BOOL")]
+        join_key = self.join_key.encode("utf8")
+        # serialize_entity_key (version 3) of a single INT64 join key, minus the value
+        self._key_prefix = struct.pack("<III", 1, STRING_TYPE, len(join_key)) + join_key + struct.pack("<II", INT64_TYPE, 8)
+        self._key_suffix = self.project
+
+    @classmethod
+    def from_repo(cls, repo_path=FEATURE_REPO_PATH, columns=FEATURE_COLUMNS):
+        config = load_repo_config(repo_path)
+        if config.get("entity_key_serialization_version", 3) != 3:
+            raise ValueError("Only entity_key_serialization_version 3 is supported")
+        return cls(load_feature_view(repo_path), config["project"], columns)
+
+    def key(self, customer_id):
+        return self._key_prefix + struct.pack("<q", customer_id) + self._key_suffix
+
+    def decode(self, replies, out=None):
+        """Decodes one HMGET reply per entity into ``out`` (float32, n x columns).
+
+        Returns (matrix, found) where ``found`` marks entities with at least one
+        stored feature; features that are absent or null are NaN.
+        """
+        n = len(replies)
+        if out is None:
+            out = np.empty((n, len(self.columns)), dtype=np.float32)
+        # Customers without a hash in Redis get None for every field
+        missing = [None] * len(self.columns)
+        found = np.fromiter(map(operator.ne, replies, repeat(missing)), dtype=bool, count=n)
+        all_found = found.all()
+        rows = replies if all_found else list(compress(replies, found))
+        X = out[:n] if all_found else np.empty((len(rows), len(self.columns)), dtype=np.float32)
+        # Decode feature by feature: one column holds the same encoding for every entity
+        for j, values in enumerate(zip(*rows)):
+            if None not in values:
+                decode_column(values, X[:, j])
+                continue
+            # A feature absent for some customers is NaN; the others still decode together
+            present = np.fromiter(map(operator.is_not, values, repeat(None)), dtype=bool, count=len(values))
+            column = np.full(len(values), np.nan, dtype=np.float32)
+            column[present] = decode_column([data for data in values if data is not None],
+                                            np.empty(present.sum(), dtype=np.float32))
+            X[:, j] = column
+        if not all_found:
+            out[:n][found] = X
+            out[:n][~found] = np.nan
+        return out[:n], found
+
+    def to_records(self, customer_ids, X, found):
+        """Feature dicts shaped like FeatureStore.get_online_features().to_dict() rows (None if not found)."""
+        records = []
+        integer = [col in self.integer_columns for col in self.columns]
+        for customer_id, row, present in zip(customer_ids, X.tolist(), found):
+            if not present:
+                records.append(None)
+                continue
+            record = {self.join_key: customer_id}
+            for col, value, is_int in zip(self.columns, row, integer):
+                record[col] = None if value != value else (int(value) if is_int else value)
+            records.append(record)
+        return records
+
+class RedisFeatureReader:
+    """Reads churn_features for many customers with one pipelined HMGET round trip."""
+
+    def __init__(self, layout=None, connection_string=None, max_connections=64, client=None):
+        self.layout = layout or RedisFeatureLayout.from_repo()
+        self.client = client or redis.Redis(connection_pool=connection_pool(connection_string, max_connections))
+
+    def read(self, customer_ids, out=None):
+        """Returns (float32 feature matrix, found mask); ``out`` may be a preallocated buffer with at least as many rows."""
+        with self.client.pipeline(transaction=False) as pipe:
+            for customer_id in customer_ids:
+                pipe.hmget(self.layout.key(customer_id), self.layout.fields)
+            replies = pipe.execute()
+        return self.layout.decode(replies, out)
+
+    def read_records(self, customer_ids):
+        X, found = self.read(customer_ids)
+        return self.layout.to_records(customer_ids, X, found)
+
+    def close(self):
+        self.client.close()
+
+class AsyncRedisFeatureReader:
+    """Reads churn_features for many customers with one pipelined round trip on an asyncio Redis pool.
+
+    The pool holds at most ``max_connections`` connections; further concurrent
+    reads wait for a free one instead of opening more.
+    """
+
+    def __init__(self, layout=None, connection_string=None, max_connections=64, client=None):
+        self.layout = layout or RedisFeatureLayout.from_repo()
+        self.client = client or aioredis.Redis(connection_pool=connection_pool(connection_string, max_connections,
+                                                                                asyncio=True))
+
+    async def read(self, customer_ids, out=None):
+        """Returns (float32 feature matrix, found mask), as RedisFeatureReader.read."""
+        async with self.client.pipeline(transaction=False) as pipe:
+            for customer_id in customer_ids:
+                pipe.hmget(self.layout.key(customer_id), self.layout.fields)
+            replies = await pipe.execute()
+        return self.layout.decode(replies, out)
+
+    async def read_records(self, customer_ids):
+        X, found = await self.read(customer_ids)
+        return self.layout.to_records(customer_ids, X, found)
+
+    async def close(self):
+        await self.client.aclose()
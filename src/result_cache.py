@@ -0,0 +1,119 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+import redis
+
+from redis_features import connection_pool
+
+# Cache of scoring results for the inference server. An unchanged customer
+# scored by the same model gets the same probability and SHAP values, and
+# SHAP costs far more than the prediction, so results are stored under
+# (model run ID, hash of the float32 feature row). A new model means new keys;
+# the in-process store is also emptied when the model changes. The Redis store
+# is shared by every server replica and keeps entries for ``ttl_seconds``.
+
+def row_hashes(X):
+    """Digest of each float32 feature row (NaN-safe: it hashes the bytes)."""
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    return [hashlib.blake2b(row.tobytes(), digest_size=16).hexdigest() for row in X]
+
+class MemoryResultStore:
+    """LRU dict of at most ``max_entries`` results."""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        with self._lock:
+            values = []
+            for key in keys:
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+                values.append(value)
+            return values
+
+    def set_many(self, items):
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class RedisResultStore:
+    """Results as JSON strings in Redis (the online store instance by default), one MGET per batch."""
+
+    def __init__(self, client=None, ttl_seconds=86400, prefix="churn:prediction:"):
+        self.client = client or redis.Redis(connection_pool=connection_pool())
+        self.ttl = ttl_seconds
+        self.prefix = prefix
+
+    def get_many(self, keys):
+        values = self.client.mget([self.prefix + key for key in keys])
+        return [None if value is None else json.loads(value) for value in values]
+
+    def set_many(self, items):
+        with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+            pipe.execute()
+
+    def clear(self):
+        # Other replicas may still serve the previous model; its keys simply expire
+        pass
+
+class ResultCache:
+    """Looks up and stores {"probability", "shap_values"} per feature row for the current model."""
+
+    def __init__(self, store):
+        self.store = store
+        self.run_id = None
+        self.hits = self.misses = 0
+        # Lookups come from several scoring threads at once
+        self._lock = threading.Lock()
+
+    def set_model(self, run_id):
+        if run_id != self.run_id:
+            self.store.clear()
+            self.run_id = run_id
+
+    def lookup(self, X, explain=False):
+        """Returns (keys, results) for the rows of ``X``; results are None where a row must be scored.
+
+        With ``explain``, only results that include SHAP values count.
+        """
+        keys = [f"{self.run_id}:{digest}" for digest in row_hashes(X)]
+        results = [value if value is not None and (not explain or "shap_values" in value) else None
+                   for value in self.store.get_many(keys)]
+        hits = sum(value is not None for value in results)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(results) - hits
+        return keys, results
+
+    def save(self, keys, results):
+        self.store.set_many(dict(zip(keys, results)))
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "backend": "redis" if isinstance(self.store, RedisResultStore) else "memory",
+            "run_id": self.run_id,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,148 @@
+import itertools
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import xgboost as xgb
+
+from feature_schema import FEATURE_COLUMNS
+
+# Hyperparameter search for train.py --search. The data is loaded once, turned
+# into train/validation DMatrix binaries once, and every worker process loads
+# those binaries a single time in its initializer; trials then only pay for
+# boosting. Each trial uses early stopping on the validation set.
+
+GRID = {
+    "learning_rate": [0.05, 0.1, 0.3],
+    "max_depth": [3, 5, 7],
+}
+
+# Per-worker DMatrix handles, set by _init_worker
+_dtrain = None
+_dvalid = None
+
+def grid_configs():
+    keys = list(GRID)
+    return [dict(zip(keys, values)) for values in itertools.product(*GRID.values())]
+
+def random_configs(n_trials, seed=42):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "learning_rate": float(np.exp(rng.uniform(np.log(0.01), np.log(0.3)))),
+            "max_depth": int(rng.integers(2, 9)),
+            "subsample": float(rng.uniform(0.6, 1.0)),
+            "colsample_bytree": float(rng.uniform(0.6, 1.0)),
+            "min_child_weight": float(rng.uniform(1, 10)),
+        }
+        for _ in range(n_trials)
+    ]
+
+def _init_worker(train_path, valid_path):
+    global _dtrain, _dvalid
+    _dtrain = xgb.DMatrix(train_path)
+    _dvalid = xgb.DMatrix(valid_path)
+
+def _run_trial(trial_id, config, base_params, num_boost_round, early_stopping_rounds, nthread):
+    params = dict(base_params, **config, nthread=nthread)
+    history = {}
+    start_time = time.perf_counter()
+    booster = xgb.train(params, _dtrain, num_boost_round=num_boost_round,
+                        evals=[(_dvalid, "valid")], evals_result=history,
+                        early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+    metric = params["eval_metric"]
+    return {
+        "trial_id": trial_id,
+        "config": config,
+        "num_boost_round": num_boost_round,
+        "best_iteration": booster.best_iteration,
+        "best_score": booster.best_score,
+        "history": history["valid"][metric],
+        "wall_time_s": time.perf_counter() - start_time,
+        "model": bytes(booster.save_raw("json")),
+    }
+
+def successive_halving(configs, run_rung, max_rounds, eta=3):
+    """Trains all configs on a small round budget and keeps the best 1/eta for each larger budget."""
+    n_rungs = max(int(math.log(len(configs), eta)), 0)
+    results = []
+    for rung in range(n_rungs + 1):
+        rounds = max(int(max_rounds / eta ** (n_rungs - rung)), 1)
+        rung_results = run_rung(configs, rounds, rung)
+        results.extend(rung_results)
+        rung_results.sort(key=lambda r: r["best_score"])
+        configs = [r["config"] for r in rung_results[:max(len(rung_results) // eta, 1)]]
+    return results
+
+def log_trial(run_logger, result, rung=None):
+    # One log_batch call per trial instead of one request per value
+    trial = run_logger.start_child_run(f"trial-{result['trial_id']}")
+    trial.log_params(result["config"])
+    trial.log_param("num_boost_round", result["num_boost_round"])
+    if rung is not None:
+        trial.log_param("rung", rung)
+    trial.log_metrics({"best_iteration": result["best_iteration"], "valid_score": result["best_score"],
+                       "trial_wall_time_s": result["wall_time_s"]})
+    for step, value in enumerate(result["history"]):
+        trial.log_metric("valid_curve", value, step=step)
+    trial.close(status="FINISHED")
+
+def run_search(run_logger, X, y, base_params, strategy, n_trials, num_boost_round, workers=None,
+               threads_per_trial=1, early_stopping_rounds=10, valid_ratio=0.2, seed=42):
+    """Runs a hyperparameter search for the run of ``run_logger`` and returns the best booster.
+
+    Every trial is logged as a nested run. Trials run in a process pool with
+    ``threads_per_trial`` XGBoost threads each, so several small trials keep
+    all cores busy instead of one trial scaling poorly across them.
+    """
+    workers = workers or max((os.cpu_count() or 1) // threads_per_trial, 1)
+    configs = grid_configs() if strategy == "grid" else random_configs(n_trials, seed)
+    print(f"Running {strategy} search over {len(configs)} configurations "
+          f"with {workers} worker(s) x {threads_per_trial} thread(s)...")
+    
+    rng = np.random.default_rng(seed)
+    is_valid = rng.random(len(y)) < valid_ratio
+    trial_ids = itertools.count()
+    search_start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        train_path = os.path.join(tmp, "train.buffer")
+        valid_path = os.path.join(tmp, "valid.buffer")
+        xgb.DMatrix(X[~is_valid], y[~is_valid], feature_names=FEATURE_COLUMNS).save_binary(train_path)
+        xgb.DMatrix(X[is_valid], y[is_valid], feature_names=FEATURE_COLUMNS).save_binary(valid_path)
+        
+        # spawn rather than fork: forking after OpenMP has been used can hang the children
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(train_path, valid_path)) as pool:
+            def run_rung(rung_configs, rounds, rung=None):
+                futures = [
+                    pool.submit(_run_trial, next(trial_ids), config, base_params, rounds,
+                                early_stopping_rounds, threads_per_trial)
+                    for config in rung_configs
+                ]
+                rung_results = [future.result() for future in futures]
+                for result in rung_results:
+                    log_trial(run_logger, result, rung)
+                return rung_results
+            
+            if strategy == "halving":
+                results = successive_halving(configs, run_rung, num_boost_round)
+            else:
+                results = run_rung(configs, num_boost_round)
+    
+    elapsed = time.perf_counter() - search_start
+    # Compare on full-budget trials only; early halving rungs are deliberately under-trained
+    final = [r for r in results if r["num_boost_round"] == num_boost_round] or results
+    best = min(final, key=lambda r: r["best_score"])
+    print(f"Best trial {best['trial_id']}: {best['config']} "
+          f"(valid {base_params['eval_metric']} {best['best_score']:.5f}, {best['best_iteration'] + 1} rounds)")
+    
+    run_logger.log_params({f"best_{k}": v for k, v in best["config"].items()})
+    run_logger.log_metrics({"best_valid_score": best["best_score"], "search_trials": len(results),
+                            "search_trials_per_min": 60 * len(results) / elapsed})
+    
+    booster = xgb.Booster(model_file=bytearray(best["model"]))
+    # Keep only the trees up to the early-stopping point
+    return booster[: best["best_iteration"] + 1], best["config"]
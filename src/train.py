@@ -4,12 +4,29 @@ import mlflow
 import mlflow.xgboost
 import argparse
 import os
-from sklearn.metrics import accuracy_score, f1_score, roc_auc_score, confusion_matrix
 import matplotlib.pyplot as plt
 import seaborn as sns
 import warnings
 import logging
 import os
+import tempfile
+import time
+import numpy as np
+import pyarrow.parquet as pq
+from mlflow.exceptions import MlflowException
+from mlflow.tracking import MlflowClient
+
+import model_cache
+from batch_iter import DEFAULT_BATCH_SIZE, ParquetBatchIter, iter_xy
+from dataset import max_timestamp, newer_than, read_split
+from distributed import train_distributed, training_time
+from encoders import ENCODER_FILENAME
+from feature_schema import FEATURE_COLUMNS, TARGET_COLUMN, TIMESTAMP_COLUMN
+from metrics import evaluate_binary, log_report
+from mlflow_logging import AsyncRunLogger
+from predictors import PREDICTORS_ARTIFACT, export_predictors
+from profiling import peak_rss_mb
+from search import run_search
 
 # Set environment variables immediately
 print("Configuring MinIO environment variables at top of script...")
@@ -25,10 +42,17 @@ warnings.filterwarnings("ignore", category=UserWarning, module="xgboost")
 # Suppress MLflow requirements warning
 logging.getLogger("mlflow.utils.requirements_utils").setLevel(logging.ERROR)
 
-def train_model(df, params):
+# eval.promote_model registers models under this name with the @staging alias
+REGISTERED_MODEL_NAME = "churn-prediction-model"
+STAGING_ALIAS = "staging"
+# Every run records the latest event_timestamp it trained on, so an
+# --incremental run can continue from the promoted model on newer rows only
+WATERMARK_TAG = "data_watermark"
+
+def train_model(df, params, run_logger, xgb_model=None):
     # Separate features and target
-    X = df.drop(columns=['Churn', 'customer_id', 'event_timestamp'])
-    y = df['Churn']
+    X = df[FEATURE_COLUMNS]
+    y = df[TARGET_COLUMN]
     
     print("Training XGBoost model...")
     # Ensure autolog is disabled
@@ -38,46 +62,202 @@ def train_model(df, params):
     print("Initializing XGBClassifier...")
     model = xgb.XGBClassifier(**params)
     print("Fitting model...")
-    model.fit(X, y)
+    model.fit(X, y, xgb_model=xgb_model)
     print("Model fit completed.")
     
     # Log metrics (training metrics)
-    train_preds = model.predict(X)
     train_proba = model.predict_proba(X)[:, 1]
+    log_training_metrics(run_logger, y, train_proba)
+    
+    return model
+
+def booster_params(params):
+    """Translates XGBClassifier keyword params into xgb.train params and rounds."""
+    params = dict(params)
+    num_boost_round = params.pop("n_estimators", 100)
+    params.setdefault("objective", "binary:logistic")
+    params.setdefault("tree_method", "hist")
+    return params, num_boost_round
+
+def to_classifier(booster, params):
+    # Wrap the booster so the logged model behaves like the in-memory one
+    # (predict_proba etc.) for eval.py and the serving code
+    model = xgb.XGBClassifier(**params)
+    model.load_model(bytearray(booster.save_raw("json")))
+    return model
+
+def train_model_streaming(data_path, params, run_logger, data_mode, batch_size=DEFAULT_BATCH_SIZE,
+                          filters=None, xgb_model=None):
+    """Trains from Parquet record batches without loading the split into pandas.
+
+    "quantile" builds a QuantileDMatrix batch by batch, so only the quantised
+    matrix (about one byte per value) is resident. "external" uses an
+    external-memory DMatrix whose pages are cached on disk, for datasets whose
+    quantised form still does not fit in RAM.
+    """
+    train_params, num_boost_round = booster_params(params)
+    row_filter = pq.filters_to_expression(filters) if filters else None
+    with tempfile.TemporaryDirectory() as cache_dir:
+        if data_mode == "external":
+            it = ParquetBatchIter(data_path, "train", batch_size, row_filter, cache_prefix=os.path.join(cache_dir, "train"))
+            dtrain = xgb.DMatrix(it)
+        else:
+            it = ParquetBatchIter(data_path, "train", batch_size, row_filter)
+            dtrain = xgb.QuantileDMatrix(it)
+        print(f"Training XGBoost model on {dtrain.num_row()} rows ({data_mode} mode)...")
+        booster = xgb.train(train_params, dtrain, num_boost_round=num_boost_round, xgb_model=xgb_model)
+        del dtrain
+    print("Model fit completed.")
+    
+    log_training_metrics(run_logger, *predict_split(booster, data_path, batch_size, row_filter))
+    return to_classifier(booster, params)
+
+def predict_split(booster, data_path, batch_size=DEFAULT_BATCH_SIZE, row_filter=None):
+    # Training metrics need only the label and the probability of each row
+    labels, probas = [], []
+    for X, y in iter_xy(data_path, "train", batch_size, row_filter):
+        labels.append(y)
+        probas.append(booster.inplace_predict(X))
+    return np.concatenate(labels), np.concatenate(probas)
+
+def train_model_distributed(args, params, run_logger, filters=None, xgb_model=None):
+    """Data-parallel training with --train_workers local processes, each holding one shard."""
+    train_params, num_boost_round = booster_params(params)
+    threads = args.threads_per_worker or max((os.cpu_count() or 1) // args.train_workers, 1)
+    print(f"Training XGBoost model with {args.train_workers} worker(s) x {threads} thread(s)...")
+    booster, elapsed, results = train_distributed(args.data, train_params, num_boost_round, args.train_workers,
+                                                  threads, filters, xgb_model)
+    train_time = training_time(results)
+    print(f"Model fit completed in {elapsed:.2f}s ({train_time:.2f}s training, "
+          f"{elapsed - train_time:.2f}s tracker and worker start-up).")
+    run_logger.log_params({"train_workers": args.train_workers, "threads_per_worker": threads})
+    run_logger.log_metrics({"distributed_wall_time_s": elapsed, "distributed_train_time_s": train_time,
+                            "distributed_setup_overhead_s": elapsed - train_time})
+    
+    if args.scaling_baseline:
+        # Strong scaling: the same job on one worker with the same threads per worker.
+        # Both sides use the slowest worker's training time, so process spawning
+        # and imports (logged as setup overhead) do not count against scaling
+        print("Training single-worker baseline for scaling efficiency...")
+        _, baseline_elapsed, baseline_results = train_distributed(args.data, train_params, num_boost_round, 1, threads,
+                                                                  filters, xgb_model)
+        baseline = training_time(baseline_results)
+        print(f"Single worker: {baseline:.2f}s, speedup {baseline / train_time:.2f}x on {args.train_workers} workers")
+        run_logger.log_metrics({"single_worker_train_time_s": baseline,
+                                "single_worker_setup_overhead_s": baseline_elapsed - baseline,
+                                "scaling_speedup": baseline / train_time,
+                                "scaling_efficiency": baseline / (args.train_workers * train_time)})
+    
+    row_filter = pq.filters_to_expression(filters) if filters else None
+    log_training_metrics(run_logger, *predict_split(booster, args.data, args.batch_size, row_filter))
+    return to_classifier(booster, params)
+
+def train_model_search(args, params, run_logger):
+    # Data is read and converted once; the trials share the resulting DMatrix
+    print(f"Loading training data from {args.data}...")
+    df = read_split(args.data, "train", columns=FEATURE_COLUMNS + [TARGET_COLUMN])
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    y = df[TARGET_COLUMN].to_numpy()
+    del df
+    
+    run_logger.log_params({"search": args.search, "threads_per_trial": args.threads_per_trial,
+                           "early_stopping_rounds": args.early_stopping_rounds})
+    train_params, num_boost_round = booster_params(params)
+    booster, best_config = run_search(run_logger, X, y, train_params, args.search, args.n_trials, num_boost_round,
+                                      workers=args.search_workers, threads_per_trial=args.threads_per_trial,
+                                      early_stopping_rounds=args.early_stopping_rounds)
+    
+    log_training_metrics(run_logger, y, booster.inplace_predict(X))
+    return to_classifier(booster, dict(params, **best_config, n_estimators=booster.num_boosted_rounds()))
+
+def load_warm_start(client):
+    """Returns (booster, model version, watermark) of the @staging model, or None."""
+    try:
+        version = client.get_model_version_by_alias(REGISTERED_MODEL_NAME, STAGING_ALIAS)
+    except MlflowException:
+        print(f"No '{REGISTERED_MODEL_NAME}@{STAGING_ALIAS}' model registered.")
+        return None
+    watermark = client.get_run(version.run_id).data.tags.get(WATERMARK_TAG)
+    if watermark is None:
+        print(f"Run {version.run_id} of model version {version.version} has no {WATERMARK_TAG} tag.")
+        return None
+    print(f"Warm-starting from model version {version.version} (data up to {watermark})...")
+    model = model_cache.load_model(version.run_id)
+    return model.get_booster(), version, pd.Timestamp(watermark)
+
+def compare_with_full_refit(data_path, params, model, watermark, run_logger):
+    """Refits from scratch on all rows up to ``watermark`` and scores both models on the test split."""
+    columns = FEATURE_COLUMNS + [TARGET_COLUMN]
+    full_params = dict(params, n_estimators=model.get_booster().num_boosted_rounds())
+    print(f"Full refit with {full_params['n_estimators']} rounds for comparison...")
+    start_time = time.perf_counter()
+    df = read_split(data_path, "train", columns=columns, filters=[(TIMESTAMP_COLUMN, "<=", watermark)])
+    full_model = xgb.XGBClassifier(**full_params)
+    full_model.fit(df[FEATURE_COLUMNS], df[TARGET_COLUMN])
+    full_time = time.perf_counter() - start_time
+    del df
     
-    acc = accuracy_score(y, train_preds)
-    f1 = f1_score(y, train_preds)
-    roc_auc = roc_auc_score(y, train_proba)
+    test = read_split(data_path, "test", columns=columns)
+    for name, candidate in (("incremental", model), ("full", full_model)):
+        report = evaluate_binary(test[TARGET_COLUMN], candidate.predict_proba(test[FEATURE_COLUMNS])[:, 1])
+        print(f"{name}: test accuracy {report['metrics']['accuracy']:.4f}, roc_auc {report['metrics']['roc_auc']:.4f}")
+        log_report(run_logger, report, f"compare_{name}_test")
+    run_logger.log_metric("compare_full_train_wall_time_s", full_time)
+
+def log_training_metrics(run_logger, y, train_proba):
+    # Every metric comes from the one probability vector, in a single pass
+    report = evaluate_binary(y, train_proba)
     
     print("Logging metrics to MLflow...")
-    mlflow.log_metric("train_accuracy", acc)
-    mlflow.log_metric("train_f1", f1)
-    mlflow.log_metric("train_roc_auc", roc_auc)
+    log_report(run_logger, report, "train")
     
     # Log Confusion Matrix
     print("Logging confusion matrix artifact...")
-    cm = confusion_matrix(y, train_preds)
+    cm = report["confusion"]
     plt.figure(figsize=(8, 6))
     sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
     plt.xlabel('Predicted')
     plt.ylabel('Actual')
     plt.title('Confusion Matrix')
     plt.savefig("confusion_matrix.png")
-    mlflow.log_artifact("confusion_matrix.png")
-    
-    return model
+    plt.close()
+    # Uploaded in the background from a staged copy
+    run_logger.log_artifact("confusion_matrix.png")
 
 def main():
     parser = argparse.ArgumentParser(description="Train Churn Prediction Model")
-    parser.add_argument("--data", type=str, required=True, help="Path to training data (parquet)")
+    parser.add_argument("--data", type=str, required=True, help="Path to the processed parquet dataset (train split is used)")
     parser.add_argument("--learning_rate", type=float, default=0.1)
     parser.add_argument("--max_depth", type=int, default=3)
     parser.add_argument("--n_estimators", type=int, default=100)
+    parser.add_argument("--encoder", type=str, default=None,
+                        help=f"Category encoder to log with the model (default: {ENCODER_FILENAME} next to --data)")
+    parser.add_argument("--data_mode", type=str, default="memory", choices=["memory", "quantile", "external", "distributed"],
+                        help="memory: load the split into pandas; quantile/external: stream Parquet batches into XGBoost; "
+                             "distributed: shard the row groups across --train_workers local processes")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows per record batch in the streaming modes")
+    parser.add_argument("--train_workers", type=int, default=2, help="Worker processes in distributed mode")
+    parser.add_argument("--threads_per_worker", type=int, default=None,
+                        help="XGBoost threads per distributed worker (default: CPUs // train_workers)")
+    parser.add_argument("--scaling_baseline", action="store_true",
+                        help="In distributed mode, also time a single worker and log the scaling efficiency")
+    parser.add_argument("--search", type=str, default=None, choices=["grid", "random", "halving"],
+                        help="Run a hyperparameter search (n_estimators is the max rounds per trial)")
+    parser.add_argument("--n_trials", type=int, default=20, help="Configurations for random/halving search")
+    parser.add_argument("--search_workers", type=int, default=None,
+                        help="Parallel trials (default: CPUs // threads_per_trial)")
+    parser.add_argument("--threads_per_trial", type=int, default=1)
+    parser.add_argument("--early_stopping_rounds", type=int, default=10)
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"Continue boosting the {REGISTERED_MODEL_NAME}@{STAGING_ALIAS} model on rows newer than its {WATERMARK_TAG}")
+    parser.add_argument("--incremental_rounds", type=int, default=10, help="Boosting rounds to add in --incremental mode")
+    parser.add_argument("--compare_full", action="store_true",
+                        help="With --incremental, also refit from scratch in memory and compare both on the test split")
     args = parser.parse_args()
-
-    print(f"Loading training data from {args.data}...")
-    df = pd.read_parquet(args.data)
-    print(f"Data loaded successfully. Shape: {df.shape}")
+    if args.incremental and args.search:
+        parser.error("--incremental cannot be combined with --search")
+    encoder_path = args.encoder or os.path.join(os.path.dirname(os.path.normpath(args.data)), ENCODER_FILENAME)
 
     print(f"Setting tracking URI to http://127.0.0.1:5000...")
     mlflow.set_tracking_uri("http://127.0.0.1:5000")
@@ -93,18 +273,76 @@ def main():
         "eval_metric": "logloss"
     }
 
+    # Rows newer than the promoted model's watermark (all rows without --incremental),
+    # capped at the current maximum so rows arriving mid-run are left for the next one
+    warm_start = load_warm_start(MlflowClient()) if args.incremental else None
+    if args.incremental and warm_start is None:
+        print("Nothing to warm-start from; training from scratch.")
+    train_filters = newer_than(warm_start[2]) if warm_start else []
+    watermark = max_timestamp(args.data, "train", train_filters)
+    if watermark is None:
+        print("No new training rows; nothing to train." if warm_start else f"No training rows in {args.data}.")
+        return
+    train_filters = train_filters + [(TIMESTAMP_COLUMN, "<=", watermark)]
+    fit_params = dict(params, n_estimators=args.incremental_rounds) if warm_start else params
+    xgb_model = warm_start[0] if warm_start else None
+
     print("Starting MLflow run...")
-    with mlflow.start_run():
+    with mlflow.start_run(), AsyncRunLogger.for_active_run() as run_logger:
+        # Params and metrics are batched and artifacts uploaded in the background;
+        # leaving the block waits for all of it before the run is ended
         print("Logging parameters...")
-        mlflow.log_params(params)
+        run_logger.log_params(params)
+        run_logger.log_params({"data_mode": args.data_mode, "batch_size": args.batch_size})
+        run_logger.set_tag(WATERMARK_TAG, watermark.isoformat())
+        run_logger.set_tag("training_mode", "incremental" if warm_start else "full")
+        if warm_start:
+            booster, version, base_watermark = warm_start
+            run_logger.log_param("incremental_rounds", args.incremental_rounds)
+            run_logger.set_tag("base_model_version", version.version)
+            run_logger.set_tag("base_run_id", version.run_id)
+            run_logger.set_tag("base_data_watermark", base_watermark.isoformat())
         
         # Train and log model manually
-        model = train_model(df, params)
+        start_time = time.perf_counter()
+        if args.search:
+            model = train_model_search(args, params, run_logger)
+        elif args.data_mode == "memory":
+            print(f"Loading training data from {args.data}...")
+            df = read_split(args.data, "train", columns=FEATURE_COLUMNS + [TARGET_COLUMN], filters=train_filters)
+            print(f"Data loaded successfully. Shape: {df.shape}")
+            model = train_model(df, fit_params, run_logger, xgb_model)
+            del df
+        elif args.data_mode == "distributed":
+            model = train_model_distributed(args, fit_params, run_logger, train_filters, xgb_model)
+        else:
+            model = train_model_streaming(args.data, fit_params, run_logger, args.data_mode, args.batch_size,
+                                          train_filters, xgb_model)
+        
+        # Wall time includes data loading; peak RSS is for the whole process
+        run_logger.log_metrics({"train_wall_time_s": time.perf_counter() - start_time, "peak_rss_mb": peak_rss_mb()})
+        
+        if warm_start and args.compare_full:
+            compare_with_full_refit(args.data, params, model, watermark, run_logger)
         
         # Log model artifact manually
         print("Logging model to MLflow...")
         mlflow.xgboost.log_model(model, "model")
         print("Model logged successfully.")
+        
+        # Serving backends (see predictors.py) next to the model
+        with tempfile.TemporaryDirectory() as tmp:
+            predictors_dir = os.path.join(tmp, PREDICTORS_ARTIFACT)
+            exported = export_predictors(model.get_booster(), predictors_dir)
+            print(f"Logging predictor backends: {', '.join(exported)}")
+            run_logger.log_artifact(predictors_dir)
+        
+        # Serving decodes/validates categorical codes with the same vocabularies
+        if os.path.exists(encoder_path):
+            print(f"Logging category encoder {encoder_path}...")
+            run_logger.log_artifact(encoder_path)
+        else:
+            print(f"Warning: category encoder {encoder_path} not found, serving cannot validate codes.")
 
 if __name__ == "__main__":
     main()
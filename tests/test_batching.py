@@ -0,0 +1,50 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from batching import MicroBatcher
+
+def test_concurrent_calls_are_coalesced():
+    calls = []
+    release = threading.Event()
+
+    def double(items):
+        calls.append(list(items))
+        # Hold the first batch so the other submissions queue up behind it
+        release.wait(5)
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=50)
+    first = batcher.submit(0)
+    futures = [batcher.submit(i) for i in range(1, 10)]
+    release.set()
+    assert first.result(5) == 0
+    assert [f.result(5) for f in futures] == [i * 2 for i in range(1, 10)]
+    batcher.close()
+    # Batches never exceed max_batch_size and items keep their order
+    assert all(len(batch) <= 4 for batch in calls)
+    assert [item for batch in calls for item in batch] == list(range(10))
+    assert batcher.stats()["items"] == 10
+    assert batcher.stats()["batches"] == len(calls) < 10
+
+def test_lone_call_waits_at_most_max_wait():
+    batcher = MicroBatcher(lambda items: [item + 1 for item in items], max_batch_size=64, max_wait_ms=1)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert list(pool.map(batcher, range(100))) == list(range(1, 101))
+    batcher.close()
+
+def test_errors_reach_the_right_callers():
+    def check(items):
+        if "boom" in items:
+            raise RuntimeError("batch failed")
+        return [ValueError(item) if item < 0 else item for item in items]
+
+    batcher = MicroBatcher(check, max_batch_size=8, max_wait_ms=20)
+    ok, bad = batcher.submit(1), batcher.submit(-1)
+    assert ok.result(5) == 1
+    with pytest.raises(ValueError):
+        bad.result(5)
+    with pytest.raises(RuntimeError):
+        batcher("boom")
+    batcher.close()
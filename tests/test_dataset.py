@@ -0,0 +1,19 @@
+import pandas as pd
+
+from dataset import PartitionedParquetWriter, max_timestamp, newer_than, read_split
+
+def test_watermark_selects_only_newer_rows(tmp_path):
+    writer = PartitionedParquetWriter(str(tmp_path))
+    for day, ids in (("2026-01-10", [1, 2]), ("2026-01-11", [3, 4])):
+        ts = pd.Timestamp(f"{day} 12:00", tz="UTC")
+        df = pd.DataFrame({"customer_id": ids, "event_timestamp": [ts, ts + pd.Timedelta(hours=1)]})
+        writer.write(df, split="train", event_date=day)
+    writer.close()
+    
+    watermark = max_timestamp(str(tmp_path), "train")
+    assert watermark == pd.Timestamp("2026-01-11 13:00", tz="UTC")
+    assert max_timestamp(str(tmp_path), "train", newer_than(watermark)) is None
+    assert max_timestamp(str(tmp_path), "test") is None
+    
+    newer = read_split(str(tmp_path), "train", filters=newer_than(pd.Timestamp("2026-01-10 12:30", tz="UTC")))
+    assert sorted(newer["customer_id"]) == [2, 3, 4]
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from sklearn.metrics import accuracy_score
+
+from diagnostics import SegmentMetrics, permutation_importance
+from encoders import CategoryEncoder
+from feature_schema import FEATURE_COLUMNS
+
+def sample(n_rows=4000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.random((n_rows, len(FEATURE_COLUMNS))).astype(np.float32)
+    X[:, FEATURE_COLUMNS.index("Tenure")] = rng.integers(1, 61, n_rows)
+    X[:, FEATURE_COLUMNS.index("Subscription Type")] = rng.integers(0, 3, n_rows)
+    X[:, FEATURE_COLUMNS.index("Contract Length")] = rng.integers(0, 3, n_rows)
+    y = (X[:, FEATURE_COLUMNS.index("Age")] > 0.5).astype(int)
+    return X, y
+
+def test_permutation_importance_finds_the_informative_feature():
+    X, y = sample()
+    age = FEATURE_COLUMNS.index("Age")
+    predict = lambda M: M[:, age]
+    importance = permutation_importance(predict, X, y, n_repeats=2, n_jobs=3)
+    assert max(importance, key=lambda f: importance[f][0]) == "Age"
+    assert importance["Age"][0] > 0.4
+    assert importance["Tenure"][0] == pytest.approx(0.0)
+    # The shared input matrix is left untouched
+    np.testing.assert_array_equal(X, sample()[0])
+
+def test_segment_metrics_accumulate_per_segment():
+    X, y = sample()
+    proba = np.where(y == 1, 0.8, 0.3)
+    proba[:100] = 1 - proba[:100]
+    segments = SegmentMetrics()
+    for start in range(0, len(y), 1000):
+        segments.update(X[start:start + 1000], y[start:start + 1000], proba[start:start + 1000])
+    encoder = CategoryEncoder({"Subscription Type": ["Basic", "Premium", "Standard"]})
+    report = segments.report(encoder)
+    
+    assert set(report["Subscription Type"]) == {"Basic", "Premium", "Standard"}
+    assert set(report["Contract Length"]) == {"0", "1", "2"}
+    assert list(report["Tenure"]) == ["0-12", "13-24", "25-36", "37-48", "over_48"]
+    basic = X[:, FEATURE_COLUMNS.index("Subscription Type")] == 0
+    assert report["Subscription Type"]["Basic"]["rows"] == basic.sum()
+    assert report["Subscription Type"]["Basic"]["accuracy"] == pytest.approx(
+        accuracy_score(y[basic], proba[basic] > 0.5))
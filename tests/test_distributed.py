@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from dataset import PartitionedParquetWriter
+from distributed import plan_shards, train_distributed, training_time
+from feature_schema import FEATURE_COLUMNS
+
+def write_dataset(root, n_rows=4000, row_group_size=500):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({col: rng.random(n_rows).astype(np.float32) for col in FEATURE_COLUMNS})
+    df["Churn"] = (df["Tenure"] > 0.5).astype(np.int8)
+    df.insert(0, "customer_id", np.arange(n_rows))
+    df["event_timestamp"] = pd.Timestamp("2026-01-10", tz="UTC") + pd.to_timedelta(np.arange(n_rows), unit="s")
+    writer = PartitionedParquetWriter(str(root), row_group_size=row_group_size)
+    writer.write(df, split="train", event_date="2026-01-10")
+    writer.close()
+
+def test_shards_are_balanced_and_pruned(tmp_path):
+    write_dataset(tmp_path)
+    shards = plan_shards(str(tmp_path), "train", 3)
+    sizes = [sum(len(ids) for _, ids in shard) for shard in shards]
+    assert sum(sizes) == 8 and max(sizes) - min(sizes) <= 1
+    
+    # Row groups entirely before the watermark are dropped from the statistics
+    watermark = pd.Timestamp("2026-01-10", tz="UTC") + pd.Timedelta(seconds=3000)
+    shards = plan_shards(str(tmp_path), "train", 2, [("event_timestamp", ">", watermark)])
+    assert sum(len(ids) for shard in shards for _, ids in shard) == 2
+
+def test_workers_train_one_shared_model(tmp_path):
+    write_dataset(tmp_path)
+    params = {"objective": "binary:logistic", "tree_method": "hist", "max_depth": 2}
+    booster, elapsed, results = train_distributed(str(tmp_path), params, 5, 2, threads_per_worker=1)
+    # Training time leaves out the tracker and process start-up
+    assert 0 < training_time(results) <= elapsed
+    assert sorted(r["rows"] for r in results) == [2000, 2000]
+    assert booster.num_boosted_rounds() == 5
+    # The shared sketch still splits on the only informative feature
+    assert set(booster.get_score(importance_type="weight")) == {"Tenure"}
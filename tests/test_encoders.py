@@ -0,0 +1,27 @@
+import pandas as pd
+
+from encoders import CategoryEncoder
+
+def test_codes_are_stable_across_inputs(tmp_path):
+    train = pd.DataFrame({"Gender": ["Male", "Female"], "Contract Length": ["Monthly", "Annual"]})
+    encoder = CategoryEncoder().partial_fit(train)
+    assert encoder.vocabularies["Gender"] == ["Female", "Male"]
+    
+    # A later file only has one gender and a new contract type: existing codes
+    # must not move and the new value is appended
+    test = pd.DataFrame({"Gender": ["Male"], "Contract Length": ["Quarterly"]})
+    encoder.partial_fit(test)
+    encoder.transform(test)
+    assert test["Gender"].tolist() == [1]
+    assert test["Contract Length"].tolist() == [2]
+    
+    path = encoder.save(tmp_path / "category_encoder.json")
+    assert CategoryEncoder.load(path).vocabularies == encoder.vocabularies
+
+def test_encode_record_and_validation():
+    encoder = CategoryEncoder({"Gender": ["Female", "Male"]})
+    encoded = encoder.encode_record({"Gender": "Male", "Age": 30})
+    assert encoded == {"Gender": 1, "Age": 30}
+    assert encoder.invalid_codes(encoded) == []
+    assert encoder.invalid_codes(encoder.encode_record({"Gender": "Other"})) == ["Gender"]
+
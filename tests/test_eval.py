@@ -0,0 +1,8 @@
+import eval as ev
+
+def test_promotion_is_skipped_when_the_challenger_is_already_staging(monkeypatch):
+    registered = []
+    monkeypatch.setattr(ev, "register_staging", registered.append)
+    reports = {"run-1": {"metrics": {"accuracy": 0.95}}}
+    assert ev.promote_model("run-1", reports, champion_run_id="run-1") is False
+    assert registered == []
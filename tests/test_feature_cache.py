@@ -0,0 +1,121 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from types import SimpleNamespace
+
+from feature_cache import FeatureCache, feature_view_ttl, record_size
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class Store:
+    """Counts fetches; customers with negative IDs are not in the online store."""
+
+    def __init__(self):
+        self.fetched = []
+
+    def fetch(self, customer_ids):
+        self.fetched.append(list(customer_ids))
+        return [None if i < 0 else {"customer_id": i, "Age": float(i)} for i in customer_ids]
+
+def test_hits_expiry_and_invalidation():
+    clock, store = Clock(), Store()
+    cache = FeatureCache(ttl_seconds=60, clock=clock)
+    assert cache.get_many([1, 2, -1], store.fetch) == [{"customer_id": 1, "Age": 1.0}, {"customer_id": 2, "Age": 2.0}, None]
+    assert cache.get_many([2, 1, 3, 1], store.fetch)[3] == {"customer_id": 1, "Age": 1.0}
+    assert store.fetched == [[1, 2, -1], [3]]
+    assert cache.get_many([-1], store.fetch) == [None]
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (3, 4)
+
+    clock.now = 61
+    cache.get_many([1, 2], store.fetch)
+    assert store.fetched[-1] == [1, 2] and cache.stats()["expirations"] == 2
+
+    assert cache.invalidate([1, 99]) == 1
+    cache.get_many([1, 2], store.fetch)
+    assert store.fetched[-1] == [1]
+    assert cache.invalidate() == 4
+    assert cache.stats()["entries"] == 0 and cache.bytes == 0
+
+def test_lru_eviction_under_memory_cap():
+    store = Store()
+    entry = record_size(store.fetch([0])[0])
+    cache = FeatureCache(max_bytes=3 * entry)
+    cache.get_many([1, 2, 3], store.fetch)
+    cache.get_many([1], store.fetch)
+    cache.get_many([4], store.fetch)
+    # 2 was the least recently used
+    assert cache.stats()["evictions"] == 1
+    cache.get_many([1, 3, 4], store.fetch)
+    assert store.fetched[-1] == [4]
+    cache.get_many([2], store.fetch)
+    assert store.fetched[-1] == [2]
+    assert cache.bytes <= 3 * entry
+
+def test_concurrent_misses_share_one_fetch():
+    store, started, release = Store(), threading.Event(), threading.Event()
+
+    def slow_fetch(customer_ids):
+        started.set()
+        release.wait(5)
+        return store.fetch(customer_ids)
+
+    cache = FeatureCache()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        first = pool.submit(cache.get_many, [7], slow_fetch)
+        started.wait(5)
+        others = [pool.submit(cache.get_many, [7, 8], slow_fetch) for _ in range(6)]
+        # Wait until the other callers have joined the fetch of 7 in flight
+        while cache.stats()["coalesced"] < 6:
+            pass
+        release.set()
+        assert first.result(5) == [{"customer_id": 7, "Age": 7.0}]
+        assert all(f.result(5)[0] == {"customer_id": 7, "Age": 7.0} for f in others)
+    assert sum(batch.count(7) for batch in store.fetched) == 1
+    assert sum(batch.count(8) for batch in store.fetched) == 1
+
+def test_async_single_flight_and_errors():
+    store = Store()
+
+    async def fetch(customer_ids):
+        await asyncio.sleep(0.01)
+        return store.fetch(customer_ids)
+
+    async def failing(customer_ids):
+        await asyncio.sleep(0.01)
+        raise ConnectionError("redis down")
+
+    async def main():
+        cache = FeatureCache()
+        results = await asyncio.gather(*[cache.get_many_async([5], fetch) for _ in range(20)])
+        assert all(r == [{"customer_id": 5, "Age": 5.0}] for r in results)
+        assert store.fetched == [[5]]
+        calls = [cache.get_many_async([6], failing) for _ in range(3)]
+        errors = await asyncio.gather(*calls, return_exceptions=True)
+        assert all(isinstance(e, ConnectionError) for e in errors)
+        # Failures are not cached
+        assert await cache.get_many_async([6], fetch) == [{"customer_id": 6, "Age": 6.0}]
+
+    asyncio.run(main())
+
+def test_fetch_racing_invalidation_is_not_cached():
+    store = Store()
+    cache = FeatureCache()
+
+    def fetch_then_materialize(customer_ids):
+        records = store.fetch(customer_ids)
+        cache.invalidate()
+        return records
+
+    assert cache.get_many([1], fetch_then_materialize) == [{"customer_id": 1, "Age": 1.0}]
+    cache.get_many([1], store.fetch)
+    assert len(store.fetched) == 2
+
+def test_ttl_follows_feature_view():
+    assert feature_view_ttl() == timedelta(days=1).total_seconds()
+    assert feature_view_ttl(SimpleNamespace(ttl=timedelta(0))) is None
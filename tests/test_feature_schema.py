@@ -0,0 +1,19 @@
+from encoders import CategoryEncoder
+from feature_schema import CATEGORICAL_COLUMNS, FEATURE_COLUMNS, code_dtype, dtype_plan, load_feature_view
+
+def test_feature_columns_match_feature_view():
+    feature_view = load_feature_view()
+    assert sorted(field.name for field in feature_view.schema) == sorted(FEATURE_COLUMNS)
+
+def test_dtype_plan_follows_feast_schema():
+    plan = dtype_plan()
+    assert plan["Age"] == "float32"
+    assert all(plan[col] == "int8" for col in CATEGORICAL_COLUMNS)
+    assert plan["customer_id"] == "int64"
+    assert plan["event_timestamp"] == "datetime64[us, UTC]"
+
+def test_code_dtypes_widen_with_the_vocabulary():
+    assert [code_dtype(n) for n in (3, 128, 129, 32768, 32769)] == ["int8", "int8", "int16", "int16", "int32"]
+    encoder = CategoryEncoder({"Gender": ["Female", "Male"], "Subscription Type": [f"plan {i}" for i in range(200)]})
+    plan = dtype_plan(encoder=encoder)
+    assert (plan["Gender"], plan["Subscription Type"], plan["Contract Length"]) == ("int8", "int16", "int8")
@@ -0,0 +1,173 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("shap")
+from fastapi.testclient import TestClient
+
+import inference_server as srv
+from batching import MicroBatcher
+from encoders import CategoryEncoder
+from feature_cache import FeatureCache
+from feature_schema import FEATURE_COLUMNS
+from result_cache import MemoryResultStore, ResultCache
+
+class FakeStore:
+    """FeatureStore.get_online_features over a dict of customer features; counts calls."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    def get_online_features(self, features, entity_rows):
+        self.calls += 1
+        ids = [row["customer_id"] for row in entity_rows]
+        response = {"customer_id": ids}
+        for ref in features:
+            col = ref.split(":")[-1]
+            response[ref] = [self.rows.get(i, {}).get(col) for i in ids]
+        return SimpleNamespace(to_dict=lambda: response)
+
+class StubPredictor:
+    """The probability is the Age feature; records how many rows each call scores and the last input."""
+
+    def __init__(self):
+        self.batches = []
+        self.last_input = None
+
+    def predict_proba(self, X):
+        self.batches.append(len(X))
+        self.last_input = X.copy()
+        return X[:, FEATURE_COLUMNS.index("Age")].copy()
+
+class StubExplainer:
+    def __init__(self):
+        self.calls = 0
+
+    def shap_values(self, X):
+        self.calls += 1
+        return np.tile(np.arange(len(FEATURE_COLUMNS), dtype=np.float32), (len(X), 1))
+
+def customer(age, gender=0):
+    return {col: 0.0 for col in FEATURE_COLUMNS} | {"Age": age, "Gender": gender}
+
+@pytest.fixture
+def server(monkeypatch):
+    # Customer 5 has a Gender code outside the encoder's vocabulary
+    store = FakeStore({1: customer(0.9), 2: customer(0.2), 3: customer(0.6), 5: customer(0.7, gender=5)})
+    predictor, explainer = StubPredictor(), StubExplainer()
+    monkeypatch.setattr(srv, "store", store)
+    monkeypatch.setattr(srv, "predictor", predictor)
+    monkeypatch.setattr(srv, "explainer", explainer)
+    monkeypatch.setattr(srv, "encoder", CategoryEncoder({"Gender": ["Female", "Male"]}))
+    # No startup events: the model and the store above are used as they are
+    return SimpleNamespace(client=TestClient(srv.app), store=store, predictor=predictor, explainer=explainer)
+
+def test_batch_results_follow_request_order_with_per_id_errors(server):
+    response = server.client.post("/predict/batch", json={"customer_ids": [3, 404, 1, 5, 2]})
+    assert response.status_code == 200
+    body = response.json()
+    results = body["results"]
+    assert [r["customer_id"] for r in results] == [3, 404, 1, 5, 2]
+    assert [r.get("status_code") for r in results] == [None, 404, None, 422, None]
+    assert results[1]["error"] == "Customer not found"
+    assert "Gender" in results[3]["error"]
+    assert [round(results[i]["probability"], 4) for i in (0, 2, 4)] == [0.6, 0.9, 0.2]
+    assert [results[i]["is_churn"] for i in (0, 2, 4)] == [True, True, False]
+    assert (body["n_scored"], body["n_failed"]) == (3, 2)
+    # One Feast lookup for the whole batch, and no SHAP unless asked for
+    assert server.store.calls == 1 and server.explainer.calls == 0
+    assert "shap_values" not in results[0]
+
+def test_batch_explain_runs_one_shap_call(server):
+    results = server.client.post("/predict/batch", json={"customer_ids": [1, 2], "explain": True}).json()["results"]
+    assert server.explainer.calls == 1
+    assert results[1]["shap_values"] == {col: float(j) for j, col in enumerate(FEATURE_COLUMNS)}
+
+def test_empty_and_oversized_batches(server, monkeypatch):
+    assert server.client.post("/predict/batch", json={"customer_ids": []}).json() == \
+        {"results": [], "n_scored": 0, "n_failed": 0}
+    monkeypatch.setattr(srv, "MAX_BATCH_SIZE", 2)
+    response = server.client.post("/predict/batch", json={"customer_ids": [1, 2, 3]})
+    assert response.status_code == 422
+    assert server.store.calls == 0
+
+def test_partial_result_cache_hits_score_only_the_misses(server, monkeypatch):
+    cache = ResultCache(MemoryResultStore())
+    cache.set_model("run-1")
+    monkeypatch.setattr(srv, "result_cache", cache)
+
+    first = server.client.post("/predict/batch", json={"customer_ids": [2, 3]}).json()["results"]
+    results = server.client.post("/predict/batch", json={"customer_ids": [1, 2, 404, 3]}).json()["results"]
+    # The second batch only scores customer 1; 2 and 3 come back from the cache in request order
+    assert server.predictor.batches == [2, 1]
+    assert [r["customer_id"] for r in results] == [1, 2, 404, 3]
+    assert [r.get("cached") for r in results] == [False, True, None, True]
+    assert [results[i]["probability"] for i in (1, 3)] == [first[0]["probability"], first[1]["probability"]]
+    assert round(results[0]["probability"], 4) == 0.9
+    assert cache.stats()["hits"] == 2
+
+def test_single_prediction_and_its_errors(server):
+    response = server.client.get("/predict/3")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["customer_id"] == 3
+    assert round(body["probability"], 4) == 0.6 and body["is_churn"] is True
+    assert body["shap_values"] == {col: float(j) for j, col in enumerate(FEATURE_COLUMNS)}
+    
+    missing = server.client.get("/predict/404")
+    assert missing.status_code == 404 and missing.json()["detail"] == "Customer not found"
+    invalid = server.client.get("/predict/5")
+    assert invalid.status_code == 422 and "Gender" in invalid.json()["detail"]
+    # Neither failed request reached the model
+    assert server.predictor.batches == [1]
+
+def test_concurrent_predictions_are_coalesced_by_the_micro_batcher(server, monkeypatch):
+    # The batch is only dispatched once all four requests are queued (or after 5 s)
+    batcher = MicroBatcher(lambda customer_ids: srv.score_customers(customer_ids, explain=True), 4, 5000)
+    monkeypatch.setattr(srv, "batcher", batcher)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            responses = list(pool.map(lambda i: server.client.get(f"/predict/{i}"), [1, 2, 3, 404]))
+    finally:
+        batcher.close()
+    
+    assert [r.status_code for r in responses] == [200, 200, 200, 404]
+    assert [round(r.json()["probability"], 4) for r in responses[:3]] == [0.9, 0.2, 0.6]
+    # One feature lookup, one model call and one SHAP call for all four requests
+    assert batcher.stats()["batches"] == 1
+    assert server.predictor.batches == [3]
+    assert server.store.calls == 1 and server.explainer.calls == 1
+
+def test_feature_cache_serves_repeat_requests_until_invalidated(server, monkeypatch):
+    cache = FeatureCache()
+    monkeypatch.setattr(srv, "feature_cache", cache)
+    
+    first = server.client.get("/predict/1").json()
+    second = server.client.get("/predict/1").json()
+    assert server.store.calls == 1
+    assert second["probability"] == first["probability"]
+    assert cache.stats()["hits"] == 1
+    
+    assert server.client.post("/features/invalidate", json={"customer_ids": [1]}).json() == {"invalidated": 1}
+    assert server.client.get("/predict/1").status_code == 200
+    assert server.store.calls == 2
+
+def test_raw_prediction_encodes_and_orders_the_features(server):
+    # Given in reverse column order, with Gender as its raw value
+    features = {col: (j + 1) / 10 for j, col in reversed(list(enumerate(FEATURE_COLUMNS)))} | {"Gender": "Male"}
+    response = server.client.post("/predict/raw", json={"features": features})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["features"]["Gender"] == 1
+    assert round(body["probability"], 4) == 0.1 and body["is_churn"] is False
+    expected = [1.0 if col == "Gender" else (j + 1) / 10 for j, col in enumerate(FEATURE_COLUMNS)]
+    assert server.predictor.last_input.shape == (1, len(FEATURE_COLUMNS))
+    assert np.allclose(server.predictor.last_input[0], expected)
+    
+    unknown = server.client.post("/predict/raw", json={"features": features | {"Gender": "Other"}})
+    assert unknown.status_code == 422
+    assert "Gender" in unknown.json()["detail"]
+    assert server.predictor.batches == [1]
@@ -0,0 +1,25 @@
+from manifest import ProcessingManifest, plan_input
+
+def test_plan_detects_new_appended_and_changed_files(tmp_path):
+    raw = tmp_path / "day.csv"
+    raw.write_text("CustomerID,Churn\n1,0\n")
+    manifest = ProcessingManifest(str(tmp_path))
+    
+    task = plan_input(str(raw))
+    assert task["action"] == "new"
+    manifest.record(task, manifest.segment_basename(task), n_rows=1)
+    assert plan_input(str(raw), manifest.files[task["key"]])["action"] == "skip"
+    
+    # Appended rows are picked up from the old end of the file
+    old_size = raw.stat().st_size
+    with open(raw, "a") as f:
+        f.write("2,1\n")
+    task = plan_input(str(raw), manifest.files[task["key"]])
+    assert task["action"] == "append" and task["offset"] == old_size
+    assert manifest.segment_basename(task).endswith("-00001")
+    manifest.record(task, manifest.segment_basename(task), n_rows=1)
+    assert manifest.files[task["key"]]["segments"][1]["row_range"] == [1, 2]
+    
+    # Rewriting existing rows invalidates the file
+    raw.write_text("CustomerID,Churn\n1,1\n2,1\n")
+    assert plan_input(str(raw), manifest.files[task["key"]])["action"] == "changed"
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from sklearn.metrics import accuracy_score, confusion_matrix, f1_score, log_loss, precision_score, recall_score, roc_auc_score
+
+from metrics import POISSON_TABLE, PoissonBootstrap, StreamingBinaryMetrics, evaluate_binary, report_to_dict
+
+def sample(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, 2, n)
+    # Rounded scores so there are plenty of ties, including exactly 0.5
+    proba = np.clip(np.round(0.3 * y + rng.random(n) * 0.7, 2), 0, 1)
+    return y, proba
+
+def test_metrics_match_sklearn():
+    y, proba = sample()
+    report = evaluate_binary(y, proba)
+    preds = (proba > 0.5).astype(int)
+    
+    metrics = report["metrics"]
+    assert metrics["accuracy"] == pytest.approx(accuracy_score(y, preds))
+    assert metrics["precision"] == pytest.approx(precision_score(y, preds))
+    assert metrics["recall"] == pytest.approx(recall_score(y, preds))
+    assert metrics["f1"] == pytest.approx(f1_score(y, preds))
+    assert metrics["roc_auc"] == pytest.approx(roc_auc_score(y, proba))
+    assert metrics["logloss"] == pytest.approx(log_loss(y, np.clip(proba, 1e-15, 1 - 1e-15)))
+    assert (report["confusion"] == confusion_matrix(y, preds)).all()
+
+def test_threshold_sweep_and_calibration():
+    y, proba = sample()
+    report = evaluate_binary(y, proba, n_bins=5)
+    
+    sweep = report["threshold_sweep"]
+    for i, threshold in enumerate(sweep["threshold"]):
+        assert sweep["f1"][i] == pytest.approx(f1_score(y, (proba > threshold).astype(int)))
+    
+    calibration = report["calibration"]
+    assert calibration["count"].sum() == len(y)
+    top = proba >= 0.8
+    assert calibration["positive_rate"][-1] == pytest.approx(y[top].mean())
+
+def test_bootstrap_intervals_contain_point_estimate():
+    y, proba = sample()
+    report = evaluate_binary(y, proba, n_bootstrap=50)
+    for name, (low, high) in report["ci"].items():
+        assert low <= report["metrics"][name] <= high
+    # The JSON form is what gets logged to MLflow
+    assert report_to_dict(report)["ci"]["roc_auc"] == list(report["ci"]["roc_auc"])
+
+def test_streaming_metrics_match_single_pass():
+    y, proba = sample(5000)
+    streaming = StreamingBinaryMetrics(n_bootstrap=20)
+    for start in range(0, len(y), 700):
+        streaming.update(y[start:start + 700], proba[start:start + 700])
+    report = streaming.report()
+    expected = evaluate_binary(y, proba)
+    
+    for name in ("accuracy", "precision", "recall", "f1", "logloss"):
+        assert report["metrics"][name] == pytest.approx(expected["metrics"][name])
+    # Scores are rounded to 0.01, so the histogram bins reproduce the exact ties
+    assert report["metrics"]["roc_auc"] == pytest.approx(expected["metrics"]["roc_auc"])
+    assert (report["confusion"] == expected["confusion"]).all()
+    np.testing.assert_allclose(report["threshold_sweep"]["f1"], expected["threshold_sweep"]["f1"])
+    np.testing.assert_allclose(report["calibration"]["count"], expected["calibration"]["count"])
+    low, high = report["ci"]["accuracy"]
+    assert low <= report["metrics"]["accuracy"] <= high
+
+def test_shared_bootstrap_weights_match_per_replicate_sums():
+    y, proba = sample(3000)
+    weights = PoissonBootstrap(8, seed=1).draw(len(y))
+    assert set(np.unique(weights)) <= set(POISSON_TABLE)
+    assert weights.mean() == pytest.approx(1.0, abs=0.02)
+
+    shared = StreamingBinaryMetrics(n_bootstrap=8, bootstrap_score_bins=16)
+    shared.update(y, proba, weights)
+    positive = proba > 0.5
+    coarse = np.minimum((proba * 16).astype(int), 15)
+    for r, w in enumerate(weights):
+        assert shared.boot_tp[r] == pytest.approx(w[(y == 1) & positive].sum())
+        assert shared.boot_fp[r] == pytest.approx(w[(y == 0) & positive].sum())
+        np.testing.assert_allclose(shared.boot_pos_hist[r], np.bincount(coarse, weights=w * y, minlength=16))
+        np.testing.assert_allclose(shared.boot_neg_hist[r], np.bincount(coarse, weights=w * (1 - y), minlength=16))
+
+    # Drawing inside update with the same seed gives the same resamples
+    own = StreamingBinaryMetrics(n_bootstrap=8, bootstrap_score_bins=16, seed=1)
+    own.update(y, proba)
+    assert own.report()["ci"] == shared.report()["ci"]
@@ -0,0 +1,49 @@
+import mlflow
+from mlflow.tracking import MlflowClient
+
+from mlflow_logging import AsyncRunLogger, MAX_METRICS_PER_BATCH
+
+def local_client(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    return MlflowClient(tracking_uri=(tmp_path / "mlruns").as_uri())
+
+def test_batched_logging_and_background_uploads(tmp_path, monkeypatch):
+    client = local_client(tmp_path, monkeypatch)
+    experiment_id = client.create_experiment("test")
+    run_id = client.create_run(experiment_id).info.run_id
+
+    artifact = tmp_path / "report.txt"
+    artifact.write_text("first")
+    with AsyncRunLogger(run_id, client=client, flush_interval=None) as logger:
+        logger.log_params({"max_depth": 3, "learning_rate": 0.1})
+        logger.set_tag("data_mode", "memory")
+        # More values than fit in a single log_batch request
+        for step in range(MAX_METRICS_PER_BATCH + 5):
+            logger.log_metric("loss", 1.0 / (step + 1), step=step)
+        logger.log_artifact(str(artifact))
+        # The upload uses a staged copy, so the local file can change immediately
+        artifact.write_text("second")
+
+    run = client.get_run(run_id)
+    assert run.data.params == {"max_depth": "3", "learning_rate": "0.1"}
+    assert run.data.tags["data_mode"] == "memory"
+    assert len(client.get_metric_history(run_id, "loss")) == MAX_METRICS_PER_BATCH + 5
+    downloaded = mlflow.artifacts.download_artifacts(run_id=run_id, artifact_path="report.txt",
+                                                     tracking_uri=client.tracking_uri, dst_path=str(tmp_path / "dl"))
+    assert open(downloaded).read() == "first"
+
+def test_child_runs_are_nested(tmp_path, monkeypatch):
+    client = local_client(tmp_path, monkeypatch)
+    experiment_id = client.create_experiment("test")
+    parent_id = client.create_run(experiment_id).info.run_id
+
+    parent = AsyncRunLogger(parent_id, client=client, flush_interval=None)
+    child = parent.start_child_run("trial-0")
+    child.log_metric("valid_score", 0.5)
+    child.close(status="FINISHED")
+    parent.close()
+
+    run = client.get_run(child.run_id)
+    assert run.data.tags["mlflow.parentRunId"] == parent_id
+    assert run.data.metrics["valid_score"] == 0.5
+    assert run.info.status == "FINISHED"
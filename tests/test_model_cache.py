@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from model_cache import ModelCache
+
+class FakeStore:
+    """Stands in for the MLflow artifact store and counts downloads."""
+
+    def __init__(self, tmp_path):
+        self.root = tmp_path / "store"
+        self.downloads = []
+
+    def add(self, run_id, name, content):
+        path = self.root / run_id / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+
+    def fetch(self, run_id, artifact_path, dst_path):
+        self.downloads.append((run_id, artifact_path))
+        target = os.path.join(dst_path, artifact_path)
+        with open(self.root / run_id / artifact_path, "rb") as src, open(target, "wb") as dst:
+            dst.write(src.read())
+        return target
+
+def test_artifacts_are_fetched_once_and_deduplicated(tmp_path):
+    store = FakeStore(tmp_path)
+    store.add("run-a", "model.bin", b"x" * 100)
+    store.add("run-b", "model.bin", b"x" * 100)
+    cache = ModelCache(str(tmp_path / "cache"), max_bytes=10_000, fetch=store.fetch)
+    
+    path = cache.get("run-a", "model.bin")
+    assert open(path, "rb").read() == b"x" * 100
+    assert cache.get("run-a", "model.bin") == path
+    # Same content from another run shares the stored object
+    assert cache.get("run-b", "model.bin") == path
+    assert store.downloads == [("run-a", "model.bin"), ("run-b", "model.bin")]
+    
+    # A new process reuses the on-disk cache without downloading
+    reopened = ModelCache(str(tmp_path / "cache"), max_bytes=10_000, fetch=store.fetch)
+    assert reopened.get("run-a", "model.bin") == path
+    assert len(store.downloads) == 2
+
+def test_least_recently_used_artifacts_are_evicted(tmp_path):
+    store = FakeStore(tmp_path)
+    for run_id in ("run-a", "run-b", "run-c"):
+        store.add(run_id, "model.bin", run_id.encode() * 100)
+    cache = ModelCache(str(tmp_path / "cache"), max_bytes=1000, fetch=store.fetch)
+    
+    cache.get("run-a", "model.bin")
+    cache.get("run-b", "model.bin")
+    cache.get("run-a", "model.bin")
+    # Adding run-c exceeds 1000 bytes; run-b is the least recently used
+    cache.get("run-c", "model.bin")
+    cache.get("run-a", "model.bin")
+    assert store.downloads.count(("run-a", "model.bin")) == 1
+    cache.get("run-b", "model.bin")
+    assert store.downloads.count(("run-b", "model.bin")) == 2
+
+def test_resolve_falls_back_to_last_answer(tmp_path):
+    cache = ModelCache(str(tmp_path / "cache"))
+    assert cache.resolve("churn-prediction-model@staging", lambda: "run-a") == "run-a"
+    
+    def unreachable():
+        raise ConnectionError("tracking server down")
+    assert cache.resolve("churn-prediction-model@staging", unreachable) == "run-a"
+    with pytest.raises(ConnectionError):
+        cache.resolve("latest:other", unreachable)
@@ -0,0 +1,100 @@
+import threading
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import xgboost as xgb
+
+import model_cache
+from feature_schema import FEATURE_COLUMNS
+from predictors import (FeatureLayout, TreeArrayPredictor, XGBoostPredictor, export_predictors,
+                        features_to_matrix, load_predictor, load_run_predictor)
+
+def train_booster(n_rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.random((n_rows, len(FEATURE_COLUMNS))).astype(np.float32)
+    y = ((X[:, 0] + X[:, 2] > 1) ^ (rng.random(n_rows) < 0.1)).astype(int)
+    # Missing values so default directions are learned
+    X[rng.random(X.shape) < 0.1] = np.nan
+    dtrain = xgb.DMatrix(X, y, feature_names=FEATURE_COLUMNS)
+    booster = xgb.train({"objective": "binary:logistic", "max_depth": 4, "learning_rate": 0.3}, dtrain, 20)
+    return booster, X
+
+def test_tree_predictor_matches_xgboost():
+    booster, X = train_booster()
+    expected = booster.predict(xgb.DMatrix(X, feature_names=FEATURE_COLUMNS))
+    np.testing.assert_allclose(TreeArrayPredictor.from_booster(booster).predict_proba(X), expected, rtol=1e-5)
+    np.testing.assert_allclose(XGBoostPredictor(booster).predict_proba(X), expected, rtol=1e-6)
+
+def test_exported_predictors_round_trip(tmp_path):
+    booster, X = train_booster()
+    exported = export_predictors(booster, str(tmp_path))
+    assert {"xgboost", "tree"} <= set(exported)
+    expected = booster.inplace_predict(X)
+    for backend in exported:
+        np.testing.assert_allclose(load_predictor(str(tmp_path), backend).predict_proba(X), expected, rtol=1e-5)
+
+def test_run_predictor_loads_the_model_only_without_an_export(tmp_path, monkeypatch):
+    booster, X = train_booster()
+    export_predictors(booster, str(tmp_path), ["tree"])
+    def cached_artifact(run_id, path):
+        backend_dir = tmp_path / path.split("/")[-1]
+        if not backend_dir.exists():
+            raise FileNotFoundError(path)
+        return str(backend_dir)
+    monkeypatch.setattr(model_cache, "cached_artifact", cached_artifact)
+    loads = []
+    def load_booster():
+        loads.append(1)
+        return booster
+    
+    assert isinstance(load_run_predictor("run-1", "tree", load_booster), TreeArrayPredictor)
+    assert loads == []
+    predictor = load_run_predictor("run-1", "xgboost", load_booster)
+    assert loads == [1]
+    np.testing.assert_allclose(predictor.predict_proba(X), booster.inplace_predict(X), rtol=1e-6)
+
+def test_features_to_matrix_fills_absent_and_missing():
+    X = features_to_matrix([{"Age": 30, "Tenure": None}])
+    assert X.dtype == np.float32 and X.shape == (1, len(FEATURE_COLUMNS))
+    assert X[0, FEATURE_COLUMNS.index("Age")] == 30
+    assert np.isnan(X[0, FEATURE_COLUMNS.index("Tenure")])
+    assert X[0, FEATURE_COLUMNS.index("Gender")] == 0
+
+def test_feature_layout_reuses_a_buffer_per_thread():
+    view = SimpleNamespace(name="churn_features", schema=[SimpleNamespace(name=col) for col in reversed(FEATURE_COLUMNS)])
+    layout = FeatureLayout.from_feature_view(view)
+    assert layout.columns == FEATURE_COLUMNS
+    assert layout.index["churn_features:Tenure"] == layout.index["Tenure"] == FEATURE_COLUMNS.index("Tenure")
+
+    records = [{"Age": 30, "Tenure": None}, {"Age": 40}]
+    X = layout.matrix(records)
+    np.testing.assert_array_equal(X, features_to_matrix(records))
+    # Feast references fill the same columns; other keys are ignored
+    np.testing.assert_array_equal(layout.matrix([{"customer_id": 7, "churn_features:Age": 30, "Tenure": None},
+                                                 {"churn_features:Age": 40}]), X)
+    assert layout.matrix(records[:1]).base is X.base
+    other = []
+    thread = threading.Thread(target=lambda: other.append(layout.matrix(records)))
+    thread.start()
+    thread.join()
+    assert other[0].base is not X.base
+
+    with pytest.raises(ValueError):
+        FeatureLayout.from_feature_view(SimpleNamespace(name="churn_features", schema=view.schema[1:]))
+
+def test_feature_layout_allocation_does_not_grow_with_rows():
+    layout = FeatureLayout()
+    record = {col: 1.0 for col in FEATURE_COLUMNS}
+
+    def peak(n):
+        records = [record] * n
+        layout.matrix(records)  # grow the buffer first
+        tracemalloc.start()
+        layout.matrix(records)
+        size = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return size
+
+    assert peak(1000) <= peak(1) + 256
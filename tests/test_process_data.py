@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from process_data import clean_data, fit_encoder, hash_split, match_code_dtypes
+
+def test_hash_split_is_deterministic_and_stable():
+    ids = pd.Series(range(1, 20001))
+    is_test = hash_split(ids, test_ratio=0.2)
+    assert abs(is_test.mean() - 0.2) < 0.01
+    
+    # Reordering the rows or adding new customers must not move existing ones
+    shuffled = ids.sample(frac=1, random_state=0)
+    assert (hash_split(shuffled, 0.2) == is_test[shuffled.index]).all()
+    grown = pd.Series(range(1, 40001))
+    assert (hash_split(grown, 0.2)[:20000] == is_test).all()
+
+def test_chunks_with_different_categories_get_the_same_codes(tmp_path):
+    raw = pd.DataFrame({
+        "CustomerID": [1, 2, 3, 4],
+        "Gender": ["Male", "Male", "Female", "Female"],
+        "Subscription Type": ["Premium", "Premium", "Basic", "Standard"],
+        "Contract Length": ["Monthly", "Annual", "Annual", "Monthly"],
+        "Total Spend": [10.0, 20.0, 30.0, 40.0],
+        "Churn": [0, 1, 0, 1],
+    })
+    path = tmp_path / "raw.csv"
+    raw.to_csv(path, index=False)
+    encoder = fit_encoder([str(path)], str(tmp_path / "out"), chunksize=2)
+
+    # Each chunk of two rows only sees one Gender value
+    chunked = pd.concat([clean_data(chunk, encoder) for chunk in pd.read_csv(path, chunksize=2)])
+    whole = clean_data(pd.read_csv(path), encoder)
+    pd.testing.assert_frame_equal(chunked.reset_index(drop=True), whole)
+    assert chunked["Gender"].tolist() == [1, 1, 0, 0]
+
+def test_incremental_runs_keep_existing_code_dtypes(tmp_path):
+    dataset = tmp_path / "churn_dataset"
+    (dataset / "split=train").mkdir(parents=True)
+    pd.DataFrame({"Gender": [0, 1], "Subscription Type": [0, 1]}).astype({"Gender": "int8", "Subscription Type": "int16"}) \
+        .to_parquet(dataset / "split=train" / "part-0.parquet")
+
+    # A narrower plan keeps the wider codes already written
+    plan = {"Gender": "int8", "Subscription Type": "int8", "Contract Length": "int8"}
+    assert match_code_dtypes(plan, str(dataset))["Subscription Type"] == "int16"
+    # A vocabulary that outgrew the existing int8 codes cannot be appended
+    with pytest.raises(ValueError, match="Gender"):
+        match_code_dtypes(dict(plan, Gender="int16"), str(dataset))
+    assert match_code_dtypes(plan, str(tmp_path / "missing")) == plan
@@ -0,0 +1,179 @@
+import asyncio
+import math
+
+import numpy as np
+import pytest
+from feast.infra.key_encoding_utils import serialize_entity_key
+from feast.infra.online_stores.helpers import _mmh3, _redis_key
+from feast.protos.feast.types.EntityKey_pb2 import EntityKey
+from feast.protos.feast.types.Value_pb2 import Value
+
+from feature_schema import FEATURE_COLUMNS
+from redis_features import (AsyncRedisFeatureReader, RedisFeatureLayout, RedisFeatureReader, decode_value,
+                            redis_connection_kwargs)
+
+PROJECT = "churn_prediction"
+
+def feast_key(customer_id):
+    entity_key = EntityKey(join_keys=["customer_id"], entity_values=[Value(int64_val=customer_id)])
+    return _redis_key(PROJECT, entity_key)
+
+def feast_hash(customer, layout):
+    """The Redis hash Feast's online_write_batch stores for one customer."""
+    values = {}
+    for col, value in customer.items():
+        proto = Value(int64_val=value) if col in layout.integer_columns else Value(float_val=value)
+        values[_mmh3(f"churn_features:{col}")] = proto.SerializeToString()
+    return values
+
+class FakeRedis:
+    """Local stand-in for redis.Redis: hashes in a dict, pipelined HMGET counted as one round trip."""
+
+    def __init__(self, hashes):
+        self.hashes = hashes
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakeSyncPipeline(self)
+
+class FakeSyncPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def hmget(self, key, fields):
+        self.commands.append((key, fields))
+
+    def execute(self):
+        self.client.round_trips += 1
+        return [[self.client.hashes.get(key, {}).get(field) for field in fields] for key, fields in self.commands]
+
+class FakeAsyncRedis:
+    """Just enough of redis.asyncio.Redis for pipelined HMGET."""
+
+    def __init__(self, hashes):
+        self.hashes = hashes
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def hmget(self, key, fields):
+        self.commands.append((key, fields))
+
+    async def execute(self):
+        self.client.round_trips += 1
+        return [[self.client.hashes.get(key, {}).get(field) for field in fields] for key, fields in self.commands]
+
+@pytest.fixture(scope="module")
+def layout():
+    return RedisFeatureLayout.from_repo()
+
+def test_keys_and_fields_match_feast(layout):
+    for customer_id in (0, 1, 328860, -5, 2**40):
+        assert layout.key(customer_id) == feast_key(customer_id)
+    entity_key = EntityKey(join_keys=["customer_id"], entity_values=[Value(int64_val=7)])
+    assert layout.key(7).startswith(serialize_entity_key(entity_key))
+    assert layout.fields == [_mmh3(f"churn_features:{col}") for col in FEATURE_COLUMNS]
+    assert set(layout.integer_columns) == {"Gender", "Subscription Type", "Contract Length"}
+
+def test_decode_value_matches_protobuf():
+    for value in (0.0, 1.5, -3.25, 1e30):
+        assert decode_value(Value(float_val=value).SerializeToString()) == pytest.approx(value)
+    for value in (0, 1, 127, 128, 300, -1, -2**63, 2**62):
+        assert decode_value(Value(int64_val=value).SerializeToString()) == value
+    assert decode_value(Value(double_val=2.5).SerializeToString()) == 2.5
+    assert math.isnan(decode_value(b""))
+    assert math.isnan(decode_value(None))
+    with pytest.raises(ValueError):
+        decode_value(Value(string_val="x").SerializeToString())
+
+def test_async_reader_decodes_one_pipeline(layout):
+    customer = {col: float(i) for i, col in enumerate(FEATURE_COLUMNS)}
+    for col in layout.integer_columns:
+        customer[col] = 2
+    hashes = {feast_key(42): feast_hash(customer, layout)}
+    # A customer written with one null feature
+    partial = feast_hash(customer, layout)
+    partial[_mmh3("churn_features:Age")] = Value().SerializeToString()
+    hashes[feast_key(43)] = partial
+    client = FakeAsyncRedis(hashes)
+    reader = AsyncRedisFeatureReader(layout, client=client)
+
+    X, found = asyncio.run(reader.read([42, 99, 43]))
+    assert client.round_trips == 1
+    assert found.tolist() == [True, False, True]
+    assert X.dtype.name == "float32"
+    assert X[0].tolist() == [customer[col] for col in FEATURE_COLUMNS]
+    assert math.isnan(X[2, 0]) and X[2, 1:].tolist() == X[0, 1:].tolist()
+
+    records = asyncio.run(reader.read_records([42, 99, 43]))
+    assert records[1] is None
+    assert records[0]["customer_id"] == 42 and records[0]["Gender"] == 2 and isinstance(records[0]["Gender"], int)
+    assert records[2]["Age"] is None
+
+def test_connection_string():
+    assert redis_connection_kwargs("localhost:6379") == {"host": "localhost", "port": 6379}
+    assert redis_connection_kwargs("redis:6380,password=secret,ssl=true,db=2") == {
+        "host": "redis", "port": 6380, "password": "secret", "ssl": True, "db": 2}
+
+def random_customers(layout, n, seed=0):
+    rng = np.random.default_rng(seed)
+    customers = {}
+    for customer_id in range(n):
+        customer = {col: float(np.float32(rng.random() * 1000)) for col in FEATURE_COLUMNS}
+        for col in layout.integer_columns:
+            customer[col] = int(rng.integers(0, 3))
+        customers[customer_id] = customer
+    return customers
+
+def test_reader_fills_preallocated_matrix(layout):
+    customers = random_customers(layout, 200)
+    # Category code -1 and large integers take the general decoding path
+    customers[3]["Gender"] = -1
+    customers[4]["Contract Length"] = 1000
+    hashes = {feast_key(i): feast_hash(c, layout) for i, c in customers.items()}
+    # A customer materialized before "Tenure" existed
+    del hashes[feast_key(5)][_mmh3("churn_features:Tenure")]
+    client = FakeRedis(hashes)
+    reader = RedisFeatureReader(layout, client=client)
+
+    customer_ids = list(range(150)) + [-7, 10**6]
+    buffer = np.zeros((512, len(FEATURE_COLUMNS)), dtype=np.float32)
+    X, found = reader.read(customer_ids, out=buffer)
+    assert client.round_trips == 1
+    assert X.base is buffer and X.shape == (152, len(FEATURE_COLUMNS))
+    assert found.tolist() == [True] * 150 + [False, False]
+    expected = np.array([[customers[i][col] for col in FEATURE_COLUMNS] for i in range(150)], dtype=np.float32)
+    expected[5, FEATURE_COLUMNS.index("Tenure")] = np.nan
+    np.testing.assert_array_equal(X[:150], expected)
+    assert np.isnan(X[150:]).all()
+
+    records = reader.read_records([3, 5, -7])
+    assert records[0]["Gender"] == -1 and records[1]["Tenure"] is None and records[2] is None
+
+def test_reader_matches_feast_sdk_records(layout):
+    """The reader's records equal what FeatureStore.get_online_features().to_dict() yields per row."""
+    customers = random_customers(layout, 20, seed=1)
+    hashes = {feast_key(i): feast_hash(c, layout) for i, c in customers.items()}
+    reader = RedisFeatureReader(layout, client=FakeRedis(hashes))
+    for customer_id, record in zip(range(20), reader.read_records(list(range(20)))):
+        assert record == {"customer_id": customer_id, **customers[customer_id]}
+    assert reader.read([])[0].shape == (0, len(FEATURE_COLUMNS))
@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from result_cache import MemoryResultStore, RedisResultStore, ResultCache, row_hashes
+
+class FakeRedis:
+    """The MGET/SET subset of redis.Redis the result store uses."""
+
+    def __init__(self):
+        self.data, self.expiry = {}, {}
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client, self.commands = client, []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.commands.append((key, value, ex))
+
+    def execute(self):
+        for key, value, ex in self.commands:
+            self.client.data[key] = value.encode()
+            self.client.expiry[key] = ex
+        return [True] * len(self.commands)
+
+def test_row_hashes_follow_feature_values():
+    X = np.array([[1.0, np.nan], [1.0, np.nan], [1.0, 0.0]], dtype=np.float32)
+    hashes = row_hashes(X)
+    assert hashes[0] == hashes[1] != hashes[2]
+    assert row_hashes(X.astype(np.float64)) == hashes
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryResultStore(max_entries=2)
+    store.set_many({"a": {"probability": 0.1}, "b": {"probability": 0.2}})
+    store.get_many(["a"])
+    store.set_many({"c": {"probability": 0.3}})
+    assert store.get_many(["a", "b", "c"]) == [{"probability": 0.1}, None, {"probability": 0.3}]
+    assert len(store) == 2
+
+def test_lookup_is_per_model_and_needs_shap_when_explaining():
+    cache = ResultCache(MemoryResultStore())
+    cache.set_model("run-1")
+    X = np.array([[1.0, 2.0], [3.0, 4.0]], dtype=np.float32)
+    keys, results = cache.lookup(X)
+    assert results == [None, None]
+    cache.save(keys, [{"probability": 0.2}, {"probability": 0.7, "shap_values": {"Age": 0.1}}])
+
+    assert cache.lookup(X)[1] == [{"probability": 0.2}, {"probability": 0.7, "shap_values": {"Age": 0.1}}]
+    assert cache.lookup(X, explain=True)[1] == [None, {"probability": 0.7, "shap_values": {"Age": 0.1}}]
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (3, 3)
+
+    # A new model starts from an empty cache
+    cache.set_model("run-2")
+    assert cache.lookup(X)[1] == [None, None]
+
+def test_redis_store_round_trips_with_ttl():
+    client = FakeRedis()
+    cache = ResultCache(RedisResultStore(client=client, ttl_seconds=600))
+    cache.set_model("run-1")
+    X = np.array([[5.0, 6.0]], dtype=np.float32)
+    keys, _ = cache.lookup(X)
+    cache.save(keys, [{"probability": 0.25}])
+
+    key = f"churn:prediction:run-1:{row_hashes(X)[0]}"
+    assert client.expiry == {key: 600}
+    assert cache.lookup(X)[1] == [{"probability": 0.25}]
+    assert cache.stats()["backend"] == "redis"
+
+def test_concurrent_lookups_keep_every_count():
+    cache = ResultCache(MemoryResultStore())
+    cache.set_model("run-1")
+    X = np.arange(8, dtype=np.float32).reshape(4, 2)
+    keys, _ = cache.lookup(X)
+    cache.save(keys[:2], [{"probability": 0.1}, {"probability": 0.2}])
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: cache.lookup(X), range(400)))
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (800, 804)